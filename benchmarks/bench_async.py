@@ -0,0 +1,179 @@
+"""
+Concurrency benchmark: how many checkouts one LMS process keeps in flight while
+the payment node is slow, with the sync views and with the async views
+(``PAYMENT_ASYNC_VIEWS``).
+
+    python benchmarks/bench_async.py                                   # 0.5 s node
+    python benchmarks/bench_async.py --node-latency 1 -c 16,64,256 --threads 1,4
+
+Sync rows model a WSGI worker with ``--threads`` threads: that many checkouts at
+a time, each holding its thread while the node answers. Async rows send
+``--concurrency`` checkouts at once to the async views on one event loop. Both
+go through the full Django stack in this process (test clients, no server).
+
+Under Django's ASGI handler each request runs its ORM calls in a thread of its
+own; that is what happens here with ``BENCH_DATABASE`` (MySQL). On SQLite all
+requests share one ORM thread instead: SQLite has a single writer, and a
+connection per request only adds busy-wait back-off.
+
+"in flight" is throughput x node latency: how many checkouts the process was
+holding at once. Async rows need aiohttp; without it the node call runs in a
+thread and the numbers fall back to the thread pool size.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import importlib
+import json
+import os
+import statistics
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "bench_settings")
+
+from run import _setup  # noqa: E402
+from stub_node import StubNode  # noqa: E402
+
+CHECKOUT = "/payment-gateway/api/checkout/"
+
+
+def _use_async_views(enabled: bool) -> None:
+    # urls.py picks the views at import time
+    import bench_urls
+    import payment_gateway_api.urls
+    from django.conf import settings
+    from django.urls import clear_url_caches
+
+    settings.PAYMENT_ASYNC_VIEWS = enabled
+    importlib.reload(payment_gateway_api.urls)
+    importlib.reload(bench_urls)
+    clear_url_caches()
+
+
+def _summary(mode: str, level: int, latency: List[float], errors: int, wall: float,
+             node_latency: float) -> Dict[str, Any]:
+    lat = sorted(latency)
+    n = len(lat)
+    rps = n / wall if wall else 0.0
+    return {
+        "mode": mode,
+        "concurrency": level,
+        "requests": n,
+        "errors": errors,
+        "rps": round(rps, 1),
+        "in_flight": round(rps * node_latency, 1),
+        "p50_ms": round(statistics.median(lat) * 1000, 1) if n else 0.0,
+        "p95_ms": round(lat[min(n - 1, int(0.95 * n))] * 1000, 1) if n else 0.0,
+    }
+
+
+def run_sync(ctx: Dict[str, Any], threads: int, rounds: int, node_latency: float) -> Dict[str, Any]:
+    from django.db import connection
+    from django.test import Client
+
+    latency: List[float] = []
+    errors = [0]
+
+    def worker(i: int) -> None:
+        c = Client()
+        c.force_login(ctx["users"][i % len(ctx["users"])])
+        try:
+            for _ in range(rounds):
+                start = time.perf_counter()
+                resp = c.get(CHECKOUT, {"course_id": ctx["course_ids"][i % len(ctx["course_ids"])]},
+                             HTTP_IDEMPOTENCY_KEY=uuid.uuid4().hex)
+                latency.append(time.perf_counter() - start)
+                if resp.status_code != 302:
+                    errors[0] += 1
+        finally:
+            connection.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(worker, range(threads)))
+    return _summary("sync", threads, latency, errors[0], time.perf_counter() - start, node_latency)
+
+
+def run_async(ctx: Dict[str, Any], concurrency: int, rounds: int, node_latency: float) -> Dict[str, Any]:
+    from asgiref.sync import ThreadSensitiveContext, sync_to_async
+    from django.db import connection, connections
+    from django.test import AsyncClient
+
+    client = AsyncClient()
+    client.force_login(ctx["users"][0])
+    per_request = connection.vendor != "sqlite"
+    close = sync_to_async(connections.close_all)
+    latency: List[float] = []
+    errors = [0]
+
+    async def one(i: int) -> None:
+        for _ in range(rounds):
+            # One ORM thread per request, as under ASGIHandler
+            async with ThreadSensitiveContext() if per_request else contextlib.nullcontext():
+                start = time.perf_counter()
+                resp = await client.get(CHECKOUT, {"course_id": ctx["course_ids"][i % len(ctx["course_ids"])]},
+                                        headers={"Idempotency-Key": uuid.uuid4().hex})
+                latency.append(time.perf_counter() - start)
+                if per_request:
+                    await close()
+            if resp.status_code != 302:
+                errors[0] += 1
+
+    async def main() -> float:
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(concurrency)))
+        return time.perf_counter() - start
+
+    wall = asyncio.run(main())
+    return _summary("async", concurrency, latency, errors[0], wall, node_latency)
+
+
+def _levels(value: str) -> List[int]:
+    return [int(x) for x in value.split(",") if x.strip()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-c", "--concurrency", default="1,16,64,256", help="Async: concurrent checkouts.")
+    parser.add_argument("--threads", default="1,8", help="Sync: threads of the WSGI worker.")
+    parser.add_argument("--rounds", type=int, default=3, help="Checkouts per client at each level.")
+    parser.add_argument("--node-latency", type=float, default=0.5, help="Stub node response delay (s).")
+    parser.add_argument("--json", default=None, help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    levels = _levels(args.concurrency)
+    node = StubNode(latency=args.node_latency).start()
+    try:
+        ctx = _setup(argparse.Namespace(concurrency=max(_levels(args.threads) + [1])), node)
+        from django.conf import settings
+
+        settings.PAYMENT_NODE_ASYNC_POOL_SIZE = max(levels + [1])
+        results = []
+        _use_async_views(False)
+        for threads in _levels(args.threads):
+            results.append(run_sync(ctx, threads, args.rounds, args.node_latency))
+        _use_async_views(True)
+        for level in levels:
+            results.append(run_async(ctx, level, args.rounds, args.node_latency))
+    finally:
+        node.stop()
+
+    print(f"node latency {args.node_latency} s, {args.rounds} checkouts per client")
+    print(f"{'mode':<6}{'conc':>6}{'requests':>10}{'rps':>9}{'in flight':>11}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}")
+    for r in results:
+        print(f"{r['mode']:<6}{r['concurrency']:>6}{r['requests']:>10}{r['rps']:>9}{r['in_flight']:>11}"
+              f"{r['p50_ms']:>10}{r['p95_ms']:>10}{r['errors']:>8}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"node_latency": args.node_latency, "rounds": args.rounds, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Import-time benchmark: what the plugin adds to LMS worker startup and to every
+``tutor`` command.
+
+Each target runs in a fresh interpreter under ``python -X importtime``. Modules
+the host process loads anyway are imported first (Django, opaque_keys and
+requests for the LMS; Tutor's CLI for ``tutor``), so the numbers are the
+plugin's own cost: the cumulative time of its outermost imports, including any
+module they pull in that the host had not already loaded.
+
+    python benchmarks/bench_importtime.py                      # measure and print
+    python benchmarks/bench_importtime.py --check              # exit 1 on regression
+    python benchmarks/bench_importtime.py --update-baseline    # record a new baseline
+
+A regression is a target that got slower than the baseline by more than
+``--tolerance`` (plus ``--slack-ms``), or that imports modules the baseline did
+not. Times depend on the machine: refresh the baseline when changing hosts.
+The ``tutor`` target runs with ``--tutor-python`` and is skipped when Tutor is
+not importable there.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+APP_DIR = os.path.join(ROOT, "tutorpayment_gateway", "templates", "payment-gateway", "apps", "payment_gateway_api")
+BASELINE = os.path.join(HERE, "importtime_baseline.json")
+
+# LMS: the app is set up with the edx stubs (AppConfig.ready -> signals), then
+# urls is imported as on the first request.
+LMS_CODE = """
+import sys
+sys.path[:0] = {paths!r}
+import django, opaque_keys.edx.keys, requests
+django.setup()
+import payment_gateway_api.urls
+"""
+TUTOR_CODE = """
+import sys
+sys.path.insert(0, {root!r})
+import tutor.commands.cli
+import tutorpayment_gateway.plugin
+"""
+
+TARGETS = {
+    "lms": ("payment_gateway_api", LMS_CODE),
+    "tutor": ("tutorpayment_gateway", TUTOR_CODE),
+}
+
+
+def _parse(stderr: str, package: str) -> Tuple[float, List[str]]:
+    """Sum the outermost imports of `package` (ms) and list the other modules they loaded."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((depth, int(cumulative), name.strip()))
+
+    # importtime prints children before their parent; walk it parent-first
+    total_us, dragged = 0, set()
+    stack: List[Tuple[int, bool]] = []
+    for depth, cumulative, name in reversed(rows):
+        while stack and stack[-1][0] >= depth:
+            stack.pop()
+        ours = name == package or name.startswith(package + ".")
+        inside = any(flag for _, flag in stack)
+        if ours and not inside:
+            total_us += cumulative
+        elif inside and not ours:
+            dragged.add(name)
+        stack.append((depth, ours or inside))
+    return total_us / 1000, sorted(dragged)
+
+
+def measure(target: str, runs: int, python: str) -> Optional[Dict[str, Any]]:
+    package, template = TARGETS[target]
+    env = dict(os.environ)
+    if target == "lms":
+        code = template.format(paths=[HERE, os.path.join(HERE, "edx_stubs"), APP_DIR])
+        env["DJANGO_SETTINGS_MODULE"] = "bench_settings"
+    else:
+        code = template.format(root=ROOT)
+        probe = subprocess.run([python, "-c", "import tutor.commands.cli"], capture_output=True)
+        if probe.returncode:
+            return None
+    times, modules = [], []
+    for _ in range(runs):
+        proc = subprocess.run([python, "-X", "importtime", "-c", code], capture_output=True, text=True, env=env)
+        if proc.returncode:
+            raise RuntimeError(f"{target}: import failed\n{proc.stderr[-2000:]}")
+        ms, modules = _parse(proc.stderr, package)
+        times.append(ms)
+    # min is the least noisy estimate of the import cost
+    return {"ms": round(min(times), 2), "median_ms": round(statistics.median(times), 2),
+            "runs": runs, "modules": modules}
+
+
+def check(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float, slack_ms: float) -> List[str]:
+    problems = []
+    for target, cur in results.items():
+        base = baseline.get(target)
+        if not cur or not base:
+            continue
+        limit = base["ms"] * (1 + tolerance) + slack_ms
+        if cur["ms"] > limit:
+            problems.append(f"{target}: {cur['ms']} ms > {limit:.2f} ms (baseline {base['ms']} ms)")
+        new = sorted(set(cur["modules"]) - set(base["modules"]))
+        if new:
+            problems.append(f"{target}: new modules imported at startup: {', '.join(new)}")
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=7, help="Fresh interpreters per target.")
+    parser.add_argument("-t", "--targets", default=",".join(TARGETS))
+    parser.add_argument("--tutor-python", default=sys.executable, help="Interpreter with Tutor installed.")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 on regression.")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed relative slowdown.")
+    parser.add_argument("--slack-ms", type=float, default=2.0, help="Allowed absolute slowdown.")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    args = parser.parse_args()
+
+    results: Dict[str, Any] = {}
+    for target in [t.strip() for t in args.targets.split(",") if t.strip()]:
+        if target not in TARGETS:
+            parser.error(f"unknown target {target}")
+        python = args.tutor_python if target == "tutor" else sys.executable
+        results[target] = measure(target, args.runs, python)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for target, r in results.items():
+            if r is None:
+                print(f"{target:<8} skipped (not importable with this interpreter)")
+                continue
+            print(f"{target:<8} {r['ms']:>8} ms (median {r['median_ms']} ms)  "
+                  f"{len(r['modules'])} other modules: {', '.join(r['modules'][:8])}"
+                  f"{' ...' if len(r['modules']) > 8 else ''}")
+
+    if args.update_baseline:
+        old: Dict[str, Any] = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                old = json.load(f)
+        old.update({k: v for k, v in results.items() if v})
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(old, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"baseline written to {args.baseline}")
+    elif args.check:
+        if not os.path.exists(args.baseline):
+            sys.exit(f"no baseline at {args.baseline}; run with --update-baseline first")
+        with open(args.baseline, encoding="utf-8") as f:
+            problems = check(results, json.load(f), args.tolerance, args.slack_ms)
+        for p in problems:
+            print("REGRESSION " + p)
+        if problems:
+            sys.exit(1)
+        print("import time within baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Django settings for the benchmark suite: the payment_gateway_api app plus the
+edx-platform stand-ins in benchmarks/edx_stubs. Not used by the LMS.
+
+Database: SQLite in a temp dir by default (BENCH_DB_PATH to override). Set
+BENCH_DATABASE to a JSON DATABASES["default"] dict (e.g. MySQL) for numbers
+closer to production; SQLite serialises writers.
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+import django
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(
+    os.path.dirname(HERE), "tutorpayment_gateway", "templates", "payment-gateway", "apps", "payment_gateway_api"
+)
+sys.path[:0] = [os.path.join(HERE, "edx_stubs"), APP_DIR]
+
+SECRET_KEY = "bench"
+DEBUG = False
+USE_TZ = True
+ALLOWED_HOSTS = ["*"]
+INSTALLED_APPS = [
+    "django.contrib.auth",
+    "django.contrib.contenttypes",
+    "django.contrib.sessions",
+    "openedx.core.djangoapps.content.course_overviews.apps.CourseOverviewsConfig",
+    "common.djangoapps.course_modes.apps.CourseModesConfig",
+    "common.djangoapps.student.apps.StudentConfig",
+    "payment_gateway_api.apps.PaymentGatewayAPIConfig",
+]
+MIDDLEWARE = [
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+]
+ROOT_URLCONF = "bench_urls"
+DEFAULT_AUTO_FIELD = "django.db.models.AutoField"
+PASSWORD_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+LOGGING = {"version": 1, "disable_existing_loggers": False, "root": {"level": "ERROR"}}
+
+if os.environ.get("BENCH_DATABASE"):
+    DATABASES = {"default": json.loads(os.environ["BENCH_DATABASE"])}
+else:
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("BENCH_DB_PATH") or os.path.join(tempfile.gettempdir(), "payment-gateway-bench.sqlite3"),
+            "OPTIONS": {"timeout": 30},
+        }
+    }
+    if django.VERSION >= (5, 1):
+        # BEGIN IMMEDIATE: read-then-write transactions wait for the lock instead of failing
+        DATABASES["default"]["OPTIONS"]["transaction_mode"] = "IMMEDIATE"
+# Like the LMS: views run in a transaction, on_commit work (enrollment) after the view
+DATABASES["default"].setdefault("ATOMIC_REQUESTS", True)
+CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+# Same shape as the Tutor ENV_TOKENS; run.py points the node URLs at the stub node
+ENV_TOKENS = {
+    "PAYMENT_SHARED_SECRET": "bench-secret",
+    "PAYMENT_QUERY_BUDGET_CHECK": True,
+    # Measure throughput, not the rate limiter
+    "PAYMENT_RATE_LIMIT_CHECKOUT": "",
+    "PAYMENT_RATE_LIMIT_CHECKOUT_IP": "",
+    "PAYMENT_RATE_LIMIT_PRICING": "",
+}
+
+from payment_gateway_api.settings.common import plugin_settings  # noqa: E402
+
+plugin_settings(sys.modules[__name__])
@@ -0,0 +1,93 @@
+"""
+Micro-benchmark: HMAC signing / verification throughput for callback bodies.
+
+Compares the previous per-call ``hmac.new(secret.encode(), ...)`` + ``!=``
+against ``payment_gateway_api.signing.Keyring`` (precomputed keyed HMAC,
+``copy()`` per message, ``compare_digest``), for several body sizes and for
+verification against a two-key ring during rotation.
+
+    python benchmarks/bench_signing.py [--seconds 0.5] [--json]
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_DIR = os.path.join(ROOT, "tutorpayment_gateway", "templates", "payment-gateway", "apps", "payment_gateway_api")
+SECRET = "x" * 32
+SIZES = [256, 4 * 1024, 64 * 1024, 1024 * 1024]
+
+
+def _setup_django() -> None:
+    sys.path.insert(0, APP_DIR)
+    from django.conf import settings
+
+    if not settings.configured:
+        settings.configure(
+            CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+            PAYMENT_SHARED_SECRET=SECRET,
+        )
+
+
+def _rate(fn: Callable[[], Any], seconds: float) -> float:
+    n, start = 0, time.perf_counter()
+    deadline = start + seconds
+    while True:
+        for _ in range(50):
+            fn()
+        n += 50
+        now = time.perf_counter()
+        if now >= deadline:
+            return n / (now - start)
+
+
+def run(seconds: float) -> List[Dict[str, Any]]:
+    _setup_django()
+    from payment_gateway_api import signing
+
+    ring = signing.Keyring.from_secret(SECRET)
+    rotating = signing.Keyring({"new": "y" * 32, "default": SECRET}, "new")
+    rows = []
+    for size in SIZES:
+        body = json.dumps({"order_uid": "0" * 32, "pad": "a" * max(0, size - 60)}).encode()[:size]
+        sig = ring.sign(body)
+
+        def legacy_verify() -> bool:
+            return sig != hmac.new(SECRET.encode(), body, hashlib.sha256).hexdigest()
+
+        cases = {
+            "legacy_sign": lambda: hmac.new(SECRET.encode(), body, hashlib.sha256).hexdigest(),
+            "keyring_sign": lambda: ring.sign(body),
+            "legacy_verify": legacy_verify,
+            "keyring_verify": lambda: ring.matches(body, sig),
+            "rotation_verify_kid": lambda: rotating.matches(body, sig, "default"),
+            "rotation_verify_any": lambda: rotating.matches(body, sig),
+        }
+        for name, fn in cases.items():
+            ops = _rate(fn, seconds)
+            rows.append({"case": name, "bytes": size, "ops_per_s": round(ops), "mb_per_s": round(ops * size / 1e6, 1)})
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=0.5, help="Time budget per case.")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    args = parser.parse_args()
+    rows = run(args.seconds)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+    print(f"{'case':<22}{'bytes':>10}{'ops/s':>12}{'MB/s':>10}")
+    for r in rows:
+        print(f"{r['case']:<22}{r['bytes']:>10}{r['ops_per_s']:>12}{r['mb_per_s']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+from django.urls import include, path
+
+urlpatterns = [path("payment-gateway/", include("payment_gateway_api.urls"))]
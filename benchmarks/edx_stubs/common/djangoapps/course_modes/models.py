@@ -0,0 +1,21 @@
+from django.db import models
+
+from openedx.core.djangoapps.content.course_overviews.models import CourseOverview
+
+
+class CourseMode(models.Model):
+    course = models.ForeignKey(CourseOverview, db_constraint=False, on_delete=models.DO_NOTHING, related_name="modes")
+    mode_slug = models.CharField(max_length=100)
+    mode_display_name = models.CharField(max_length=255)
+    min_price = models.IntegerField(default=0)
+    currency = models.CharField(default="usd", max_length=8)
+    expiration_datetime = models.DateTimeField(null=True, blank=True)
+    expiration_date = models.DateField(null=True, blank=True)
+    suggested_prices = models.CharField(max_length=255, blank=True, default="")
+    sku = models.CharField(max_length=255, null=True, blank=True)
+    android_sku = models.CharField(max_length=255, null=True, blank=True)
+    ios_sku = models.CharField(max_length=255, null=True, blank=True)
+    bulk_sku = models.CharField(max_length=255, null=True, blank=True)
+
+    class Meta:
+        app_label = "course_modes"
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.db import models
+
+
+class CourseEnrollment(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    course_id = models.CharField(max_length=255)
+    mode = models.CharField(max_length=100)
+    is_active = models.BooleanField(default=True)
+
+    class Meta:
+        app_label = "student"
+        unique_together = [("user", "course_id")]
+
+    @classmethod
+    def enroll(cls, user, course_key, mode="audit", check_access=False):
+        obj, _ = cls.objects.update_or_create(
+            user=user, course_id=str(course_key), defaults={"mode": mode, "is_active": True}
+        )
+        return obj
+
+
+class CourseEnrollmentAllowed(models.Model):
+    email = models.CharField(max_length=255)
+    course_id = models.CharField(max_length=255)
+    auto_enroll = models.BooleanField(default=False)
+
+    class Meta:
+        app_label = "student"
+        unique_together = [("email", "course_id")]
@@ -0,0 +1,9 @@
+class PluginURLs:
+    CONFIG = "url_config"
+    NAMESPACE = "namespace"
+    REGEX = "regex"
+    RELATIVE_PATH = "relative_path"
+
+
+class PluginSettings:
+    CONFIG = "settings_config"
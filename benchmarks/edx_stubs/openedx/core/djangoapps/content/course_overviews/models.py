@@ -0,0 +1,22 @@
+from django.db import models
+
+
+class CourseOverview(models.Model):
+    id = models.CharField(max_length=255, primary_key=True)
+    display_name = models.TextField(null=True)
+    start = models.DateTimeField(null=True)
+    end = models.DateTimeField(null=True)
+    enrollment_start = models.DateTimeField(null=True)
+    enrollment_end = models.DateTimeField(null=True)
+    invite_only = models.BooleanField(default=False)
+
+    class Meta:
+        app_label = "course_overviews"
+
+    @property
+    def display_name_with_default(self):
+        return self.display_name or str(self.id)
+
+    @classmethod
+    def get_from_id(cls, key):
+        return cls.objects.get(id=str(key))
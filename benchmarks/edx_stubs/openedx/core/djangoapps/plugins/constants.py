@@ -0,0 +1,2 @@
+class ProjectType:
+    LMS = "lms.djangoapp"
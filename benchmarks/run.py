@@ -0,0 +1,330 @@
+"""
+Load-test driver for payment_gateway_api.
+
+Starts the stub node, builds a throw-away database with the edx stubs, then
+drives each endpoint through the full Django request stack (middleware, auth,
+views, ORM) from ``--concurrency`` threads. For every endpoint it reports
+p50/p95/p99 latency, requests/second, error count and database queries per
+request, and writes everything to a JSON file so runs can be compared.
+
+Every view declares a query budget (payment_gateway_api.querybudget); the
+report shows the most queries a view ran against its budget, and
+``--enforce-budgets`` exits non-zero if any request went over.
+
+    python benchmarks/run.py                                # all scenarios
+    python benchmarks/run.py -c 16 -n 2000 --node-latency 0.1 -s checkout,confirm
+    python benchmarks/run.py --compare benchmarks/results/<older>.json
+    python benchmarks/run.py -n 100 --enforce-budgets
+
+Numbers are relative: SQLite serialises writers (see bench_settings.py to use
+MySQL) and the in-process test client skips the WSGI server.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "bench_settings")
+
+from stub_node import StubNode  # noqa: E402
+
+SCENARIOS = ["course_price", "checkout", "confirm", "return_page"]
+COURSES = 20
+
+
+class Stats:
+    """Per-endpoint samples; list.append is atomic under the GIL."""
+
+    def __init__(self) -> None:
+        self.latency: List[float] = []
+        self.queries: List[int] = []
+        self.view_queries: List[int] = []
+        self.budget: Optional[int] = None
+        self.over_budget = 0
+        self.errors = 0
+        self.codes: Dict[int, int] = {}
+        self.wall = 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        lat = sorted(self.latency)
+        n = len(lat)
+
+        def pct(p: float) -> float:
+            return round(lat[min(n - 1, int(p * n))] * 1000, 2) if n else 0.0
+
+        return {
+            "requests": n,
+            "errors": self.errors,
+            "status_codes": {str(k): v for k, v in sorted(self.codes.items())},
+            "rps": round(n / self.wall, 1) if self.wall else 0.0,
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "p99_ms": pct(0.99),
+            "mean_ms": round(statistics.fmean(lat) * 1000, 2) if n else 0.0,
+            "queries_mean": round(statistics.fmean(self.queries), 2) if self.queries else 0.0,
+            "queries_max": max(self.queries) if self.queries else 0,
+            "view_queries_max": max(self.view_queries) if self.view_queries else 0,
+            "query_budget": self.budget,
+            "over_budget": self.over_budget,
+        }
+
+
+def _setup(args: argparse.Namespace, node: StubNode) -> Dict[str, Any]:
+    import django
+    from django.conf import settings
+
+    db_path = settings.DATABASES["default"]["NAME"]
+    if settings.DATABASES["default"]["ENGINE"].endswith("sqlite3") and os.path.exists(db_path):
+        os.remove(db_path)
+    settings.PAYMENT_NODE_CREATE_URL = node.url + "/api/payments/create"
+    settings.PAYMENT_NODE_STATUS_URL = node.url + "/api/payments/status"
+    django.setup()
+
+    from django.core.management import call_command
+    from django.db import connection
+
+    call_command("migrate", run_syncdb=True, verbosity=0)
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cur:
+            cur.execute("PRAGMA journal_mode=WAL")
+
+    from django.contrib.auth.models import User
+    from common.djangoapps.course_modes.models import CourseMode
+    from openedx.core.djangoapps.content.course_overviews.models import CourseOverview
+
+    course_ids = [f"course-v1:Bench+C{i}+2025" for i in range(COURSES)]
+    CourseOverview.objects.bulk_create([CourseOverview(id=cid, display_name=cid) for cid in course_ids])
+    CourseMode.objects.bulk_create(
+        [CourseMode(course_id=cid, mode_slug="verified", mode_display_name="Verified", min_price=100000,
+                    currency="VND") for cid in course_ids]
+        + [CourseMode(course_id=cid, mode_slug="audit", mode_display_name="Audit") for cid in course_ids]
+    )
+    users = [User.objects.create_user(f"bench{i}", f"bench{i}@example.com", "pw") for i in range(args.concurrency)]
+    staff = User.objects.create_user("bench-staff", "staff@example.com", "pw", is_staff=True)
+    return {"course_ids": course_ids, "users": users, "staff": staff}
+
+
+def _pending_orders(ctx: Dict[str, Any], n: int, tag: str) -> List[Any]:
+    from payment_gateway_api.models import Order
+
+    users = ctx["users"]
+    orders = [
+        Order(user=users[i % len(users)], course_id=random.choice(ctx["course_ids"]), mode="verified",
+              amount=100000, currency="VND", status=Order.Status.PENDING, provider="vnpay",
+              external_txn_id=f"SEED-{tag}-{i}")
+        for i in range(n)
+    ]
+    Order.objects.bulk_create(orders, batch_size=500)
+    return list(Order.objects.filter(external_txn_id__startswith=f"SEED-{tag}-").values_list("uid", "amount", "currency"))
+
+
+def _make_requests(name: str, ctx: Dict[str, Any], n: int) -> List[Tuple[str, Callable[[Any], Any], Tuple[int, ...]]]:
+    """(client role, request function, expected status codes) per request."""
+    from payment_gateway_api import signing
+
+    cids = ctx["course_ids"]
+    if name == "course_price":
+        return [("staff", lambda c, cid=random.choice(cids): c.get("/payment-gateway/api/course-price/",
+                                                                    {"course_id": cid}), (200,))
+                for _ in range(n)]
+    if name == "checkout":
+        return [("user", lambda c, cid=random.choice(cids): c.get(
+            "/payment-gateway/api/checkout/", {"course_id": cid}, HTTP_IDEMPOTENCY_KEY=uuid.uuid4().hex), (302,))
+            for _ in range(n)]
+    rows = _pending_orders(ctx, n, name)
+    if name == "confirm":
+        ring = signing.keyring()
+        out = []
+        for uid, amount, currency in rows:
+            raw = signing.canonical_json({"order_uid": str(uid), "amount": str(amount), "currency": currency,
+                                          "status": "success", "txn_id": "TXN-" + uid.hex})
+            out.append(("anon", lambda c, raw=raw, sig=ring.sign(raw): c.post(
+                "/payment-gateway/internal/confirm/", raw, content_type="application/json",
+                HTTP_X_SIGNATURE=sig), (200,)))
+        return out
+    if name == "return_page":
+        return [("anon", lambda c, uid=uid: c.get(f"/payment-gateway/return/{uid}/"), (200,)) for uid, _, _ in rows]
+    raise ValueError(f"unknown scenario {name}")
+
+
+def _run_scenario(name: str, ctx: Dict[str, Any], args: argparse.Namespace) -> Dict[str, Any]:
+    from django.db import close_old_connections, connection
+    from django.test import Client
+
+    todo = _make_requests(name, ctx, args.requests)
+    stats = Stats()
+    local = threading.local()
+
+    def client(role: str) -> Client:
+        # One logged-in client per worker thread and role
+        key = f"client_{role}"
+        c = getattr(local, key, None)
+        if c is None:
+            c = Client()
+            if role == "user":
+                c.force_login(ctx["users"][threading.get_ident() % len(ctx["users"])])
+            elif role == "staff":
+                c.force_login(ctx["staff"])
+            setattr(local, key, c)
+        return c
+
+    def one(item: Tuple[str, Callable[[Any], Any], Tuple[int, ...]]) -> None:
+        role, fn, ok = item
+        c = client(role)
+        queries = [0]
+
+        def count(execute: Callable[..., Any], sql: str, params: Any, many: bool, context: Any) -> Any:
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        with connection.execute_wrapper(count):
+            resp = fn(c)
+        stats.latency.append(time.perf_counter() - start)
+        stats.queries.append(queries[0])
+        # View query count, set on the request by querybudget
+        req = getattr(resp, "wsgi_request", None)
+        if req is not None and hasattr(req, "payment_query_count"):
+            stats.view_queries.append(req.payment_query_count)
+            stats.budget = req.payment_query_budget
+            if req.payment_query_count > req.payment_query_budget:
+                stats.over_budget += 1
+        stats.codes[resp.status_code] = stats.codes.get(resp.status_code, 0) + 1
+        if resp.status_code not in ok:
+            stats.errors += 1
+
+    def worker(items: List[Any]) -> None:
+        try:
+            for item in items:
+                one(item)
+        finally:
+            close_old_connections()
+            connection.close()
+
+    # Warm-up: login, pricing cache, connection pools
+    for item in todo[: args.warmup]:
+        one(item)
+    # Budgets must hold with cold caches too: keep the warm-up query counts
+    cold, stats = stats, Stats()
+    stats.view_queries, stats.budget, stats.over_budget = cold.view_queries, cold.budget, cold.over_budget
+    todo = todo[args.warmup:]
+    chunks = [todo[i:: args.concurrency] for i in range(args.concurrency)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(worker, chunks))
+    stats.wall = time.perf_counter() - start
+    return stats.summary()
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _compare(current: Dict[str, Any], path: str) -> None:
+    with open(path, encoding="utf-8") as f:
+        base = json.load(f)
+    print(f"\ncompared with {path} ({base['meta'].get('git_rev')})")
+    print(f"{'endpoint':<14}{'p50 ms':>26}{'p95 ms':>26}{'rps':>26}{'queries':>16}")
+    for name, cur in current["results"].items():
+        old = base["results"].get(name)
+        if not old:
+            continue
+
+        def cell(key: str) -> str:
+            a, b = old[key], cur[key]
+            delta = f"{(b - a) / a * 100:+.0f}%" if a else "n/a"
+            return f"{a}->{b} ({delta})"
+
+        print(f"{name:<14}{cell('p50_ms'):>26}{cell('p95_ms'):>26}{cell('rps'):>26}"
+              f"{str(old['queries_mean']) + '->' + str(cur['queries_mean']):>16}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-c", "--concurrency", type=int, default=8)
+    parser.add_argument("-n", "--requests", type=int, default=500, help="Requests per scenario.")
+    parser.add_argument("-s", "--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--warmup", type=int, default=20, help="Untimed requests before each scenario.")
+    parser.add_argument("--node-latency", type=float, default=0.02, help="Stub node response delay (s).")
+    parser.add_argument("--node-error-rate", type=float, default=0.0, help="Fraction of stub node 500s.")
+    parser.add_argument("--out", default=None, help="Result file (default benchmarks/results/<time>-<rev>.json).")
+    parser.add_argument("--compare", default=None, help="Earlier result file to diff against.")
+    parser.add_argument("--enforce-budgets", action="store_true",
+                        help="Exit with status 1 if any request ran more queries than its view budget.")
+    args = parser.parse_args()
+
+    names = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    bad = set(names) - set(SCENARIOS)
+    if bad:
+        parser.error(f"unknown scenarios: {', '.join(sorted(bad))}")
+    args.warmup = min(args.warmup, args.requests // 2)
+
+    node = StubNode(latency=args.node_latency, error_rate=args.node_error_rate).start()
+    try:
+        ctx = _setup(args, node)
+        import django
+        from django.db import connection
+
+        results = {}
+        for name in names:
+            results[name] = _run_scenario(name, ctx, args)
+            r = results[name]
+            print(f"{name:<14} {r['requests']:>6} req  {r['rps']:>8} rps  p50 {r['p50_ms']:>8} ms  "
+                  f"p95 {r['p95_ms']:>8} ms  p99 {r['p99_ms']:>8} ms  q/req {r['queries_mean']:>5}  "
+                  f"view q {r['view_queries_max']}/{r['query_budget']}  errors {r['errors']}")
+        node_calls = node.calls
+    finally:
+        node.stop()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_rev": _git_rev(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "node_latency": args.node_latency,
+            "node_error_rate": args.node_error_rate,
+            "node_calls": node_calls,
+        },
+        "results": results,
+    }
+    out: Optional[str] = args.out
+    if out is None:
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        out = os.path.join(HERE, "results", f"{stamp}-{report['meta']['git_rev']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {out}")
+    if args.compare:
+        _compare(report, args.compare)
+    over = {name: r["over_budget"] for name, r in results.items() if r["over_budget"]}
+    if over:
+        print("over query budget: " + ", ".join(f"{k} ({v} requests)" for k, v in over.items()))
+        if args.enforce_budgets:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Local stand-in for the Node payment service.
+
+- POST .../create -> {"checkout_url", "txn_id"} after ``latency`` seconds
+- POST .../status -> {"status": ...} (``status`` option, default "pending")
+- a fraction ``error_rate`` of requests answers 500
+
+Run standalone (e.g. for manual tests against a dev LMS):
+
+    python benchmarks/stub_node.py --port 3000 --latency 0.05 --error-rate 0.01
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict
+
+
+class _Server(ThreadingHTTPServer):
+    # bench_async.py opens hundreds of connections at once; the default backlog is 5
+    request_queue_size = 1024
+
+
+class StubNode:
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, status: str = "pending",
+                 host: str = "127.0.0.1", port: int = 0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.status = status
+        self.calls = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+        self.server = _Server((host, port), self._handler())
+        self.server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self) -> type:
+        node = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real service behind a pool
+            # Headers and body are separate writes; without this a reused connection waits on delayed ACKs
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+            def _send(self, code: int, body: Dict[str, Any]) -> None:
+                raw = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def do_POST(self) -> None:
+                n = int(self.headers.get("Content-Length") or 0)
+                try:
+                    data = json.loads(self.rfile.read(n) or b"{}")
+                except ValueError:
+                    data = {}
+                with node._lock:
+                    node.calls += 1
+                if node.latency:
+                    time.sleep(node.latency)
+                if node.error_rate and random.random() < node.error_rate:
+                    with node._lock:
+                        node.errors += 1
+                    self._send(500, {"error": "stub failure"})
+                    return
+                uid = str(data.get("order_uid", ""))
+                if self.path.rstrip("/").endswith("status"):
+                    self._send(200, {"order_uid": uid, "status": node.status})
+                else:
+                    self._send(200, {"checkout_url": f"https://pay.example/{uid}", "txn_id": "STUB-" + uid[:8]})
+
+        return Handler
+
+    def start(self) -> "StubNode":
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3000)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before answering.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500.")
+    parser.add_argument("--status", default="pending", help="Status returned by the status endpoint.")
+    args = parser.parse_args()
+    node = StubNode(args.latency, args.error_rate, args.status, args.host, args.port)
+    print(f"stub node listening on {node.url}")
+    try:
+        node.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+from typing import Any, Callable, Dict, List
+
+import pytest
+
+COURSE_IDS = [f"course-v1:Test+C{i}+2025" for i in range(3)]
+
+
+@pytest.fixture(scope="session")
+def django_db_setup(django_db_setup: None, django_db_blocker: Any) -> None:
+    from django.db import connection
+
+    with django_db_blocker.unblock():
+        if connection.vendor == "sqlite":
+            # Readers do not block the writer in threaded tests
+            with connection.cursor() as cur:
+                cur.execute("PRAGMA journal_mode=WAL")
+
+
+@pytest.fixture(scope="session")
+def node() -> Any:
+    from stub_node import StubNode
+
+    node = StubNode().start()
+    yield node
+    node.stop()
+
+
+@pytest.fixture(autouse=True)
+def _payment_settings(settings: Any, node: Any) -> None:
+    from django.core.cache import cache
+
+    settings.PAYMENT_NODE_CREATE_URL = node.url + "/api/payments/create"
+    settings.PAYMENT_NODE_STATUS_URL = node.url + "/api/payments/status"
+    cache.clear()
+
+
+@pytest.fixture
+def courses(db: None) -> List[str]:
+    from common.djangoapps.course_modes.models import CourseMode
+    from openedx.core.djangoapps.content.course_overviews.models import CourseOverview
+
+    CourseOverview.objects.bulk_create([CourseOverview(id=cid, display_name=cid) for cid in COURSE_IDS])
+    CourseMode.objects.bulk_create(
+        [CourseMode(course_id=cid, mode_slug="verified", mode_display_name="Verified", min_price=100000,
+                    currency="VND") for cid in COURSE_IDS]
+        + [CourseMode(course_id=cid, mode_slug="audit", mode_display_name="Audit") for cid in COURSE_IDS]
+    )
+    return COURSE_IDS
+
+
+@pytest.fixture
+def user(db: None) -> Any:
+    from django.contrib.auth.models import User
+
+    return User.objects.create_user("learner", "learner@example.com", "pw")
+
+
+@pytest.fixture
+def staff(db: None) -> Any:
+    from django.contrib.auth.models import User
+
+    return User.objects.create_user("staff", "staff@example.com", "pw", is_staff=True)
+
+
+@pytest.fixture
+def make_order(courses: List[str], user: Any) -> Callable[..., Any]:
+    from payment_gateway_api.models import Order
+
+    def make(**fields: Any) -> Any:
+        data: Dict[str, Any] = dict(user=user, course_id=courses[0], mode="verified", amount=100000, currency="VND",
+                                    status=Order.Status.PENDING, provider="vnpay")
+        data.update(fields)
+        order = Order.objects.create(**data)
+        # amount as stored (Decimal with the field's places), like a real order
+        order.refresh_from_db()
+        return order
+    return make
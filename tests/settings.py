@@ -0,0 +1,21 @@
+"""
+Django settings for the test suite: the benchmark settings (payment_gateway_api,
+edx-platform stand-ins, SQLite, ATOMIC_REQUESTS) with a file-backed test
+database, so tests with several threads share one database. Each run gets its
+own temporary directory, so concurrent runs do not share the file.
+"""
+
+import atexit
+import os
+import shutil
+import tempfile
+
+from bench_settings import *  # noqa: F401,F403
+from bench_settings import DATABASES
+
+_TMP = tempfile.mkdtemp(prefix="payment-gateway-test-")
+atexit.register(shutil.rmtree, _TMP, ignore_errors=True)
+
+DATABASES["default"]["TEST"] = {
+    "NAME": os.environ.get("TEST_DB_PATH") or os.path.join(_TMP, "test.sqlite3"),
+}
@@ -0,0 +1,149 @@
+"""Archiving: finished orders move to OrderArchive in batches, later callbacks resolve as
+"archived", and the staff-only events API keeps the history of an archived order."""
+
+from datetime import timedelta
+from io import StringIO
+from typing import Any, Callable
+
+import pytest
+from django.core.management import call_command
+from django.test import Client
+from django.utils import timezone
+
+from .utils import signed
+
+
+@pytest.fixture
+def old_order(make_order: Any) -> Callable[..., Any]:
+    """make_order, then backdated: created_at is auto_now_add."""
+    from payment_gateway_api.models import Order
+
+    def make(days: int = 200, **fields: Any) -> Any:
+        order = make_order(**fields)
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(days=days))
+        order.refresh_from_db()
+        return order
+    return make
+
+
+def _archive(**kwargs: Any) -> Any:
+    from payment_gateway_api import archive
+
+    return archive.archive_orders(older_than=timedelta(days=180), **kwargs)
+
+
+@pytest.mark.django_db
+def test_round_trip_keeps_the_order_fields(old_order: Any) -> None:
+    from payment_gateway_api.archive import ARCHIVE_FIELDS
+    from payment_gateway_api.models import Order, OrderArchive
+
+    order = old_order(status=Order.Status.PAID, external_txn_id="TXN-1")
+    fields = [f for f in ARCHIVE_FIELDS if f != "id"]
+    before = Order.objects.filter(pk=order.pk).values(*fields).get()
+
+    assert _archive() == {"batches": 1, "archived": 1}
+
+    assert not Order.objects.filter(pk=order.pk).exists()
+    assert OrderArchive.objects.filter(uid=order.uid).values(*fields).get() == before
+
+
+@pytest.mark.django_db
+def test_only_old_finished_single_orders_move(old_order: Any) -> None:
+    from payment_gateway_api.models import Order, OrderArchive
+
+    keep = [
+        old_order(status=Order.Status.PENDING),
+        old_order(days=10, status=Order.Status.PAID),
+        old_order(status=Order.Status.PAID, kind=Order.Kind.BULK),
+    ]
+    moved = [old_order(status=s) for s in (Order.Status.PAID, Order.Status.FAILED, Order.Status.CANCELED)]
+
+    assert _archive(dry_run=True) == {"batches": 0, "archived": 0, "would_archive": 3}
+    assert _archive()["archived"] == 3
+
+    assert set(Order.objects.values_list("uid", flat=True)) == {o.uid for o in keep}
+    assert set(OrderArchive.objects.values_list("uid", flat=True)) == {o.uid for o in moved}
+
+
+@pytest.mark.django_db
+def test_batch_size_and_max_batches(old_order: Any) -> None:
+    from payment_gateway_api.models import Order, OrderArchive
+
+    orders = [old_order(status=Order.Status.PAID) for _ in range(5)]
+
+    assert _archive(batch_size=2, max_batches=1) == {"batches": 1, "archived": 2}
+    # Oldest ids first
+    assert set(OrderArchive.objects.values_list("uid", flat=True)) == {o.uid for o in orders[:2]}
+    assert _archive(batch_size=2) == {"batches": 2, "archived": 3}
+    assert not Order.objects.exists() and OrderArchive.objects.count() == 5
+
+
+@pytest.mark.django_db
+def test_command_uses_the_settings(old_order: Any, settings: Any) -> None:
+    from payment_gateway_api.models import Order
+
+    settings.PAYMENT_ARCHIVE_BATCH_SIZE = 2
+    for _ in range(3):
+        old_order(status=Order.Status.PAID)
+    out = StringIO()
+
+    call_command("archive_payment_orders", stdout=out)
+
+    assert out.getvalue().strip() == "archived 3 order(s) in 2 batch(es)"
+
+
+@pytest.mark.django_db
+def test_callbacks_after_archiving_resolve_as_archived(old_order: Any, monkeypatch: Any) -> None:
+    from payment_gateway_api import processing
+    from payment_gateway_api.models import Order
+
+    monkeypatch.setattr(processing, "enroll", lambda order: None)
+    order = old_order(status=Order.Status.PAID, external_txn_id="TXN-1")
+    note = {"order_uid": str(order.uid), "amount": str(order.amount), "currency": order.currency,
+            "status": "success", "txn_id": "TXN-1"}
+    _archive()
+
+    single = Client().post("/payment-gateway/internal/confirm/", **signed(note))
+    batch = Client().post("/payment-gateway/internal/confirm/batch/", **signed([note]))
+
+    assert single.json() == {"ok": True, "archived": True}
+    assert batch.json()["results"] == [{"order_uid": str(order.uid), "ok": True, "result": "archived"}]
+    assert not Order.objects.filter(uid=order.uid).exists()
+
+
+@pytest.mark.django_db
+def test_status_and_events_survive_archiving(old_order: Any, user: Any, staff: Any) -> None:
+    from payment_gateway_api import events
+    from payment_gateway_api.models import Order
+
+    order = old_order(status=Order.Status.PAID)
+    events.record(order, Order.Status.PENDING, "confirm")
+    _archive()
+    owner, admin = Client(), Client()
+    owner.force_login(user)
+    admin.force_login(staff)
+
+    status = owner.get(f"/payment-gateway/api/orders/{order.uid}/status")
+    history = admin.get(f"/payment-gateway/api/orders/{order.uid}/events")
+
+    assert (status.status_code, status.json()["status"]) == (200, "PAID")
+    assert [(e["from_status"], e["to_status"]) for e in history.json()["events"]] == [("PENDING", "PAID")]
+
+
+@pytest.mark.django_db
+def test_order_events_is_staff_only(make_order: Any, user: Any, staff: Any) -> None:
+    from payment_gateway_api import events
+    from payment_gateway_api.models import Order
+
+    order = make_order(status=Order.Status.PAID)
+    events.record(order, Order.Status.PENDING, "confirm")
+    url = f"/payment-gateway/api/orders/{order.uid}/events"
+    learner, admin = Client(), Client()
+    learner.force_login(user)
+    admin.force_login(staff)
+
+    denied = learner.get(url)
+
+    assert (denied.status_code, denied.content) == (403, b"Forbidden")
+    assert Client().get(url).status_code == 302  # anonymous: login page
+    assert admin.get(url).status_code == 200
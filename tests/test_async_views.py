@@ -0,0 +1,50 @@
+"""Async views keep blocking work (ORM, cache) off the event loop."""
+
+import asyncio
+import time
+from typing import Any, List
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncRequestFactory
+
+
+def _signed_with_nonce(note: dict, nonce: str) -> dict:
+    from payment_gateway_api import signing
+
+    raw = signing.canonical_json(note)
+    ts = str(int(time.time()))
+    sig = signing.keyring().sign(raw, prefix=f"{ts}.{nonce}.".encode())
+    return {"data": raw, "content_type": "application/json",
+            "headers": {"X-Signature": sig, "X-Timestamp": ts, "X-Nonce": nonce}}
+
+
+@pytest.mark.django_db
+def test_confirm_checks_nonce_off_the_event_loop(make_order: Any, monkeypatch: Any) -> None:
+    from payment_gateway_api import async_views, processing, signing
+
+    monkeypatch.setattr(processing, "enroll", lambda order: None)
+    on_loop: List[bool] = []
+    real_add = signing.cache.add
+
+    def add(*args: Any, **kwargs: Any) -> Any:
+        try:
+            asyncio.get_running_loop()
+            on_loop.append(True)
+        except RuntimeError:
+            on_loop.append(False)
+        return real_add(*args, **kwargs)
+
+    monkeypatch.setattr(signing.cache, "add", add)
+    order = make_order()
+    note = {"order_uid": str(order.uid), "amount": str(order.amount), "currency": order.currency,
+            "status": "success", "txn_id": "TXN-async"}
+    body = _signed_with_nonce(note, "nonce-1")
+    rf = AsyncRequestFactory()
+    confirm = async_to_sync(async_views.confirm)
+
+    first = confirm(rf.post("/confirm", **body))
+    replay = confirm(rf.post("/confirm", **body))
+
+    assert (first.status_code, replay.status_code) == (200, 403)
+    assert on_loop == [False, False]
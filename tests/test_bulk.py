@@ -0,0 +1,250 @@
+"""Group orders: only staff can name accounts; everyone else sends email invitations that
+the invited account claims through a signed link."""
+
+import json
+from typing import Any, Dict, List
+
+import pytest
+from django.test import Client
+
+URL = "/payment-gateway/api/bulk-checkout/"
+
+
+def _post(user: Any, lines: List[Dict[str, Any]], **headers: str) -> Any:
+    c = Client()
+    c.force_login(user)
+    return c.post(URL, json.dumps({"lines": lines}), content_type="application/json", headers=headers)
+
+
+def _pay_and_enroll(uid: str) -> None:
+    from payment_gateway_api import bulk
+    from payment_gateway_api.models import Order
+
+    order = Order.objects.get(uid=uid)
+    Order.objects.filter(pk=order.pk).update(status=Order.Status.PAID)
+    bulk.enroll_order(order.pk)
+
+
+@pytest.fixture
+def other(db: None) -> Any:
+    from django.contrib.auth.models import User
+
+    return User.objects.create_user("other", "other@example.com", "pw")
+
+
+@pytest.mark.django_db
+def test_learner_cannot_name_accounts(user: Any, other: Any, courses: List[str]) -> None:
+    known = _post(user, [{"username": "other", "course_id": courses[0]}])
+    unknown = _post(user, [{"username": "nobody", "course_id": courses[0]}])
+
+    assert known.status_code == unknown.status_code == 400
+    # Same answer whether or not the account exists
+    assert known.content == unknown.content
+    assert b"other" not in known.content
+
+
+@pytest.mark.django_db
+def test_unknown_username_is_not_echoed(staff: Any, courses: List[str]) -> None:
+    resp = _post(staff, [{"username": "nobody", "course_id": courses[0]}])
+
+    assert resp.status_code == 400
+    assert b"nobody" not in resp.content
+
+
+@pytest.mark.django_db
+def test_learner_email_seats_are_invitations(user: Any, other: Any, courses: List[str], monkeypatch: Any) -> None:
+    from common.djangoapps.student.models import CourseEnrollment, CourseEnrollmentAllowed
+    from payment_gateway_api import tasks
+    from payment_gateway_api.models import OrderLine
+
+    monkeypatch.setattr(tasks, "enqueue_bulk_enrollment", lambda pk: None)
+    resp = _post(user, [{"email": "other@example.com", "course_id": courses[0]},
+                        {"email": "new@example.com", "course_id": courses[0]}])
+    assert resp.status_code == 201
+
+    _pay_and_enroll(resp.json()["order_uid"])
+
+    # An existing account is invited like everyone else, never enrolled on someone else's order
+    assert not CourseEnrollment.objects.filter(user=other).exists()
+    assert set(CourseEnrollmentAllowed.objects.values_list("email", flat=True)) == {
+        "other@example.com", "new@example.com"}
+    assert set(OrderLine.objects.values_list("status", flat=True)) == {OrderLine.Status.INVITED}
+
+
+@pytest.mark.django_db
+def test_staff_seats_enroll_accounts(staff: Any, other: Any, courses: List[str], monkeypatch: Any) -> None:
+    from common.djangoapps.student.models import CourseEnrollment
+    from payment_gateway_api import tasks
+    from payment_gateway_api.models import OrderLine
+
+    monkeypatch.setattr(tasks, "enqueue_bulk_enrollment", lambda pk: None)
+    resp = _post(staff, [{"username": "other", "course_id": courses[0]},
+                         {"email": "other@example.com", "course_id": courses[1]}])
+    assert resp.status_code == 201
+
+    _pay_and_enroll(resp.json()["order_uid"])
+
+    assert set(CourseEnrollment.objects.filter(user=other).values_list("course_id", flat=True)) == set(courses[:2])
+    assert set(OrderLine.objects.values_list("status", flat=True)) == {OrderLine.Status.ENROLLED}
+
+
+# The duplicate INSERT must fail outside a test transaction
+@pytest.mark.django_db(transaction=True)
+def test_idempotency_key_never_resolves_to_a_single_order(user: Any, courses: List[str], make_order: Any,
+                                                          monkeypatch: Any) -> None:
+    from payment_gateway_api import payments, tasks
+    from payment_gateway_api.models import Order
+
+    monkeypatch.setattr(tasks, "enqueue_bulk_enrollment", lambda pk: None)
+    single = make_order(idempotency_key=payments.idempotency_key(user.id, courses[0], "verified", "k1"))
+    lines = [{"email": "a@example.com", "course_id": courses[0]}]
+
+    first = _post(user, lines, **{"Idempotency-Key": "k1"})
+    again = _post(user, lines, **{"Idempotency-Key": "k1"})
+
+    assert first.status_code == 201
+    assert first.json()["order_uid"] != str(single.uid)
+    assert again.status_code == 200 and again.json()["duplicate"] is True
+    assert again.json()["order_uid"] == first.json()["order_uid"]
+    assert Order.objects.get(uid=first.json()["order_uid"]).kind == Order.Kind.BULK
+
+
+@pytest.mark.django_db(transaction=True)
+def test_same_lines_after_the_window_make_a_new_order(user: Any, courses: List[str], settings: Any,
+                                                      monkeypatch: Any) -> None:
+    from datetime import timedelta
+
+    from django.utils import timezone
+    from payment_gateway_api import tasks
+    from payment_gateway_api.models import Order
+
+    monkeypatch.setattr(tasks, "enqueue_bulk_enrollment", lambda pk: None)
+    settings.PAYMENT_IDEMPOTENCY_WINDOW = 900
+    lines = [{"email": "a@example.com", "course_id": courses[0]}]
+
+    first = _post(user, lines)
+    again = _post(user, lines)
+    Order.objects.update(created_at=timezone.now() - timedelta(seconds=901))
+    later = _post(user, lines)
+
+    assert (first.status_code, again.status_code, later.status_code) == (201, 200, 201)
+    assert again.json()["order_uid"] == first.json()["order_uid"] != later.json()["order_uid"]
+
+
+def _invites(user: Any, uid: str) -> List[Dict[str, Any]]:
+    c = Client()
+    c.force_login(user)
+    return c.get(f"/payment-gateway/api/bulk-orders/{uid}/", {"invites": "1"}).json()["invites"]
+
+
+@pytest.fixture
+def invited(user: Any, other: Any, courses: List[str], monkeypatch: Any) -> Dict[str, Any]:
+    """A paid learner order: verified seats for an existing account and for a new email."""
+    from payment_gateway_api import tasks
+
+    monkeypatch.setattr(tasks, "enqueue_bulk_enrollment", lambda pk: None)
+    resp = _post(user, [{"email": "other@example.com", "course_id": courses[0], "mode": "verified"},
+                        {"email": "new@example.com", "course_id": courses[1], "mode": "verified"}])
+    uid = resp.json()["order_uid"]
+    _pay_and_enroll(uid)
+    return {i["email"]: i for i in _invites(user, uid)}
+
+
+@pytest.mark.django_db
+def test_buyer_gets_a_claim_link_per_invitation(invited: Dict[str, Any], courses: List[str]) -> None:
+    assert {(e, i["course_id"], i["mode"]) for e, i in invited.items()} == {
+        ("other@example.com", courses[0], "verified"), ("new@example.com", courses[1], "verified")}
+    assert len({i["claim_url"] for i in invited.values()}) == 2
+
+
+@pytest.mark.django_db
+def test_existing_account_claims_its_verified_seat(invited: Dict[str, Any], other: Any, courses: List[str]) -> None:
+    from common.djangoapps.student.models import CourseEnrollment
+    from payment_gateway_api.models import OrderLine
+
+    c = Client()
+    c.force_login(other)
+    url = invited["other@example.com"]["claim_url"]
+
+    page = c.get(url)
+    assert page.status_code == 200 and b"verified" in page.content
+    assert not CourseEnrollment.objects.filter(user=other).exists()
+
+    resp = c.post(url)
+    again = c.post(url)
+
+    assert resp.status_code == again.status_code == 302
+    assert list(CourseEnrollment.objects.filter(user=other).values_list("course_id", "mode")) == [
+        (courses[0], "verified")]
+    line = OrderLine.objects.get(email="other@example.com")
+    assert (line.status, line.user_id) == (OrderLine.Status.ENROLLED, other.pk)
+
+
+@pytest.mark.django_db
+def test_claim_upgrades_an_auto_enrollment_to_the_paid_mode(invited: Dict[str, Any], courses: List[str]) -> None:
+    from django.contrib.auth.models import User
+    from common.djangoapps.student.models import CourseEnrollment
+
+    # CourseEnrollmentAllowed has no mode: registering enrolls the new account in the default mode
+    other = User.objects.get(username="other")
+    CourseEnrollment.enroll(other, courses[0], "audit")
+    c = Client()
+    c.force_login(other)
+
+    c.post(invited["other@example.com"]["claim_url"])
+
+    assert CourseEnrollment.objects.get(user=other, course_id=courses[0]).mode == "verified"
+
+
+@pytest.mark.django_db
+def test_claim_is_for_the_invited_verified_email_only(invited: Dict[str, Any], user: Any, other: Any) -> None:
+    from common.djangoapps.student.models import CourseEnrollment
+    from payment_gateway_api import bulk
+
+    url = invited["other@example.com"]["claim_url"]
+    buyer = Client()
+    buyer.force_login(user)
+
+    wrong = buyer.post(url)
+    tampered = buyer.post(url.replace("/claim/", "/claim/9"))
+    # The LMS lets accounts that have not confirmed their email sign in
+    other.is_active = False
+    with pytest.raises(bulk.ClaimRejected) as inactive:
+        bulk.claim(url.split("/")[-2], other)
+
+    assert (wrong.status_code, tampered.status_code) == (403, 403)
+    # The answer is about the signed-in account; it says nothing about who else has one
+    assert wrong.content.decode() == str(inactive.value) == "This invitation is for another email address"
+    assert tampered.content == b"Invalid invitation link"
+    assert not CourseEnrollment.objects.exists()
+
+
+@pytest.mark.django_db
+def test_a_claimed_seat_cannot_be_claimed_again(invited: Dict[str, Any], other: Any) -> None:
+    from django.contrib.auth.models import User
+
+    url = invited["other@example.com"]["claim_url"]
+    first = Client()
+    first.force_login(other)
+    first.post(url)
+    # Same email on a second account (e.g. changed afterwards)
+    twin = User.objects.create_user("twin", "Other@Example.com", "pw")
+    second = Client()
+    second.force_login(twin)
+
+    resp = second.post(url)
+
+    assert (resp.status_code, resp.content) == (403, b"Invitation already used")
+
+
+@pytest.mark.django_db
+def test_retry_invited_skips_learner_orders(invited: Dict[str, Any], staff: Any, courses: List[str]) -> None:
+    from payment_gateway_api import bulk
+    from payment_gateway_api.models import OrderLine
+
+    resp = _post(staff, [{"email": "x@example.com", "course_id": courses[2]}])
+    _pay_and_enroll(resp.json()["order_uid"])
+
+    assert bulk.requeue([OrderLine.Status.INVITED]) == 1
+    assert set(OrderLine.objects.filter(status=OrderLine.Status.PENDING).values_list("email", flat=True)) == {
+        "x@example.com"}
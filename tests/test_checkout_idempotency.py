@@ -0,0 +1,93 @@
+"""Repeated checkouts reuse the order that holds the idempotency key (duplicate -> _resume_checkout)."""
+
+import time
+from datetime import timedelta
+from typing import Any, List, Optional
+
+import pytest
+from django.test import Client
+from django.utils import timezone
+
+URL = "/payment-gateway/api/checkout/"
+# The duplicate INSERT must fail outside a test transaction
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+def _checkout(user: Any, course_id: str, client_key: Optional[str] = None) -> Any:
+    c = Client()
+    c.force_login(user)
+    headers = {"Idempotency-Key": client_key} if client_key else {}
+    return c.get(URL, {"course_id": course_id}, headers=headers)
+
+
+def _derived_key(user: Any, course_id: str) -> Optional[str]:
+    from payment_gateway_api import payments
+
+    return payments.idempotency_key(user.id, course_id, "verified")
+
+
+def test_double_click_across_a_window_boundary_makes_one_order(user: Any, courses: List[str], settings: Any,
+                                                               monkeypatch: Any) -> None:
+    from payment_gateway_api.models import Order
+
+    settings.PAYMENT_IDEMPOTENCY_WINDOW = 900
+    boundary = (int(time.time()) // 900 + 1) * 900
+
+    monkeypatch.setattr(time, "time", lambda: boundary - 0.5)
+    first = _checkout(user, courses[0])
+    monkeypatch.setattr(time, "time", lambda: boundary + 0.5)
+    second = _checkout(user, courses[0])
+
+    assert first.status_code == second.status_code == 302
+    assert first["Location"] == second["Location"]
+    assert Order.objects.count() == 1
+
+
+@pytest.mark.parametrize("status, checkout_url, location", [
+    ("PENDING", "https://pay.example/1", "https://pay.example/1"),
+    ("PENDING", "", "/payment-gateway/prepare/{uid}/"),
+    ("PAID", "https://pay.example/1", "/payment-gateway/return/{uid}/"),
+    ("CANCELED", "", "/payment-gateway/return/{uid}/"),
+])
+def test_duplicate_resumes_the_order_holding_the_key(user: Any, courses: List[str], make_order: Any, status: str,
+                                                     checkout_url: str, location: str) -> None:
+    from payment_gateway_api.models import Order
+
+    old = make_order(status=status, checkout_url=checkout_url, idempotency_key=_derived_key(user, courses[0]))
+
+    resp = _checkout(user, courses[0])
+
+    assert (resp.status_code, resp["Location"]) == (302, location.format(uid=old.uid))
+    assert Order.objects.count() == 1
+
+
+def test_order_older_than_the_window_releases_the_key(user: Any, courses: List[str], make_order: Any,
+                                                       settings: Any) -> None:
+    from payment_gateway_api.models import Order
+
+    settings.PAYMENT_IDEMPOTENCY_WINDOW = 900
+    key = _derived_key(user, courses[0])
+    stale = make_order(checkout_url="https://pay.example/stale", idempotency_key=key)
+    Order.objects.filter(pk=stale.pk).update(created_at=timezone.now() - timedelta(seconds=901))
+
+    resp = _checkout(user, courses[0])
+
+    assert resp.status_code == 302 and resp["Location"] != "https://pay.example/stale"
+    new = Order.objects.exclude(pk=stale.pk).get()
+    assert new.idempotency_key == key and resp["Location"] == new.checkout_url
+    stale.refresh_from_db()
+    assert (stale.status, stale.idempotency_key) == (Order.Status.PENDING, None)
+
+
+def test_client_key_does_not_expire(user: Any, courses: List[str], make_order: Any) -> None:
+    from payment_gateway_api import payments
+    from payment_gateway_api.models import Order
+
+    old = make_order(checkout_url="https://pay.example/1",
+                     idempotency_key=payments.idempotency_key(user.id, courses[0], "verified", "client-1"))
+    Order.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=2))
+
+    resp = _checkout(user, courses[0], client_key="client-1")
+
+    assert resp["Location"] == "https://pay.example/1"
+    assert Order.objects.count() == 1
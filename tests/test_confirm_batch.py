@@ -0,0 +1,63 @@
+"""confirm_batch: configuration errors and a failing notification give clean responses."""
+
+from typing import Any
+
+import pytest
+from django.core.exceptions import ImproperlyConfigured
+from django.test import Client
+
+from .utils import signed
+
+URL = "/payment-gateway/internal/confirm/batch/"
+
+
+def _note(order: Any, **extra: Any) -> dict:
+    note = {"order_uid": str(order.uid), "amount": str(order.amount), "currency": order.currency,
+            "status": "success", "txn_id": f"TXN-{order.pk}"}
+    note.update(extra)
+    return note
+
+
+@pytest.mark.django_db
+def test_unconfigured_keyring_is_a_bad_request(monkeypatch: Any) -> None:
+    from payment_gateway_api import signing
+
+    def broken() -> Any:
+        raise ImproperlyConfigured("PAYMENT_SHARED_SECRET is not set")
+
+    body = signed([])
+    monkeypatch.setattr(signing, "keyring", broken)
+    assert Client().post(URL, **body).status_code == 400
+
+
+@pytest.mark.django_db
+def test_bad_signature_is_forbidden() -> None:
+    body = signed([])
+    body["HTTP_X_SIGNATURE"] = "v1=00"
+    assert Client().post(URL, **body).status_code == 403
+
+
+@pytest.mark.django_db
+def test_failing_notification_gets_its_own_result(make_order: Any, monkeypatch: Any) -> None:
+    from payment_gateway_api import processing, tasks
+    from payment_gateway_api.models import Order
+
+    monkeypatch.setattr(tasks, "enqueue_enrollments", lambda ids: None)
+    apply = processing.apply_notifications
+
+    def flaky(notes: list, source: str = "confirm_batch") -> list:
+        if any(n.get("poison") for n in notes):
+            raise RuntimeError("boom")
+        return apply(notes, source=source)
+
+    monkeypatch.setattr(processing, "apply_notifications", flaky)
+    good, bad = make_order(), make_order()
+
+    resp = Client().post(URL, **signed([_note(good), _note(bad, poison=True)]))
+
+    assert resp.status_code == 200
+    results = resp.json()["results"]
+    assert [r["ok"] for r in results] == [True, False]
+    assert "boom" in results[1]["error"]
+    assert Order.objects.get(pk=good.pk).status == Order.Status.PAID
+    assert Order.objects.get(pk=bad.pk).status == Order.Status.PENDING
@@ -0,0 +1,42 @@
+"""Concurrent confirm callbacks for one order: one transition, one enrollment, one event."""
+
+from typing import Any, List
+
+import pytest
+from django.test import Client
+
+from .utils import run_threads, signed
+
+N = 8
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_confirms_pay_once(make_order: Any, monkeypatch: Any) -> None:
+    from payment_gateway_api import processing
+    from payment_gateway_api.models import Order, OrderEvent
+
+    order = make_order()
+    enrolled: List[Any] = []
+    monkeypatch.setattr(processing, "enroll", lambda o: enrolled.append(o.pk))
+    transitions: List[bool] = []
+    finalize_paid = processing.finalize_paid
+
+    def counting(*args: Any, **kwargs: Any) -> bool:
+        done = finalize_paid(*args, **kwargs)
+        transitions.append(done)
+        return done
+
+    monkeypatch.setattr(processing, "finalize_paid", counting)
+    note = {"order_uid": str(order.uid), "amount": str(order.amount), "currency": order.currency,
+            "status": "success", "txn_id": "TXN-concurrent"}
+
+    codes = run_threads(N, lambda i: Client().post("/payment-gateway/internal/confirm/", **signed(note)).status_code)
+
+    assert codes == [200] * N
+    assert transitions.count(True) == 1
+    assert enrolled == [order.pk]
+    order.refresh_from_db()
+    assert order.status == Order.Status.PAID
+    assert order.external_txn_id == "TXN-concurrent"
+    events = list(OrderEvent.objects.filter(order_uid=order.uid))
+    assert [(e.from_status, e.to_status) for e in events] == [(Order.Status.PENDING, Order.Status.PAID)]
@@ -0,0 +1,67 @@
+"""Inbox worker: a failing message does not take the batch down; retries get a later drain."""
+
+from typing import Any, List
+
+import pytest
+
+
+def _note(order: Any, **extra: Any) -> dict:
+    note = {"order_uid": str(order.uid), "amount": str(order.amount), "currency": order.currency,
+            "status": "success", "txn_id": f"TXN-{order.pk}"}
+    note.update(extra)
+    return note
+
+
+@pytest.fixture
+def scheduled(monkeypatch: Any) -> List[int]:
+    from payment_gateway_api import tasks
+
+    calls: List[int] = []
+    monkeypatch.setattr(tasks, "enqueue_inbox_drain", lambda: None)
+    monkeypatch.setattr(tasks, "schedule_inbox_drain", calls.append)
+    monkeypatch.setattr(tasks, "enqueue_enrollments", lambda ids: None)
+    return calls
+
+
+@pytest.mark.django_db
+def test_bad_message_is_retried_alone(make_order: Any, monkeypatch: Any, scheduled: List[int]) -> None:
+    from payment_gateway_api import inbox, processing
+    from payment_gateway_api.models import InboxMessage, Order
+
+    orders = [make_order() for _ in range(3)]
+    apply = processing.apply_notifications
+
+    def flaky(notes: list, source: str = "confirm_batch") -> list:
+        if any(n.get("poison") for n in notes):
+            raise RuntimeError("boom")
+        return apply(notes, source=source)
+
+    monkeypatch.setattr(processing, "apply_notifications", flaky)
+    inbox.enqueue([_note(orders[0]), _note(orders[1], poison=True), _note(orders[2])])
+
+    total = inbox.drain()
+
+    assert (total["done"], total["retry"], total["dead"]) == (2, 1, 0)
+    statuses = dict(Order.objects.values_list("pk", "status"))
+    assert [statuses[o.pk] for o in orders] == [Order.Status.PAID, Order.Status.PENDING, Order.Status.PAID]
+    bad = InboxMessage.objects.get(status=InboxMessage.Status.NEW)
+    assert bad.order_uid == str(orders[1].uid)
+    assert bad.attempts == 1 and "boom" in bad.last_error
+    # The retry is due later: drain() books the next run for it
+    assert len(scheduled) == 1 and 1 <= scheduled[0] <= inbox.MAX_COUNTDOWN
+
+
+@pytest.mark.django_db
+def test_last_attempt_goes_dead(make_order: Any, settings: Any, scheduled: List[int]) -> None:
+    from payment_gateway_api import inbox
+    from payment_gateway_api.models import InboxMessage
+
+    settings.PAYMENT_INBOX_MAX_ATTEMPTS = 1
+    order = make_order()
+    inbox.enqueue([_note(order, amount="1")])
+
+    total = inbox.drain()
+
+    assert total["dead"] == 1
+    assert InboxMessage.objects.get().status == InboxMessage.Status.DEAD
+    assert scheduled == []
@@ -0,0 +1,55 @@
+"""The hot Order lookups are served by the indexes declared for them (EXPLAIN on SQLite)."""
+
+import re
+from datetime import timedelta
+from typing import Any, List
+
+import pytest
+from django.db import connection
+from django.utils import timezone
+
+pytestmark = pytest.mark.skipif(connection.vendor != "sqlite", reason="reads SQLite's EXPLAIN QUERY PLAN")
+
+
+def _index_columns(qs: Any) -> List[str]:
+    """Columns of the index the plan searches with (the unique constraint's index is unnamed on SQLite)."""
+    plan = qs.explain()
+    found = re.search(r"SEARCH \S+ USING (?:COVERING )?INDEX (\S+)", plan)
+    assert found, plan
+    with connection.cursor() as cur:
+        cur.execute(f'PRAGMA index_info("{found.group(1)}")')
+        return [row[2] for row in sorted(cur.fetchall())]
+
+
+@pytest.fixture
+def orders(make_order: Any) -> None:
+    for i in range(50):
+        make_order(external_txn_id=f"TXN-{i}")
+
+
+@pytest.mark.django_db
+def test_callback_lookup_by_txn_id(orders: None) -> None:
+    from payment_gateway_api.models import Order
+
+    qs = Order.objects.filter(external_txn_id="TXN-1", provider="vnpay")
+    assert _index_columns(qs) == ["external_txn_id", "provider"]
+    # external_txn_id leads the index, so a lookup without provider uses it too
+    assert _index_columns(Order.objects.filter(external_txn_id="TXN-1"))[0] == "external_txn_id"
+
+
+@pytest.mark.django_db
+def test_duplicate_order_lookup(orders: None, user: Any, courses: List[str]) -> None:
+    from payment_gateway_api.models import Order
+
+    qs = Order.objects.filter(user=user, course_id=courses[0], status=Order.Status.PENDING)
+    assert _index_columns(qs) == ["user_id", "course_id", "status"]
+
+
+@pytest.mark.django_db
+def test_stale_pending_scan(orders: None) -> None:
+    from payment_gateway_api.models import Order
+
+    qs = Order.objects.filter(status=Order.Status.PENDING, created_at__lt=timezone.now() - timedelta(minutes=30))
+    assert _index_columns(qs) == ["status", "created_at"]
+    # reconcile pages through the same filter by id
+    assert _index_columns(qs.order_by("id").values_list("id", "uid")[:200]) == ["status", "created_at"]
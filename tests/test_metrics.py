@@ -0,0 +1,90 @@
+"""Prometheus metrics: instrumented views feed the counters, /metrics needs staff or the token."""
+
+from typing import Any, Dict, Iterator, List, Optional
+
+import pytest
+from django.test import Client
+
+prometheus_client = pytest.importorskip("prometheus_client")
+
+METRICS_URL = "/payment-gateway/metrics"
+_shared: Dict[str, Any] = {}
+
+
+@pytest.fixture
+def enabled(settings: Any, monkeypatch: Any) -> Iterator[Any]:
+    from payment_gateway_api import metrics
+
+    settings.PAYMENT_METRICS_ENABLED = True
+    settings.PAYMENT_METRICS_TOKEN = "s3cret"
+    # The collectors live in the global registry, which accepts each name once per process
+    if "m" not in _shared:
+        _shared["m"] = metrics._Metrics(prometheus_client)
+    monkeypatch.setattr(metrics, "_state", _shared["m"])
+    yield _shared["m"]
+
+
+def _value(name: str, **labels: str) -> float:
+    return prometheus_client.REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.mark.django_db
+def test_checkout_feeds_request_phase_node_and_order_metrics(enabled: Any, user: Any, courses: List[str]) -> None:
+    names = {
+        "requests": ("payment_gateway_requests_total", {"endpoint": "checkout", "code": "302"}),
+        "latency": ("payment_gateway_request_seconds_count", {"endpoint": "checkout"}),
+        "pricing": ("payment_gateway_phase_seconds_count", {"phase": "pricing"}),
+        "db": ("payment_gateway_phase_seconds_count", {"phase": "db"}),
+        "node": ("payment_gateway_node_requests_total", {"op": "create", "outcome": "2xx"}),
+        "orders": ("payment_gateway_orders_total", {"status": "PENDING", "provider": "vnpay"}),
+    }
+    before = {k: _value(n, **labels) for k, (n, labels) in names.items()}
+    c = Client()
+    c.force_login(user)
+
+    resp = c.get("/payment-gateway/api/checkout/", {"course_id": courses[0]})
+
+    assert resp.status_code == 302
+    after = {k: _value(n, **labels) for k, (n, labels) in names.items()}
+    assert {k: after[k] - before[k] for k in names} == {k: 1.0 for k in names}
+    assert _value("payment_gateway_in_flight_requests", endpoint="checkout") == 0
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("auth", [None, "", "Bearer", "Bearer wrong", "Basic s3cret", "bearer s3cret"])
+def test_metrics_rejects_a_missing_or_wrong_token(enabled: Any, auth: Optional[str]) -> None:
+    headers = {} if auth is None else {"Authorization": auth}
+
+    resp = Client().get(METRICS_URL, headers=headers)
+
+    assert resp.status_code == 403
+    assert b"payment_gateway" not in resp.content
+
+
+@pytest.mark.django_db
+def test_metrics_with_the_token(enabled: Any) -> None:
+    resp = Client().get(METRICS_URL, headers={"Authorization": "Bearer s3cret"})
+
+    assert resp.status_code == 200
+    assert b"payment_gateway_requests_total" in resp.content
+
+
+@pytest.mark.django_db
+def test_metrics_token_unset_means_staff_only(enabled: Any, settings: Any, staff: Any, user: Any) -> None:
+    settings.PAYMENT_METRICS_TOKEN = ""
+    learner, admin = Client(), Client()
+    learner.force_login(user)
+    admin.force_login(staff)
+
+    assert Client().get(METRICS_URL, headers={"Authorization": "Bearer "}).status_code == 403
+    assert learner.get(METRICS_URL).status_code == 403
+    assert admin.get(METRICS_URL).status_code == 200
+
+
+@pytest.mark.django_db
+def test_metrics_disabled_is_not_found(monkeypatch: Any) -> None:
+    from payment_gateway_api import metrics
+
+    monkeypatch.setattr(metrics, "_state", False)
+
+    assert Client().get(METRICS_URL, headers={"Authorization": "Bearer s3cret"}).status_code == 404
@@ -0,0 +1,12 @@
+"""The migrations describe the models exactly: makemigrations has nothing to add."""
+
+import pytest
+from django.core.management import call_command
+
+
+@pytest.mark.django_db
+def test_no_missing_migrations() -> None:
+    try:
+        call_command("makemigrations", "payment_gateway_api", "--check", "--dry-run", verbosity=0)
+    except SystemExit:
+        pytest.fail("models differ from the migrations: run makemigrations payment_gateway_api")
@@ -0,0 +1,113 @@
+"""The Node client retries only failures that happen before the request is sent, and an
+aborted half-open probe does not leave the circuit breaker stuck."""
+
+import asyncio
+import socket
+import time
+import threading
+from typing import Any, Iterator, List
+
+import pytest
+
+
+@pytest.fixture
+def client() -> Any:
+    from payment_gateway_api.node_client import PaymentNodeClient
+
+    return PaymentNodeClient("http://unused", connect_timeout=1.0, read_timeout=1.0, max_retries=2, backoff=0)
+
+
+@pytest.fixture
+def attempts(client: Any, monkeypatch: Any) -> List[int]:
+    retries: List[int] = []
+    monkeypatch.setattr(client, "_sleep_before_retry", retries.append)
+    return retries
+
+
+@pytest.fixture
+def hangup_url() -> Iterator[str]:
+    """Accepts the connection, reads the request, then closes without answering."""
+    srv = socket.socket()
+    srv.bind(("127.0.0.1", 0))
+    srv.listen(8)
+
+    def serve() -> None:
+        while True:
+            try:
+                conn, _ = srv.accept()
+            except OSError:
+                return
+            conn.recv(65536)
+            conn.close()
+
+    threading.Thread(target=serve, daemon=True).start()
+    yield "http://127.0.0.1:%d/create" % srv.getsockname()[1]
+    srv.close()
+
+
+def _closed_port() -> int:
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def test_connection_refused_is_retried(client: Any, attempts: List[int]) -> None:
+    from payment_gateway_api.node_client import NodeError
+
+    with pytest.raises(NodeError):
+        client.post(f"http://127.0.0.1:{_closed_port()}/create", b"{}", {})
+    assert attempts == [1, 2]
+
+
+def test_hangup_after_send_is_not_retried(client: Any, attempts: List[int], hangup_url: str) -> None:
+    from payment_gateway_api.node_client import NodeError
+
+    with pytest.raises(NodeError):
+        client.post(hangup_url, b"{}", {})
+    assert attempts == []
+
+
+@pytest.fixture
+def silent_url() -> Iterator[str]:
+    """Accepts connections and reads requests, but never answers."""
+    srv = socket.socket()
+    srv.bind(("127.0.0.1", 0))
+    srv.listen(8)
+    held: List[socket.socket] = []
+
+    def serve() -> None:
+        while True:
+            try:
+                conn, _ = srv.accept()
+            except OSError:
+                return
+            held.append(conn)
+
+    threading.Thread(target=serve, daemon=True).start()
+    yield "http://127.0.0.1:%d/create" % srv.getsockname()[1]
+    srv.close()
+    for conn in held:
+        conn.close()
+
+
+def test_cancelled_half_open_probe_frees_the_breaker(silent_url: str) -> None:
+    from payment_gateway_api.node_client import PaymentNodeClient
+
+    client = PaymentNodeClient("http://unused", breaker_threshold=1, breaker_reset=0.05)
+    client.breaker.record_failure()
+    time.sleep(0.06)
+
+    async def probe_then_disconnect() -> None:
+        task = asyncio.ensure_future(client.apost(silent_url, b"{}", {}))
+        await asyncio.sleep(0.2)
+        assert client.breaker._probing
+        # What ASGI does to the view when the browser goes away
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(probe_then_disconnect())
+
+    assert client.breaker.allow()
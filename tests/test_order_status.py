@@ -0,0 +1,62 @@
+"""Order status API: owner-only, cache fills never overwrite a newer published status."""
+
+import types
+from typing import Any
+
+import pytest
+from django.test import Client
+
+
+def _url(order: Any) -> str:
+    return f"/payment-gateway/api/orders/{order.uid}/status"
+
+
+@pytest.mark.django_db
+def test_status_api_is_for_the_buyer_and_staff(make_order: Any, staff: Any) -> None:
+    from django.contrib.auth.models import User
+
+    order = make_order()
+    other = User.objects.create_user("other", "other@example.com", "pw")
+
+    def get(user: Any) -> Any:
+        c = Client()
+        if user is not None:
+            c.force_login(user)
+        return c.get(_url(order))
+
+    assert get(None).status_code == 302
+    assert get(other).status_code == 404
+    assert get(order.user).json()["status"] == "PENDING"
+    assert get(staff).status_code == 200
+
+
+@pytest.mark.django_db
+def test_fill_does_not_overwrite_published_status(make_order: Any, monkeypatch: Any) -> None:
+    from django.core.cache import cache
+    from payment_gateway_api import order_status
+
+    order = make_order()
+    key = order_status._key(order.uid)
+
+    def get(k: str, default: Any = None) -> Any:
+        # The cache miss is read, then a confirm publishes PAID before the DB read returns
+        cache.set(key, "PAID")
+        return None
+
+    proxy = types.SimpleNamespace(get=get, add=cache.add, set=cache.set)
+    monkeypatch.setattr(order_status, "cache", proxy)
+    assert order_status.get_status(order.uid) == "PENDING"
+    monkeypatch.undo()
+
+    assert order_status.get_status(order.uid) == "PAID"
+
+
+def test_longpoll_is_off_without_async_views() -> None:
+    from payment_gateway_api.settings.common import plugin_settings
+
+    sync = types.SimpleNamespace(ENV_TOKENS={})
+    plugin_settings(sync)
+    async_ = types.SimpleNamespace(ENV_TOKENS={"PAYMENT_ASYNC_VIEWS": True})
+    plugin_settings(async_)
+
+    assert (sync.PAYMENT_STATUS_LONGPOLL_MAX, async_.PAYMENT_STATUS_LONGPOLL_MAX) == (0, 20)
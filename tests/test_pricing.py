@@ -0,0 +1,147 @@
+"""Course pricing: CourseMode / CourseOverview changes refresh the snapshot and drop cached
+prices once committed, and the bulk pricing endpoint answers If-None-Match with 304."""
+
+from datetime import timedelta
+from typing import Any, List
+
+import pytest
+from django.core.cache import cache
+from django.test import Client
+from django.utils import timezone
+from opaque_keys.edx.keys import CourseKey
+
+PRICES_URL = "/payment-gateway/api/course-prices/"
+
+
+@pytest.fixture(autouse=True)
+def _cold_lru() -> None:
+    from payment_gateway_api import pricing
+
+    pricing._local.clear()
+
+
+def _verified_price(course_id: str) -> Any:
+    from payment_gateway_api import pricing
+
+    modes = pricing.get_course_pricing(CourseKey.from_string(course_id))["modes"]
+    return {m["slug"]: m["min_price"] for m in modes}.get("verified")
+
+
+def _snapshot(course_id: str) -> Any:
+    from payment_gateway_api.models import CourseCheckoutSnapshot
+
+    return CourseCheckoutSnapshot.objects.get(pk=course_id)
+
+
+@pytest.mark.django_db
+def test_course_mode_save_refreshes_snapshot_and_cache(courses: List[str],
+                                                       django_capture_on_commit_callbacks: Any) -> None:
+    from common.djangoapps.course_modes.models import CourseMode
+    from payment_gateway_api import pricing
+
+    assert _verified_price(courses[0]) == "100000"
+    invalidations = pricing.stats()["invalidations"]
+    mode = CourseMode.objects.get(course_id=courses[0], mode_slug="verified")
+    mode.min_price = 150000
+
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        mode.save()
+        # Nothing changes before commit: another request must not cache the old row again
+        assert _snapshot(courses[0]).modes[0]["min_price"] == "100000"
+
+    assert len(callbacks) == 1
+    assert _snapshot(courses[0]).modes[0]["min_price"] == "150000"
+    assert _verified_price(courses[0]) == "150000"
+    assert pricing.stats()["invalidations"] == invalidations + 1
+
+
+@pytest.mark.django_db
+def test_course_mode_delete_drops_the_mode(courses: List[str], django_capture_on_commit_callbacks: Any) -> None:
+    from common.djangoapps.course_modes.models import CourseMode
+
+    assert _verified_price(courses[0]) == "100000"
+
+    with django_capture_on_commit_callbacks(execute=True):
+        CourseMode.objects.get(course_id=courses[0], mode_slug="verified").delete()
+
+    assert _snapshot(courses[0]).modes == []
+    assert _verified_price(courses[0]) is None
+
+
+@pytest.mark.django_db
+def test_course_overview_save_refreshes_the_name(courses: List[str],
+                                                 django_capture_on_commit_callbacks: Any) -> None:
+    from openedx.core.djangoapps.content.course_overviews.models import CourseOverview
+    from payment_gateway_api import pricing
+
+    ck = CourseKey.from_string(courses[0])
+    assert pricing.get_course_pricing(ck)["meta"]["course_name"] == courses[0]
+    co = CourseOverview.objects.get(id=courses[0])
+    co.display_name = "Renamed"
+
+    with django_capture_on_commit_callbacks(execute=True):
+        co.save()
+
+    assert _snapshot(courses[0]).course_name == "Renamed"
+    assert pricing.get_course_pricing(ck)["meta"]["course_name"] == "Renamed"
+
+
+@pytest.mark.django_db
+def test_snapshot_expires_with_its_earliest_mode(courses: List[str]) -> None:
+    from common.djangoapps.course_modes.models import CourseMode
+    from payment_gateway_api import pricing
+    from payment_gateway_api.models import CourseCheckoutSnapshot
+
+    # queryset update() sends no signal: only valid_until makes the snapshot be rebuilt
+    verified = CourseMode.objects.filter(course_id=courses[0], mode_slug="verified")
+    verified.update(expiration_datetime=timezone.now() + timedelta(hours=1))
+    assert _verified_price(courses[0]) == "100000"
+    assert _snapshot(courses[0]).valid_until is not None
+
+    verified.update(expiration_datetime=timezone.now() - timedelta(seconds=1))
+    CourseCheckoutSnapshot.objects.filter(pk=courses[0]).update(valid_until=timezone.now() - timedelta(seconds=1))
+    pricing._local.clear()
+    cache.clear()
+
+    assert _verified_price(courses[0]) is None
+    assert _snapshot(courses[0]).valid_until is None
+
+
+def _prices(client: Any, course_ids: List[str], etag: str = "") -> Any:
+    headers = {"If-None-Match": etag} if etag else {}
+    return client.get(PRICES_URL, {"course_ids": ",".join(course_ids)}, headers=headers)
+
+
+@pytest.mark.django_db
+def test_course_prices_etag(staff: Any, courses: List[str], django_capture_on_commit_callbacks: Any) -> None:
+    from common.djangoapps.course_modes.models import CourseMode
+
+    c = Client()
+    c.force_login(staff)
+
+    first = _prices(c, courses)
+    etag = first["ETag"]
+    same = _prices(c, courses, etag)
+    listed = _prices(c, courses, f'"other", {etag}')
+    other_set = _prices(c, courses[:2], etag)
+
+    assert first.status_code == 200 and first.json()[courses[0]]
+    assert (same.status_code, same.content, same["ETag"]) == (304, b"", etag)
+    assert listed.status_code == 304
+    assert other_set.status_code == 200 and other_set["ETag"] != etag
+
+    with django_capture_on_commit_callbacks(execute=True):
+        CourseMode.objects.filter(course_id=courses[1], mode_slug="verified").get().delete()
+    changed = _prices(c, courses, etag)
+
+    assert changed.status_code == 200 and changed["ETag"] != etag
+
+
+@pytest.mark.django_db
+def test_course_prices_is_staff_only(user: Any, courses: List[str]) -> None:
+    c = Client()
+    c.force_login(user)
+
+    resp = _prices(c, courses)
+
+    assert resp.status_code == 302 and "ETag" not in resp
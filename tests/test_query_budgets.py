@@ -0,0 +1,136 @@
+"""Every budgeted view stays within its @querybudget.budget, measured with CaptureQueriesContext.
+
+Views are called directly (no middleware) with caches cleared, so the numbers are
+the view body's cold-cache worst case. Transaction statements are not counted, and
+on_commit work never runs inside the test transaction, as with querybudget itself.
+"""
+
+import json
+from typing import Any, Callable, Dict, List, Tuple
+
+import pytest
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver
+
+from .utils import signed
+
+TX_PREFIXES = ("BEGIN", "SAVEPOINT", "RELEASE", "ROLLBACK", "COMMIT")
+rf = RequestFactory()
+
+
+@pytest.fixture(autouse=True)
+def _cold_caches() -> None:
+    from payment_gateway_api import pricing
+
+    pricing._local.clear()
+
+
+def _as(user: Any, request: Any) -> Any:
+    request.user = user
+    return request
+
+
+def _measure(view: Callable[..., Any], request: Any, *args: Any, **kwargs: Any) -> Tuple[Any, int]:
+    with CaptureQueriesContext(connection) as ctx:
+        resp = view(request, *args, **kwargs)
+    n = sum(1 for q in ctx.captured_queries if not q["sql"].lstrip().upper().startswith(TX_PREFIXES))
+    return resp, n
+
+
+def _note(order: Any, **extra: Any) -> Dict[str, Any]:
+    note = {"order_uid": str(order.uid), "amount": str(order.amount), "currency": order.currency,
+            "status": "success", "txn_id": f"TXN-{order.pk}"}
+    note.update(extra)
+    return note
+
+
+def _cases(user: Any, staff: Any, courses: List[str], make_order: Callable[..., Any]) -> Dict[str, Any]:
+    """view name -> (view, request, kwargs, expected status)."""
+    from payment_gateway_api import bulk as bulk_module, views
+
+    order = make_order()
+    paid = make_order(status="PAID")
+    bulk = make_order(kind="BULK")
+    paid_bulk = make_order(kind="BULK", status="PAID")
+    invite = paid_bulk.lines.create(email=user.email, course_id=courses[0], mode="verified", amount=100000,
+                                    status="INVITED")
+    token = bulk_module.claim_url(invite.pk).split("/")[-2]
+    lines = [{"username": user.username, "course_id": cid, "mode": "verified"} for cid in courses]
+    return {
+        "course_price": (views.course_price, _as(staff, rf.get("/", {"course_id": courses[0]})), {}, 200),
+        "course_price_by_path": (views.course_price_by_path, _as(staff, rf.get("/")),
+                                 {"course_id": courses[1]}, 200),
+        "course_prices": (views.course_prices, _as(staff, rf.get("/", {"course_ids": ",".join(courses)})), {}, 200),
+        "pricing_cache_stats": (views.pricing_cache_stats, _as(staff, rf.get("/")), {}, 200),
+        "singleflight_stats": (views.singleflight_stats, _as(staff, rf.get("/")), {}, 200),
+        "metrics_view": (views.metrics_view, _as(staff, rf.get("/")), {}, None),
+        "revenue_report": (views.revenue_report, _as(staff, rf.get("/")), {}, 200),
+        "checkout": (views.checkout, _as(user, rf.get("/", {"course_id": courses[2]}, HTTP_IDEMPOTENCY_KEY="k1")),
+                     {}, 302),
+        "bulk_checkout": (views.bulk_checkout, _as(staff, rf.post("/", json.dumps({"lines": lines}),
+                                                                  content_type="application/json")), {}, 201),
+        "bulk_order_progress": (views.bulk_order_progress, _as(user, rf.get("/", {"invites": "1"})),
+                                {"uid": bulk.uid}, 200),
+        "bulk_claim": (views.bulk_claim, _as(user, rf.post("/")), {"token": token}, 302),
+        "confirm": (views.confirm, rf.post("/", **signed(_note(order))), {}, 200),
+        "confirm_batch": (views.confirm_batch, rf.post("/", **signed([_note(make_order()), _note(make_order())])),
+                          {}, 200),
+        "provider_callback": (views.provider_callback, rf.post("/", **signed(_note(make_order()))),
+                              {"provider": "vnpay"}, 200),
+        "order_status_api": (views.order_status_api, _as(user, rf.get("/")), {"uid": paid.uid}, 200),
+        "order_events": (views.order_events, _as(staff, rf.get("/")), {"uid": paid.uid}, 200),
+        "return_page": (views.return_page, rf.get("/"), {"uid": order.uid}, 200),
+    }
+
+
+@pytest.fixture
+def cases(user: Any, staff: Any, courses: List[str], make_order: Callable[..., Any], monkeypatch: Any) -> Any:
+    from payment_gateway_api import tasks
+
+    monkeypatch.setattr(tasks, "enqueue_enrollments", lambda ids: None)
+    monkeypatch.setattr(tasks, "enqueue_bulk_enrollment", lambda pk: None)
+    return _cases(user, staff, courses, make_order)
+
+
+NAMES = sorted(["course_price", "course_price_by_path", "course_prices", "pricing_cache_stats", "singleflight_stats",
+                "metrics_view", "revenue_report", "checkout", "bulk_checkout", "bulk_order_progress", "bulk_claim",
+                "confirm", "confirm_batch", "provider_callback", "order_status_api", "order_events", "return_page"])
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("name", NAMES)
+def test_view_within_budget(name: str, cases: Dict[str, Any]) -> None:
+    view, request, kwargs, status = cases[name]
+
+    resp, queries = _measure(view, request, **kwargs)
+
+    if status is not None:
+        assert resp.status_code == status, resp.content[:200]
+    assert queries <= view.query_budget, f"{name}: {queries} queries, budget {view.query_budget}"
+    # querybudget's own counter agrees with Django's
+    assert request.payment_query_count == queries
+
+
+def test_every_budgeted_url_is_covered() -> None:
+    budgeted = {p.callback.__name__ for p in get_resolver("payment_gateway_api.urls").url_patterns
+                if hasattr(p.callback, "query_budget")}
+    assert budgeted == set(NAMES)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("name", ["checkout", "confirm", "order_status_api"])
+def test_async_view_within_budget(name: str, cases: Dict[str, Any]) -> None:
+    from asgiref.sync import async_to_sync
+    from payment_gateway_api import async_views
+
+    _, request, kwargs, status = cases[name]
+    view = getattr(async_views, name)
+
+    # The ORM half runs through sync_to_async on this thread's connection
+    resp, queries = _measure(async_to_sync(view), request, **kwargs)
+
+    assert resp.status_code == status, resp.content[:200]
+    assert queries <= view.query_budget, f"{name}: {queries} queries, budget {view.query_budget}"
+    assert request.payment_query_count == queries
@@ -0,0 +1,63 @@
+"""Query budgets count each request on its own, also for concurrent async views."""
+
+import asyncio
+from typing import Any
+
+import pytest
+from asgiref.sync import async_to_sync, sync_to_async
+from django.test import RequestFactory
+
+
+@pytest.fixture(autouse=True)
+def _budgets(monkeypatch: Any) -> None:
+    # Keep the test views out of the real BUDGETS table
+    from payment_gateway_api import querybudget
+
+    monkeypatch.setattr(querybudget, "BUDGETS", {})
+
+
+def _queries(n: int) -> None:
+    from django.contrib.auth.models import User
+
+    for _ in range(n):
+        User.objects.exists()
+
+
+@pytest.mark.django_db
+def test_concurrent_async_views_count_separately() -> None:
+    from payment_gateway_api import querybudget
+
+    def make(n: int) -> Any:
+        @querybudget.budget(10)
+        async def view(request: Any) -> Any:
+            for _ in range(n):
+                # Interleave with the other request on the shared sync_to_async thread
+                await sync_to_async(_queries)(1)
+                await asyncio.sleep(0)
+            return None
+        return view
+
+    rf = RequestFactory()
+    requests = [rf.get("/a"), rf.get("/b")]
+
+    async def both() -> None:
+        await asyncio.gather(make(2)(requests[0]), make(5)(requests[1]))
+
+    async_to_sync(both)()
+
+    assert [r.payment_query_count for r in requests] == [2, 5]
+
+
+@pytest.mark.django_db
+def test_sync_view_counts_only_its_own_queries() -> None:
+    from payment_gateway_api import querybudget
+
+    @querybudget.budget(1)
+    def view(request: Any) -> Any:
+        _queries(3)
+
+    request = RequestFactory().get("/")
+    view(request)
+    _queries(2)
+
+    assert (request.payment_query_count, request.payment_query_budget) == (3, 1)
@@ -0,0 +1,53 @@
+"""Rate limits hold under concurrency: exactly `limit` requests per window, the rest 429."""
+
+from typing import Any
+
+import pytest
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from .utils import run_threads
+
+LIMIT = 5
+THREADS = 20
+
+
+@pytest.fixture
+def view(settings: Any, monkeypatch: Any) -> Any:
+    from payment_gateway_api import ratelimit
+
+    settings.PAYMENT_RATE_LIMIT_PRICING = ""
+    settings.PAYMENT_RATE_LIMIT_PRICING_IP = f"{LIMIT}/m"
+    # Every request lands 45 s into the same one-minute window
+    now = [60 * 1000 + 45.0]
+    monkeypatch.setattr(ratelimit.time, "time", lambda: now[0])
+
+    @ratelimit.limit("pricing")
+    def ok(request: Any) -> HttpResponse:
+        return HttpResponse("ok")
+
+    ok.now = now
+    return ok
+
+
+def _hit(view: Any) -> Any:
+    request = RequestFactory().get("/", REMOTE_ADDR="10.0.0.1")
+    request.user = type("Anon", (), {"is_authenticated": False})()
+    return view(request)
+
+
+def test_concurrent_requests_share_one_window(view: Any) -> None:
+    responses = run_threads(THREADS, lambda i: _hit(view))
+
+    codes = [r.status_code for r in responses]
+    assert codes.count(200) == LIMIT
+    assert codes.count(429) == THREADS - LIMIT
+    assert {r["Retry-After"] for r in responses if r.status_code == 429} == {"15"}
+
+
+def test_next_window_starts_over(view: Any) -> None:
+    run_threads(THREADS, lambda i: _hit(view))
+    view.now[0] += 60
+
+    codes = [r.status_code for r in run_threads(THREADS, lambda i: _hit(view))]
+    assert codes.count(200) == LIMIT
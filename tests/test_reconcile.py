@@ -0,0 +1,50 @@
+"""Reconcile only marks an order PAID when the provider's answer carries a matching amount."""
+
+from datetime import timedelta
+from typing import Any, Dict
+
+import pytest
+
+
+# reconcile() closes stale connections when done, which a test transaction does not survive
+@pytest.mark.django_db(transaction=True)
+def test_success_without_amount_leaves_order_pending(make_order: Any, monkeypatch: Any) -> None:
+    from payment_gateway_api import reconcile, tasks
+    from payment_gateway_api.models import Order
+
+    monkeypatch.setattr(tasks, "enqueue_enrollments", lambda ids: None)
+    complete, no_amount, no_currency, failed = (make_order() for _ in range(4))
+    answers: Dict[str, Dict[str, Any]] = {
+        str(complete.uid): {"status": "success", "txn_id": "T1", "amount": "100000.00", "currency": "VND"},
+        str(no_amount.uid): {"status": "success", "txn_id": "T2", "currency": "VND"},
+        str(no_currency.uid): {"status": "success", "txn_id": "T3", "amount": "100000.00"},
+        str(failed.uid): {"status": "failed"},
+    }
+    monkeypatch.setattr(reconcile, "_query", lambda limiter, row, url: answers[str(row[0])])
+
+    summary = reconcile.reconcile(timedelta(0), workers=1, rate=0)
+
+    assert (summary["paid"], summary["failed"], summary["errors"]) == (1, 1, 2)
+    statuses = dict(Order.objects.values_list("pk", "status"))
+    assert statuses[complete.pk] == Order.Status.PAID
+    assert statuses[no_amount.pk] == statuses[no_currency.pk] == Order.Status.PENDING
+    assert statuses[failed.pk] == Order.Status.FAILED
+
+
+@pytest.mark.django_db(transaction=True)
+def test_null_amount_and_expiry_close_the_order_and_count_once(make_order: Any, monkeypatch: Any) -> None:
+    from payment_gateway_api import reconcile
+    from payment_gateway_api.models import Order
+
+    canceled, stale = make_order(), make_order()
+    answers: Dict[str, Dict[str, Any]] = {
+        str(canceled.uid): {"status": "canceled", "amount": None, "currency": None},
+        str(stale.uid): {"status": "pending"},
+    }
+    monkeypatch.setattr(reconcile, "_query", lambda limiter, row, url: answers[str(row[0])])
+
+    summary = reconcile.reconcile(timedelta(0), workers=1, rate=0, expire_after=timedelta(0))
+
+    assert (summary["canceled"], summary["expired"], summary["errors"]) == (1, 1, 0)
+    statuses = dict(Order.objects.values_list("pk", "status"))
+    assert statuses[canceled.pk] == statuses[stale.pk] == Order.Status.CANCELED
@@ -0,0 +1,69 @@
+"""Exports page through orders by primary key (keyset), not with a streaming cursor."""
+
+from decimal import Decimal
+from typing import Any
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+@pytest.mark.django_db
+def test_keyset_chunks_pages_by_id(make_order: Any) -> None:
+    from payment_gateway_api import reports
+    from payment_gateway_api.models import Order
+
+    uids = [make_order().uid for _ in range(7)]
+
+    with CaptureQueriesContext(connection) as ctx:
+        chunks = list(reports.keyset_chunks(Order.objects.all(), ["uid"], 3))
+
+    assert [len(c) for c in chunks] == [3, 3, 1]
+    assert [row[0] for c in chunks for row in c] == uids
+    sqls = [q["sql"] for q in ctx.captured_queries]
+    assert len(sqls) == 3
+    assert all("ORDER BY" in sql and sql.endswith("LIMIT 3") for sql in sqls)
+    assert all('"payment_gateway_api_order"."id" >' in sql for sql in sqls[1:])
+
+
+@pytest.mark.django_db
+def test_keyset_chunks_limit(make_order: Any) -> None:
+    from payment_gateway_api import reports
+    from payment_gateway_api.models import Order
+
+    for _ in range(5):
+        make_order()
+
+    chunks = list(reports.keyset_chunks(Order.objects.all(), ["uid"], 2, limit=3))
+
+    assert [len(c) for c in chunks] == [2, 1]
+
+
+@pytest.mark.django_db
+def test_csv_export_streams_every_order(make_order: Any) -> None:
+    from payment_gateway_api import reports
+    from payment_gateway_api.models import Order
+
+    orders = [make_order() for _ in range(5)]
+
+    lines = list(reports.stream_csv([Order.objects.all()], chunk_size=2))
+
+    assert len(lines) == 1 + len(orders)
+    assert [line.split(",")[0] for line in lines[1:]] == [str(o.uid) for o in orders]
+
+
+@pytest.mark.django_db
+def test_revenue_never_adds_currencies_together(make_order: Any) -> None:
+    from payment_gateway_api import reports
+    from payment_gateway_api.models import Order
+
+    make_order(status=Order.Status.PAID, amount=100000, currency="VND")
+    make_order(status=Order.Status.PAID, amount=200000, currency="VND")
+    make_order(status=Order.Status.PAID, amount=25, currency="USD")
+
+    rows = reports.revenue([Order.objects.all()], ["course"])
+
+    assert [(r["course_id"], r["currency"], r["orders"], Decimal(r["revenue"])) for r in rows] == [
+        ("course-v1:Test+C0+2025", "USD", 1, Decimal(25)),
+        ("course-v1:Test+C0+2025", "VND", 2, Decimal(300000)),
+    ]
@@ -0,0 +1,162 @@
+"""Request signing: key rotation, retired keys, timestamp skew and nonce replay."""
+
+import time
+from typing import Any, Dict, Optional
+
+import pytest
+from django.test import RequestFactory
+
+BODY = b'{"order_uid":"x","status":"success"}'
+rf = RequestFactory()
+
+
+def _request(signature: str, ts: Optional[str] = None, nonce: Optional[str] = None, kid: Optional[str] = None,
+             body: bytes = BODY) -> Any:
+    headers: Dict[str, str] = {"X-Signature": signature}
+    if ts is not None:
+        headers["X-Timestamp"] = ts
+    if nonce is not None:
+        headers["X-Nonce"] = nonce
+    if kid is not None:
+        headers["X-Key-Id"] = kid
+    return rf.post("/", body, content_type="application/json", headers=headers)
+
+
+def _stamped(keyring: Any, nonce: str, ts: Optional[float] = None, kid: Optional[str] = None,
+             body: bytes = BODY) -> Any:
+    stamp = str(int(time.time() if ts is None else ts))
+    sig = keyring.sign(body, kid=kid, prefix=f"{stamp}.{nonce}.".encode())
+    return _request(sig, stamp, nonce, kid=kid, body=body)
+
+
+@pytest.fixture
+def rotating() -> Any:
+    """Mid-rotation keyring: signs with k2, still accepts k1."""
+    from payment_gateway_api.signing import Keyring
+
+    return Keyring({"k2": "new-secret", "k1": "old-secret"}, active="k2")
+
+
+def test_signs_with_the_active_key(rotating: Any) -> None:
+    from payment_gateway_api.signing import Keyring
+
+    headers = rotating.headers(BODY)
+
+    assert headers["X-Key-Id"] == "k2"
+    assert headers["X-Signature"] == Keyring.from_secret("new-secret").sign(BODY)
+
+
+@pytest.mark.parametrize("kid", ["k1", None], ids=["named", "unnamed"])
+def test_previous_key_still_verifies_during_rotation(rotating: Any, kid: Optional[str]) -> None:
+    from payment_gateway_api.signing import Keyring
+
+    old_sender = Keyring({"k1": "old-secret"})
+
+    rotating.verify_request(_request(old_sender.sign(BODY), kid=kid))
+
+
+@pytest.mark.parametrize("kid", ["k0", "k1", None], ids=["retired_id", "wrong_id", "unnamed"])
+def test_retired_key_is_rejected(rotating: Any, kid: Optional[str]) -> None:
+    from payment_gateway_api.signing import Keyring, SignatureError
+
+    # k0 was dropped from PAYMENT_SIGNING_KEYS when the rotation before this one finished
+    retired = Keyring({"k0": "retired-secret"})
+
+    with pytest.raises(SignatureError, match="Bad signature"):
+        rotating.verify_request(_request(retired.sign(BODY), kid=kid))
+
+
+def test_tampered_body_is_rejected(rotating: Any) -> None:
+    from payment_gateway_api.signing import SignatureError
+
+    with pytest.raises(SignatureError, match="Bad signature"):
+        rotating.verify_request(_request(rotating.sign(BODY), body=BODY.replace(b"success", b"failed")))
+
+
+def test_fresh_timestamp_is_accepted(rotating: Any) -> None:
+    rotating.verify_request(_stamped(rotating, "n-fresh", ts=time.time() - 250))
+
+
+@pytest.mark.parametrize("offset", [-301, 301], ids=["past", "future"])
+def test_timestamp_outside_skew_is_rejected(rotating: Any, settings: Any, offset: int) -> None:
+    from payment_gateway_api.signing import SignatureError
+
+    settings.PAYMENT_SIGNING_MAX_SKEW = 300
+
+    with pytest.raises(SignatureError, match="Stale"):
+        rotating.verify_request(_stamped(rotating, "n-skew", ts=time.time() + offset))
+
+
+@pytest.mark.parametrize("ts", ["nan", "inf", "yesterday"])
+def test_unusable_timestamp_is_rejected(rotating: Any, ts: str) -> None:
+    from payment_gateway_api.signing import SignatureError
+
+    sig = rotating.sign(BODY, prefix=f"{ts}.n-bad.".encode())
+
+    with pytest.raises(SignatureError):
+        rotating.verify_request(_request(sig, ts, "n-bad"))
+
+
+def test_timestamp_is_covered_by_the_signature(rotating: Any) -> None:
+    from payment_gateway_api.signing import SignatureError
+
+    old = _stamped(rotating, "n-moved", ts=time.time() - 1000)
+    sig = old.headers["X-Signature"]
+
+    with pytest.raises(SignatureError, match="Bad signature"):
+        rotating.verify_request(_request(sig, str(int(time.time())), "n-moved"))
+
+
+def test_replayed_nonce_is_rejected(rotating: Any) -> None:
+    from payment_gateway_api.signing import SignatureError
+
+    rotating.verify_request(_stamped(rotating, "n-once"))
+
+    with pytest.raises(SignatureError, match="Replayed"):
+        rotating.verify_request(_stamped(rotating, "n-once"))
+    # Also with another key, body and timestamp: the nonce itself is spent
+    with pytest.raises(SignatureError, match="Replayed"):
+        rotating.verify_request(_stamped(rotating, "n-once", ts=time.time() - 5, kid="k1", body=b"{}"))
+
+
+def test_forged_request_does_not_burn_the_nonce(rotating: Any) -> None:
+    from payment_gateway_api.signing import SignatureError
+
+    stamp = str(int(time.time()))
+    with pytest.raises(SignatureError, match="Bad signature"):
+        rotating.verify_request(_request("0" * 64, stamp, "n-real"))
+
+    rotating.verify_request(_stamped(rotating, "n-real"))
+
+
+def test_timestamp_can_be_required(rotating: Any, settings: Any) -> None:
+    from payment_gateway_api.signing import SignatureError
+
+    settings.PAYMENT_SIGNING_REQUIRE_TIMESTAMP = True
+
+    with pytest.raises(SignatureError, match="Missing"):
+        rotating.verify_request(_request(rotating.sign(BODY)))
+    rotating.verify_request(_stamped(rotating, "n-required"))
+
+
+@pytest.mark.django_db
+def test_confirm_accepts_the_old_key_and_rejects_replays(settings: Any, make_order: Any, monkeypatch: Any) -> None:
+    from django.test import Client
+    from payment_gateway_api import processing, signing
+
+    settings.PAYMENT_SIGNING_KEYS = {"k2": "new-secret", "k1": "old-secret"}
+    settings.PAYMENT_SIGNING_KEY_ID = "k2"
+    monkeypatch.setattr(signing, "_keyring", None)
+    monkeypatch.setattr(processing, "enroll", lambda order: None)
+    order = make_order()
+    body = signing.canonical_json({"order_uid": str(order.uid), "amount": str(order.amount),
+                                   "currency": order.currency, "status": "success", "txn_id": "T-rot"})
+    request = _stamped(signing.Keyring({"k1": "old-secret"}), "n-confirm", kid="k1", body=body)
+    headers = {k: request.headers[k] for k in ("X-Signature", "X-Timestamp", "X-Nonce", "X-Key-Id")}
+
+    first = Client().post("/payment-gateway/internal/confirm/", body, content_type="application/json",
+                          headers=headers)
+    replay = Client().post("/payment-gateway/internal/confirm/", body, content_type="application/json",
+                           headers=headers)
+
+    assert (first.status_code, replay.status_code) == (200, 403)
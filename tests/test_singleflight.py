@@ -0,0 +1,131 @@
+"""Duplicate checkouts: sync views never wait on the in-flight node call, async views join it."""
+
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Iterator, List, Tuple
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import RequestFactory
+
+rf = RequestFactory()
+
+
+@pytest.fixture
+def inflight(settings: Any, courses: List[str], user: Any, make_order: Any) -> Iterator[Tuple[Any, Future]]:
+    """A PENDING order without checkout_url whose leader is still calling the node."""
+    from payment_gateway_api import payments, singleflight
+
+    settings.PAYMENT_SINGLEFLIGHT_WAIT = 5
+    key = payments.idempotency_key(user.id, courses[0], "verified", "dup")
+    order = make_order(idempotency_key=key)
+    fut: Future = Future()
+    singleflight._inflight[key] = fut
+    try:
+        yield order, fut
+    finally:
+        singleflight._inflight.pop(key, None)
+
+
+def _duplicate(user: Any, courses: List[str]) -> Any:
+    request = rf.get("/", {"course_id": courses[0]}, HTTP_IDEMPOTENCY_KEY="dup")
+    request.user = user
+    return request
+
+
+@pytest.mark.django_db(transaction=True)  # the duplicate INSERT must fail outside a test transaction
+def test_sync_duplicate_redirects_to_prepare_without_waiting(inflight: Any, user: Any, courses: List[str]) -> None:
+    from payment_gateway_api import singleflight, views
+
+    order, fut = inflight
+    before = singleflight.stats()
+
+    start = time.monotonic()
+    resp = views.checkout(_duplicate(user, courses))
+
+    assert time.monotonic() - start < 1
+    assert (resp.status_code, resp["Location"]) == (302, f"/payment-gateway/prepare/{order.uid}/")
+    assert singleflight.stats() == before
+    assert not fut.done()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_duplicate_joins_the_leader(inflight: Any, user: Any, courses: List[str]) -> None:
+    from payment_gateway_api import async_views, singleflight
+
+    _, fut = inflight
+    before = singleflight.stats()["shared_local"]
+    timer = threading.Timer(0.2, fut.set_result, ["https://pay.example/checkout/1"])
+    timer.start()
+
+    resp = async_to_sync(async_views.checkout)(_duplicate(user, courses))
+
+    timer.join()
+    assert (resp.status_code, resp["Location"]) == (302, "https://pay.example/checkout/1")
+    assert singleflight.stats()["shared_local"] == before + 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_async_join_timeout_leaves_the_leader_running(inflight: Any, settings: Any, user: Any,
+                                                      courses: List[str]) -> None:
+    from payment_gateway_api import async_views
+
+    order, fut = inflight
+    settings.PAYMENT_SINGLEFLIGHT_WAIT = 0.1
+
+    resp = async_to_sync(async_views.checkout)(_duplicate(user, courses))
+
+    assert resp["Location"] == f"/payment-gateway/prepare/{order.uid}/"
+    assert not fut.cancelled()
+    fut.set_result("https://pay.example/checkout/2")
+
+
+def _singleflight_cache_calls(monkeypatch: Any) -> List[str]:
+    from payment_gateway_api import singleflight
+
+    calls: List[str] = []
+    for name in ("set", "delete", "aset", "adelete"):
+        def spy(key: str, *args: Any, _real: Any = getattr(singleflight.cache, name), _name: str = name) -> Any:
+            if key.startswith((singleflight.LOCK_PREFIX, singleflight.RESULT_PREFIX)):
+                calls.append(_name)
+            return _real(key, *args)
+        monkeypatch.setattr(singleflight.cache, name, spy)
+    return calls
+
+
+@pytest.mark.django_db
+def test_sync_checkout_does_not_lead_without_async_views(settings: Any, user: Any, courses: List[str],
+                                                         monkeypatch: Any) -> None:
+    from payment_gateway_api import singleflight, views
+
+    settings.PAYMENT_ASYNC_VIEWS = False
+    calls = _singleflight_cache_calls(monkeypatch)
+    leads = singleflight.stats()["leads"]
+    request = rf.get("/", {"course_id": courses[1]})
+    request.user = user
+
+    resp = views.checkout(request)
+
+    assert resp.status_code == 302 and resp["Location"].startswith("http")
+    assert calls == []
+    assert singleflight.stats()["leads"] == leads
+
+
+@pytest.mark.django_db
+def test_async_checkout_leads_with_async_views(settings: Any, user: Any, courses: List[str],
+                                               monkeypatch: Any) -> None:
+    from payment_gateway_api import async_views, singleflight
+
+    settings.PAYMENT_ASYNC_VIEWS = True
+    calls = _singleflight_cache_calls(monkeypatch)
+    leads = singleflight.stats()["leads"]
+    request = rf.get("/", {"course_id": courses[1]})
+    request.user = user
+
+    resp = async_to_sync(async_views.checkout)(request)
+
+    assert resp.status_code == 302
+    # Lock, result, unlock (the default async cache methods also go through set/delete)
+    assert [c for c in calls if c.startswith("a")] == ["aset", "aset", "adelete"]
+    assert singleflight.stats()["leads"] == leads + 1
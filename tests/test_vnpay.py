@@ -0,0 +1,209 @@
+"""VNPay direct integration (API 2.1.0): signed pay URL, IPN verification, querydr.
+
+The expected signatures are fixed vectors: HMAC-SHA512 over VNPay's sorted,
+quote_plus-encoded query string (pay URL, IPN) or the "|"-joined querydr
+fields, computed with `openssl dgst -sha512 -hmac` for the test secret below.
+"""
+
+import hashlib
+import hmac
+import uuid
+from datetime import datetime, timezone as dt_timezone
+from typing import Any, Dict, Iterator
+from urllib.parse import urlencode
+
+import pytest
+from django.test import Client, RequestFactory
+
+SECRET = "VNPAYTESTSECRET0123456789ABCDEFG"
+TMN = "TESTTMN1"
+UID = uuid.UUID("12345678-1234-5678-1234-567812345678")
+NOW = datetime(2025, 3, 1, 3, 25, tzinfo=dt_timezone.utc)  # 20250301102500 in Vietnam
+
+PAY_URL_HASH = (
+    "1742fac214bd1e8d2357090ca3d94aff5adf683d6aef7e25a1ca3bb2e10eb52599d5f8dbaf69275d620abd3417aacc2e"
+    "91d80285adb8035a41cc115d60a1daaf"
+)
+IPN = {
+    "vnp_Amount": "10000000", "vnp_BankCode": "NCB", "vnp_BankTranNo": "VNP14226112", "vnp_CardType": "ATM",
+    "vnp_OrderInfo": "Thanh toan khoa hoc course-v1:Test+C0+2025", "vnp_PayDate": "20250301103015",
+    "vnp_ResponseCode": "00", "vnp_TmnCode": TMN, "vnp_TransactionNo": "14226112",
+    "vnp_TransactionStatus": "00", "vnp_TxnRef": UID.hex,
+}
+IPN_HASH = (
+    "62d9dc05381cf2483cb8c415a9318d5f24bf8ef7b5e2c80ef67bc49a8e9c7afd832836fe074d84e5691693ad9c4d370bb2"
+    "615e5e7aaed9cdea7c3bc0c66609d9"
+)
+QUERYDR_REQUEST_HASH = (
+    "30287c2ad2c9d72a09b74fa2f8f19d0e73c6575c8299bb76b58dda919fe6b8dad6fa4ea2f2335a5d9aa77dead6976769ba"
+    "8de4872a5d7d359cdacf80bcd67582"
+)
+QUERYDR_RESPONSE = {
+    "vnp_ResponseId": "RSP0001", "vnp_Command": "querydr", "vnp_ResponseCode": "00",
+    "vnp_Message": "QueryDR Success", "vnp_TmnCode": TMN, "vnp_TxnRef": UID.hex, "vnp_Amount": "10000000",
+    "vnp_BankCode": "NCB", "vnp_PayDate": "20250301103015", "vnp_TransactionNo": "14226112",
+    "vnp_TransactionType": "01", "vnp_TransactionStatus": "00",
+    "vnp_OrderInfo": "Thanh toan khoa hoc course-v1:Test+C0+2025",
+    "vnp_SecureHash": (
+        "01979251f11102030741fb6efd4ff22a6807845f94ea57123294af3d649c076c4d8a23ab4668197dfa527a99973e81aae6"
+        "897617b31024a3f53781b948e62fcb"
+    ),
+}
+
+rf = RequestFactory()
+
+
+def _sign(params: Dict[str, str]) -> Dict[str, str]:
+    raw = urlencode(sorted(params.items()))
+    return {**params, "vnp_SecureHash": hmac.new(SECRET.encode(), raw.encode(), hashlib.sha512).hexdigest()}
+
+
+@pytest.fixture
+def vnpay(monkeypatch: Any) -> Any:
+    from payment_gateway_api.providers import vnpay
+
+    monkeypatch.setattr(vnpay.timezone, "now", lambda: NOW)
+    return vnpay.VNPayProvider("vnpay_direct", tmn_code=TMN, hash_secret=SECRET)
+
+
+def _ipn(vnpay: Any, params: Dict[str, str]) -> Any:
+    return vnpay.verify_callback(rf.get("/", params))
+
+
+def test_pay_url_matches_the_vector(vnpay: Any, make_order: Any) -> None:
+    order = make_order(uid=UID)
+
+    url = vnpay.create_payment(order, f"https://lms.example.com/payment-gateway/return/{UID}")["checkout_url"]
+
+    assert url.startswith("https://sandbox.vnpayment.vn/paymentv2/vpcpay.html?vnp_Amount=10000000&vnp_Command=pay&")
+    assert url.endswith("&vnp_SecureHash=" + PAY_URL_HASH)
+
+
+def test_pay_url_rejects_other_currencies(vnpay: Any, make_order: Any) -> None:
+    from payment_gateway_api.providers import ProviderError
+
+    with pytest.raises(ProviderError):
+        vnpay.create_payment(make_order(currency="USD"), "https://lms.example.com/return")
+
+
+def test_ipn_vector_is_accepted(vnpay: Any) -> None:
+    notes = _ipn(vnpay, {**IPN, "vnp_SecureHash": IPN_HASH, "vnp_SecureHashType": "HmacSHA512"})
+
+    assert notes == [{"order_uid": str(UID), "status": "success", "amount": "100000.00", "currency": "VND",
+                      "txn_id": "14226112", "provider": "vnpay_direct"}]
+
+
+@pytest.mark.parametrize("params", [
+    {**IPN, "vnp_SecureHash": "0" * 128},
+    {**IPN, "vnp_SecureHash": IPN_HASH[:-1] + "0"},
+    dict(IPN),
+    {**IPN, "vnp_SecureHash": IPN_HASH, "vnp_Amount": "100"},
+    {**IPN, "vnp_SecureHash": IPN_HASH, "vnp_ResponseCode": "24"},
+], ids=["bad", "truncated", "missing", "tampered_amount", "tampered_code"])
+def test_ipn_rejects_bad_signatures(vnpay: Any, params: Dict[str, str]) -> None:
+    from payment_gateway_api.providers import CallbackRejected
+
+    with pytest.raises(CallbackRejected):
+        _ipn(vnpay, params)
+
+
+@pytest.mark.parametrize("response_code, txn_status, status, txn_id", [
+    ("00", "00", "success", "14226112"),
+    ("24", "02", "canceled", ""),
+    ("51", "02", "failed", ""),
+    ("00", "01", "failed", ""),
+])
+def test_ipn_status_mapping(vnpay: Any, response_code: str, txn_status: str, status: str, txn_id: str) -> None:
+    params = _sign({**IPN, "vnp_ResponseCode": response_code, "vnp_TransactionStatus": txn_status})
+
+    [note] = _ipn(vnpay, params)
+
+    assert (note["status"], note["txn_id"]) == (status, txn_id)
+
+
+@pytest.mark.parametrize("results, error, code", [
+    ([{"ok": True, "result": "paid"}], None, "00"),
+    ([{"ok": True, "result": "duplicate"}], None, "02"),
+    ([{"ok": True, "result": "archived"}], None, "02"),
+    ([{"ok": False, "error": "Order not found"}], None, "01"),
+    ([{"ok": False, "error": "Amount/currency mismatch"}], None, "04"),
+    ([{"ok": False, "error": "boom"}], None, "99"),
+    ([], "Invalid Checksum", "97"),
+])
+def test_callback_response_codes(vnpay: Any, results: Any, error: Any, code: str) -> None:
+    import json
+
+    resp = vnpay.callback_response(results, error=error)
+
+    assert resp.status_code == 200
+    assert json.loads(resp.content)["RspCode"] == code
+
+
+class _Answer:
+    def __init__(self, data: Dict[str, Any]):
+        self.data = data
+
+    def json(self) -> Dict[str, Any]:
+        return self.data
+
+
+@pytest.fixture
+def querydr(vnpay: Any, monkeypatch: Any) -> Iterator[Dict[str, Any]]:
+    """Captures the querydr request; the answer is whatever the test puts in "answer"."""
+    from payment_gateway_api.providers import vnpay as module
+
+    monkeypatch.setattr(module.uuid, "uuid4", lambda: uuid.UUID(int=1))
+    box: Dict[str, Any] = {"answer": dict(QUERYDR_RESPONSE)}
+
+    def post(url: str, json: Dict[str, Any], timeout: Any) -> _Answer:
+        box["request"] = json
+        return _Answer(box["answer"])
+
+    monkeypatch.setattr(vnpay.session, "post", post)
+    yield box
+
+
+def test_querydr_signs_the_request_and_maps_the_answer(vnpay: Any, querydr: Dict[str, Any]) -> None:
+    answer = vnpay.query_status(str(UID), NOW)
+
+    assert querydr["request"]["vnp_SecureHash"] == QUERYDR_REQUEST_HASH
+    assert answer == {"status": "success", "txn_id": "14226112", "amount": "100000.00", "currency": "VND"}
+
+
+@pytest.mark.parametrize("field, value", [("vnp_SecureHash", "0" * 128), ("vnp_Amount", "100"),
+                                          ("vnp_TransactionStatus", "02")])
+def test_querydr_rejects_a_bad_response_checksum(vnpay: Any, querydr: Dict[str, Any], field: str,
+                                                 value: str) -> None:
+    from payment_gateway_api.providers import ProviderError
+
+    querydr["answer"][field] = value
+
+    with pytest.raises(ProviderError, match="checksum"):
+        vnpay.query_status(str(UID), NOW)
+
+
+def test_querydr_unknown_transaction(vnpay: Any, querydr: Dict[str, Any]) -> None:
+    querydr["answer"] = {"vnp_ResponseCode": "91", "vnp_Message": "Not found"}
+
+    assert vnpay.query_status(str(UID), NOW) == {"status": "not_found"}
+
+
+@pytest.mark.django_db
+def test_ipn_endpoint_pays_the_order_once(settings: Any, make_order: Any, monkeypatch: Any) -> None:
+    from payment_gateway_api import processing, providers
+    from payment_gateway_api.models import Order
+
+    settings.PAYMENT_PROVIDERS = {"vnpay_direct": {"backend": "vnpay", "tmn_code": TMN, "hash_secret": SECRET}}
+    monkeypatch.setattr(providers, "_registry", None)
+    monkeypatch.setattr(processing, "enroll", lambda order: None)
+    order = make_order(uid=UID, provider="vnpay_direct")
+    url = "/payment-gateway/internal/callback/vnpay_direct/"
+    ipn = {**IPN, "vnp_SecureHash": IPN_HASH}
+
+    forged = Client().get(url, {**ipn, "vnp_Amount": "100"})
+    first = Client().get(url, ipn)
+    again = Client().get(url, ipn)
+
+    assert [r.json()["RspCode"] for r in (forged, first, again)] == ["97", "00", "02"]
+    order.refresh_from_db()
+    assert (order.status, order.external_txn_id) == (Order.Status.PAID, "14226112")
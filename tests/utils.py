@@ -0,0 +1,39 @@
+"""Helpers shared by the tests."""
+
+import threading
+from typing import Any, Callable, Dict, List
+
+
+def signed(note: Dict[str, Any]) -> Dict[str, Any]:
+    """Body + headers for a signed POST to the internal confirm endpoints."""
+    from payment_gateway_api import signing
+
+    raw = signing.canonical_json(note)
+    return {"data": raw, "content_type": "application/json", "HTTP_X_SIGNATURE": signing.keyring().sign(raw)}
+
+
+def run_threads(n: int, fn: Callable[[int], Any]) -> List[Any]:
+    """Run fn(i) in n threads released together; results in order, exceptions re-raised."""
+    from django.db import connection
+
+    barrier = threading.Barrier(n)
+    results: List[Any] = [None] * n
+    errors: List[BaseException] = []
+
+    def target(i: int) -> None:
+        try:
+            barrier.wait()
+            results[i] = fn(i)
+        except BaseException as ex:  # noqa: B036
+            errors.append(ex)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if errors:
+        raise errors[0]
+    return results
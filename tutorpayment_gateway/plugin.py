@@ -1,5 +1,6 @@
 import os
 from glob import glob
+from typing import Optional
 
 import click
 import importlib_resources
@@ -18,7 +19,109 @@ hooks.Filters.CONFIG_DEFAULTS.add_items(
         # Prefix your setting names with 'PAYMENT_GATEWAY_'.
         ("PAYMENT_GATEWAY_VERSION", __version__),
         ("PAYMENT_NODE_CREATE_URL", "http://payment-service:3000/api/payments/create"),
+        ("PAYMENT_NODE_STATUS_URL", "http://payment-service:3000/api/payments/status"),
         ("PAYMENT_SHARED_SECRET", "CHANGE_ME"),
+        # HTTP client to the payment node (keep-alive pool, timeouts, retries,
+        # circuit breaker). Timeouts and backoff are in seconds.
+        ("PAYMENT_NODE_CONNECT_TIMEOUT", 3),
+        ("PAYMENT_NODE_READ_TIMEOUT", 10),
+        ("PAYMENT_NODE_POOL_SIZE", 10),
+        ("PAYMENT_NODE_MAX_RETRIES", 2),
+        ("PAYMENT_NODE_RETRY_BACKOFF", 0.2),
+        ("PAYMENT_NODE_BREAKER_THRESHOLD", 5),
+        ("PAYMENT_NODE_BREAKER_RESET", 30),
+        # Create the order immediately and call the payment node in the background
+        # (LMS Celery workers, or a thread pool when Celery is not available).
+        ("PAYMENT_ASYNC_CHECKOUT", False),
+        ("PAYMENT_ASYNC_THREADS", 4),
+        ("PAYMENT_ASYNC_WAIT", 3),
+        # Serve checkout, confirm and the order status API with async views
+        # (needs an ASGI server for the LMS; under WSGI they work but still hold
+        # a worker). Enabling it installs aiohttp in the openedx image (rebuild
+        # the image after changing). ASYNC_POOL_SIZE caps connections to the
+        # node from one process.
+        ("PAYMENT_ASYNC_VIEWS", False),
+        ("PAYMENT_NODE_ASYNC_POOL_SIZE", 100),
+        # Course pricing cache (seconds). The in-process LRU is only invalidated by
+        # its TTL in other workers, so keep it short.
+        ("PAYMENT_PRICING_CACHE_TTL", 300),
+        ("PAYMENT_PRICING_LOCAL_TTL", 30),
+        ("PAYMENT_PRICING_LOCAL_SIZE", 512),
+        # Max number of course ids accepted by the bulk pricing endpoint.
+        ("PAYMENT_BULK_PRICING_MAX", 300),
+        # Group orders (api/bulk-checkout/): max seats per order, and seats
+        # enrolled per transaction by the worker once the order is paid.
+        ("PAYMENT_BULK_ORDER_MAX_LINES", 1000),
+        ("PAYMENT_BULK_ENROLL_CHUNK", 100),
+        # A repeated checkout for the same user/course/mode reuses the existing
+        # order if that order is younger than this many seconds (a sliding
+        # window, not fixed time buckets). 0 disables derived keys.
+        ("PAYMENT_IDEMPOTENCY_WINDOW", 900),
+        # With PAYMENT_ASYNC_VIEWS, a repeated checkout that arrives while the first
+        # one is still waiting on the payment node waits up to this long (seconds)
+        # for that call's result, in-process or through the cache, instead of
+        # polling the prepare page. 0 disables it. Sync views never wait: they
+        # redirect to the prepare page straight away.
+        ("PAYMENT_SINGLEFLIGHT_WAIT", 5),
+        # Max notifications accepted by the batch confirm endpoint.
+        ("PAYMENT_CONFIRM_BATCH_MAX", 1000),
+        # Store verified confirm callbacks in an inbox table and process them in
+        # batches on workers (Celery or `process_payment_inbox`).
+        ("PAYMENT_CONFIRM_INBOX", False),
+        ("PAYMENT_INBOX_BATCH_SIZE", 100),
+        ("PAYMENT_INBOX_MAX_ATTEMPTS", 5),
+        ("PAYMENT_INBOX_RETRY_DELAY", 60),
+        # Order status polling: cache TTL, max long-poll hold, and the wait the
+        # return page asks for (0 = plain polling, does not hold a worker).
+        # Long-polling is off unless the async views are on: a sync view would
+        # hold a WSGI worker for the whole wait.
+        ("PAYMENT_STATUS_CACHE_TTL", 30),
+        ("PAYMENT_STATUS_LONGPOLL_MAX", "{{ 20 if PAYMENT_ASYNC_VIEWS else 0 }}"),
+        ("PAYMENT_STATUS_PAGE_WAIT", 0),
+        # Move PAID/FAILED/CANCELED orders older than N days to the archive
+        # table (`tutor local do archive-payments`).
+        ("PAYMENT_ARCHIVE_AFTER_DAYS", 180),
+        ("PAYMENT_ARCHIVE_BATCH_SIZE", 1000),
+        # Append-only log of order status changes (OrderEvent), readable by staff
+        # on /payment-gateway/api/orders/<uid>/events.
+        ("PAYMENT_ORDER_EVENTS", True),
+        # Prometheus metrics on /payment-gateway/metrics. Enabling it installs
+        # prometheus-client in the openedx image (rebuild the image after changing).
+        # Readable by staff or with "Authorization: Bearer <PAYMENT_METRICS_TOKEN>".
+        # Set MULTIPROC_DIR to an empty, per-container directory when the LMS
+        # runs several worker processes.
+        ("PAYMENT_METRICS_ENABLED", False),
+        ("PAYMENT_METRICS_TOKEN", ""),
+        ("PAYMENT_METRICS_MULTIPROC_DIR", ""),
+        # Rate limits as "N/s", "N/m", "N/h" or "N/d", per user and per client IP,
+        # counted in the Django cache. Empty string disables a limit.
+        ("PAYMENT_RATE_LIMIT_CHECKOUT", "10/m"),
+        ("PAYMENT_RATE_LIMIT_CHECKOUT_IP", "60/m"),
+        ("PAYMENT_RATE_LIMIT_PRICING", "120/m"),
+        ("PAYMENT_RATE_LIMIT_PRICING_IP", ""),
+        # Payment providers by name (the name is stored on Order.provider).
+        # "backend" is "node" (via the Node service), "vnpay" (direct VNPay
+        # integration: tmn_code, hash_secret, pay_url, api_url, ...), "fake"
+        # (in-process, load tests only) or a dotted path to a PaymentProvider
+        # subclass. Other keys are backend options (timeouts, pool_size...).
+        # Direct providers send their IPN to /payment-gateway/internal/callback/<name>/.
+        ("PAYMENT_PROVIDERS", {"vnpay": {"backend": "node"}}),
+        # First matching rule wins, e.g. [{"currency": "USD", "provider": "paypal"},
+        # {"course": "course-v1:Org+*", "provider": "vnpay_direct"}]
+        ("PAYMENT_PROVIDER_ROUTES", []),
+        ("PAYMENT_DEFAULT_PROVIDER", "vnpay"),
+        # HMAC key rotation: {"<key id>": "<secret>"}. Empty means only
+        # PAYMENT_SHARED_SECRET (key id "default"). Outgoing requests are signed
+        # with PAYMENT_SIGNING_KEY_ID; callbacks may use any listed key (X-Key-Id).
+        # Callbacks carrying X-Timestamp/X-Nonce are checked for replays; set
+        # REQUIRE_TIMESTAMP once the Node service always sends them.
+        ("PAYMENT_SIGNING_KEYS", {}),
+        ("PAYMENT_SIGNING_KEY_ID", ""),
+        ("PAYMENT_SIGNING_MAX_SKEW", 300),
+        ("PAYMENT_SIGNING_REQUIRE_TIMESTAMP", False),
+        # Count DB queries per request and log views that exceed their declared
+        # budget: "true", "false", or "" to follow the LMS DEBUG setting.
+        ("PAYMENT_QUERY_BUDGET_CHECK", ""),
     ]
 )
 
@@ -63,15 +166,18 @@ MY_INIT_TASKS: list[tuple[str, tuple[str, ...]]] = [
 
 # For each task added to MY_INIT_TASKS, we load the task template
 # and add it to the CLI_DO_INIT_TASKS filter, which tells Tutor to
-# run it as part of the `init` job.
-for service, template_path in MY_INIT_TASKS:
-    full_path: str = str(
-        importlib_resources.files("tutorpayment_gateway")
-        / os.path.join("templates", *template_path)
-    )
-    with open(full_path, encoding="utf-8") as init_task_file:
-        init_task: str = init_task_file.read()
-    hooks.Filters.CLI_DO_INIT_TASKS.add_item((service, init_task))
+# run it as part of the `init` job. The templates are read when the
+# filter is applied (`tutor ... do init`), not on every `tutor` call.
+@hooks.Filters.CLI_DO_INIT_TASKS.add()
+def _add_init_tasks(tasks: list[tuple[str, str]]) -> list[tuple[str, str]]:
+    for service, template_path in MY_INIT_TASKS:
+        full_path: str = str(
+            importlib_resources.files("tutorpayment_gateway")
+            / os.path.join("templates", *template_path)
+        )
+        with open(full_path, encoding="utf-8") as init_task_file:
+            tasks.append((service, init_task_file.read()))
+    return tasks
 
 
 ########################################
@@ -161,9 +267,13 @@ hooks.Filters.ENV_TEMPLATE_TARGETS.add_items(
 
 # For each file in tutorpayment_gateway/patches,
 # apply a patch based on the file's name and contents.
-for path in glob(str(importlib_resources.files("tutorpayment_gateway") / "patches" / "*")):
-    with open(path, encoding="utf-8") as patch_file:
-        hooks.Filters.ENV_PATCHES.add_item((os.path.basename(path), patch_file.read()))
+# Files are read when Tutor renders the environment, not at plugin import.
+@hooks.Filters.ENV_PATCHES.add()
+def _add_patch_files(patches: list[tuple[str, str]]) -> list[tuple[str, str]]:
+    for path in glob(str(importlib_resources.files("tutorpayment_gateway") / "patches" / "*")):
+        with open(path, encoding="utf-8") as patch_file:
+            patches.append((os.path.basename(path), patch_file.read()))
+    return patches
 
 
 # === Patch settings để đưa biến vào ENV_TOKENS ===
@@ -187,7 +297,54 @@ hooks.Filters.ENV_PATCHES.add_items([
 # --- payment-gateway plugin ENV tokens ---
 ENV_TOKENS.update({
     "PAYMENT_NODE_CREATE_URL": "{{ PAYMENT_NODE_CREATE_URL }}",
+    "PAYMENT_NODE_STATUS_URL": "{{ PAYMENT_NODE_STATUS_URL }}",
     "PAYMENT_SHARED_SECRET": "{{ PAYMENT_SHARED_SECRET }}",
+    "PAYMENT_NODE_CONNECT_TIMEOUT": {{ PAYMENT_NODE_CONNECT_TIMEOUT }},
+    "PAYMENT_NODE_READ_TIMEOUT": {{ PAYMENT_NODE_READ_TIMEOUT }},
+    "PAYMENT_NODE_POOL_SIZE": {{ PAYMENT_NODE_POOL_SIZE }},
+    "PAYMENT_NODE_MAX_RETRIES": {{ PAYMENT_NODE_MAX_RETRIES }},
+    "PAYMENT_NODE_RETRY_BACKOFF": {{ PAYMENT_NODE_RETRY_BACKOFF }},
+    "PAYMENT_NODE_BREAKER_THRESHOLD": {{ PAYMENT_NODE_BREAKER_THRESHOLD }},
+    "PAYMENT_NODE_BREAKER_RESET": {{ PAYMENT_NODE_BREAKER_RESET }},
+    "PAYMENT_ASYNC_CHECKOUT": {{ PAYMENT_ASYNC_CHECKOUT }},
+    "PAYMENT_ASYNC_THREADS": {{ PAYMENT_ASYNC_THREADS }},
+    "PAYMENT_ASYNC_WAIT": {{ PAYMENT_ASYNC_WAIT }},
+    "PAYMENT_ASYNC_VIEWS": {{ PAYMENT_ASYNC_VIEWS }},
+    "PAYMENT_NODE_ASYNC_POOL_SIZE": {{ PAYMENT_NODE_ASYNC_POOL_SIZE }},
+    "PAYMENT_PRICING_CACHE_TTL": {{ PAYMENT_PRICING_CACHE_TTL }},
+    "PAYMENT_PRICING_LOCAL_TTL": {{ PAYMENT_PRICING_LOCAL_TTL }},
+    "PAYMENT_PRICING_LOCAL_SIZE": {{ PAYMENT_PRICING_LOCAL_SIZE }},
+    "PAYMENT_BULK_PRICING_MAX": {{ PAYMENT_BULK_PRICING_MAX }},
+    "PAYMENT_BULK_ORDER_MAX_LINES": {{ PAYMENT_BULK_ORDER_MAX_LINES }},
+    "PAYMENT_BULK_ENROLL_CHUNK": {{ PAYMENT_BULK_ENROLL_CHUNK }},
+    "PAYMENT_IDEMPOTENCY_WINDOW": {{ PAYMENT_IDEMPOTENCY_WINDOW }},
+    "PAYMENT_SINGLEFLIGHT_WAIT": {{ PAYMENT_SINGLEFLIGHT_WAIT }},
+    "PAYMENT_CONFIRM_BATCH_MAX": {{ PAYMENT_CONFIRM_BATCH_MAX }},
+    "PAYMENT_CONFIRM_INBOX": {{ PAYMENT_CONFIRM_INBOX }},
+    "PAYMENT_INBOX_BATCH_SIZE": {{ PAYMENT_INBOX_BATCH_SIZE }},
+    "PAYMENT_INBOX_MAX_ATTEMPTS": {{ PAYMENT_INBOX_MAX_ATTEMPTS }},
+    "PAYMENT_INBOX_RETRY_DELAY": {{ PAYMENT_INBOX_RETRY_DELAY }},
+    "PAYMENT_STATUS_CACHE_TTL": {{ PAYMENT_STATUS_CACHE_TTL }},
+    "PAYMENT_STATUS_LONGPOLL_MAX": {{ PAYMENT_STATUS_LONGPOLL_MAX }},
+    "PAYMENT_STATUS_PAGE_WAIT": {{ PAYMENT_STATUS_PAGE_WAIT }},
+    "PAYMENT_ARCHIVE_AFTER_DAYS": {{ PAYMENT_ARCHIVE_AFTER_DAYS }},
+    "PAYMENT_ARCHIVE_BATCH_SIZE": {{ PAYMENT_ARCHIVE_BATCH_SIZE }},
+    "PAYMENT_ORDER_EVENTS": {{ PAYMENT_ORDER_EVENTS }},
+    "PAYMENT_METRICS_ENABLED": {{ PAYMENT_METRICS_ENABLED }},
+    "PAYMENT_METRICS_TOKEN": "{{ PAYMENT_METRICS_TOKEN }}",
+    "PAYMENT_METRICS_MULTIPROC_DIR": "{{ PAYMENT_METRICS_MULTIPROC_DIR }}",
+    "PAYMENT_RATE_LIMIT_CHECKOUT": "{{ PAYMENT_RATE_LIMIT_CHECKOUT }}",
+    "PAYMENT_RATE_LIMIT_CHECKOUT_IP": "{{ PAYMENT_RATE_LIMIT_CHECKOUT_IP }}",
+    "PAYMENT_RATE_LIMIT_PRICING": "{{ PAYMENT_RATE_LIMIT_PRICING }}",
+    "PAYMENT_RATE_LIMIT_PRICING_IP": "{{ PAYMENT_RATE_LIMIT_PRICING_IP }}",
+    "PAYMENT_PROVIDERS": {{ PAYMENT_PROVIDERS }},
+    "PAYMENT_PROVIDER_ROUTES": {{ PAYMENT_PROVIDER_ROUTES }},
+    "PAYMENT_DEFAULT_PROVIDER": "{{ PAYMENT_DEFAULT_PROVIDER }}",
+    "PAYMENT_SIGNING_KEYS": {{ PAYMENT_SIGNING_KEYS }},
+    "PAYMENT_SIGNING_KEY_ID": "{{ PAYMENT_SIGNING_KEY_ID }}",
+    "PAYMENT_SIGNING_MAX_SKEW": {{ PAYMENT_SIGNING_MAX_SKEW }},
+    "PAYMENT_SIGNING_REQUIRE_TIMESTAMP": {{ PAYMENT_SIGNING_REQUIRE_TIMESTAMP }},
+    "PAYMENT_QUERY_BUDGET_CHECK": "{{ PAYMENT_QUERY_BUDGET_CHECK }}",
 })
 
 PAYMENT_NODE_CREATE_URL = ENV_TOKENS.get("PAYMENT_NODE_CREATE_URL")
@@ -236,6 +393,113 @@ except NameError:
 #   $ tutor local do say-hi --name="NGUYEN HOANG NAM"
 
 
+@click.command(name="reconcile-payments")
+@click.option("--older-than", default=30, show_default=True, help="Only orders created more than N minutes ago.")
+@click.option("--chunk-size", default=200, show_default=True)
+@click.option("--workers", default=8, show_default=True, help="Concurrent status requests to the payment node.")
+@click.option("--rate", default=20.0, show_default=True, help="Max status requests per second (0 = unlimited).")
+@click.option("--limit", type=int, default=None, help="Check at most N orders.")
+@click.option("--expire-after", type=int, default=None, help="Cancel orders older than N hours the node never confirmed.")
+@click.option("--dry-run", is_flag=True, help="Report only, do not write to the database.")
+def reconcile_payments(
+    older_than: int,
+    chunk_size: int,
+    workers: int,
+    rate: float,
+    limit: Optional[int],
+    expire_after: Optional[int],
+    dry_run: bool,
+) -> list[tuple[str, str]]:
+    """
+    Sweep stale PENDING payment orders against the payment node status API.
+    """
+    args = [f"--older-than={older_than}", f"--chunk-size={chunk_size}", f"--workers={workers}", f"--rate={rate}"]
+    if limit is not None:
+        args.append(f"--limit={limit}")
+    if expire_after is not None:
+        args.append(f"--expire-after={expire_after}")
+    if dry_run:
+        args.append("--dry-run")
+    return [("lms", "./manage.py lms reconcile_payment_orders " + " ".join(args))]
+
+
+hooks.Filters.CLI_DO_COMMANDS.add_item(reconcile_payments)
+
+
+@click.command(name="archive-payments")
+@click.option("--older-than-days", type=int, default=None, help="Defaults to PAYMENT_ARCHIVE_AFTER_DAYS.")
+@click.option("--batch-size", type=int, default=None, help="Defaults to PAYMENT_ARCHIVE_BATCH_SIZE.")
+@click.option("--max-batches", type=int, default=None, help="Stop after N batches.")
+@click.option("--dry-run", is_flag=True, help="Only count the orders that would be archived.")
+def archive_payments(
+    older_than_days: Optional[int],
+    batch_size: Optional[int],
+    max_batches: Optional[int],
+    dry_run: bool,
+) -> list[tuple[str, str]]:
+    """
+    Move old terminal payment orders to the archive table in batches.
+    """
+    args: list[str] = []
+    if older_than_days is not None:
+        args.append(f"--older-than-days={older_than_days}")
+    if batch_size is not None:
+        args.append(f"--batch-size={batch_size}")
+    if max_batches is not None:
+        args.append(f"--max-batches={max_batches}")
+    if dry_run:
+        args.append("--dry-run")
+    return [("lms", " ".join(["./manage.py lms archive_payment_orders"] + args))]
+
+
+hooks.Filters.CLI_DO_COMMANDS.add_item(archive_payments)
+
+
+@click.command(name="rebuild-checkout-snapshots")
+@click.option("--batch-size", type=int, default=None, help="Courses per upsert (default 500).")
+def rebuild_checkout_snapshots(batch_size: Optional[int]) -> list[tuple[str, str]]:
+    """
+    Rebuild the precomputed per-course checkout snapshots (e.g. after a bulk import).
+    """
+    args: list[str] = []
+    if batch_size is not None:
+        args.append(f"--batch-size={batch_size}")
+    return [("lms", " ".join(["./manage.py lms rebuild_checkout_snapshots"] + args))]
+
+
+hooks.Filters.CLI_DO_COMMANDS.add_item(rebuild_checkout_snapshots)
+
+
+@click.command(name="enroll-bulk-orders")
+@click.option("--order", "order_uid", default=None, help="Only this group order (uid).")
+@click.option("--chunk-size", type=int, default=None, help="Defaults to PAYMENT_BULK_ENROLL_CHUNK.")
+@click.option("--retry-failed", is_flag=True, help="Retry seats whose enrollment failed.")
+@click.option("--retry-invited", is_flag=True,
+              help="Retry email-only seats of staff orders (the user may have registered since).")
+def enroll_bulk_orders(
+    order_uid: Optional[str],
+    chunk_size: Optional[int],
+    retry_failed: bool,
+    retry_invited: bool,
+) -> list[tuple[str, str]]:
+    """
+    Resume enrollment of paid group orders that still have pending seats.
+    """
+    args: list[str] = []
+    if order_uid:
+        args.append(f"--order={order_uid}")
+    if chunk_size is not None:
+        args.append(f"--chunk-size={chunk_size}")
+    if retry_failed:
+        args.append("--retry-failed")
+    if retry_invited:
+        args.append("--retry-invited")
+    return [("lms", " ".join(["./manage.py lms enroll_bulk_orders"] + args))]
+
+
+hooks.Filters.CLI_DO_COMMANDS.add_item(enroll_bulk_orders)
+
+
 #######################################
 # CUSTOM CLI COMMANDS
 #######################################
@@ -23,3 +23,7 @@ class PaymentGatewayAPIConfig(AppConfig):
             },
         },
     }
+
+    def ready(self):
+        # Đăng ký signal xoá cache giá
+        from . import signals  # noqa: F401
@@ -0,0 +1,54 @@
+# payment_gateway_api/archive.py
+# Chuyển đơn đã kết thúc, cũ hơn N ngày, từ Order sang OrderArchive theo lô nhỏ
+# (mỗi lô 1 transaction: INSERT ... SELECT qua bulk_create rồi DELETE theo id).
+from datetime import timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Order, OrderArchive
+
+ARCHIVE_FIELDS = (
+    "id", "uid", "user_id", "course_id", "mode", "amount", "currency", "status",
+    "provider", "external_txn_id", "created_at", "updated_at",
+)
+
+
+def _candidates(older_than: timedelta):
+    # Đơn nhóm ở lại bảng Order cùng các OrderLine (danh sách suất đã cấp)
+    return Order.objects.filter(
+        status__in=Order.TERMINAL_STATUSES, created_at__lt=timezone.now() - older_than, kind=Order.Kind.SINGLE
+    )
+
+
+def archive_orders(older_than: timedelta, batch_size: int = 1000, max_batches: Optional[int] = None,
+                   dry_run: bool = False) -> Dict[str, Any]:
+    if dry_run:
+        return {"batches": 0, "archived": 0, "would_archive": _candidates(older_than).count()}
+
+    total = {"batches": 0, "archived": 0}
+    while max_batches is None or total["batches"] < max_batches:
+        with transaction.atomic():
+            rows = list(
+                _candidates(older_than).select_for_update(skip_locked=True)
+                .order_by("id").values(*ARCHIVE_FIELDS)[:batch_size]
+            )
+            if not rows:
+                break
+            ids = [r.pop("id") for r in rows]
+            # ignore_conflicts: chạy lại sau một lô bị gián đoạn không lỗi trùng uid
+            OrderArchive.objects.bulk_create([OrderArchive(**r) for r in rows], ignore_conflicts=True)
+            Order.objects.filter(id__in=ids).delete()
+        total["batches"] += 1
+        total["archived"] += len(ids)
+    return total
+
+
+def archived_status(uid) -> Optional[str]:
+    return OrderArchive.objects.filter(uid=uid).values_list("status", flat=True).first()
+
+
+def archived_owner(uid) -> Optional[Tuple[int, str]]:
+    """(user_id, status) của đơn đã lưu trữ."""
+    return OrderArchive.objects.filter(uid=uid).values_list("user_id", "status").first()
@@ -0,0 +1,91 @@
+# payment_gateway_api/async_views.py
+# Bản async của checkout, confirm và api trạng thái đơn, dùng khi PAYMENT_ASYNC_VIEWS=True
+# (urls.py chọn). Dưới ASGI, lúc chờ Node (aiohttp, pool dùng chung theo process) hoặc chờ
+# long-poll (asyncio.sleep) không chiếm thread nào, nên 1 process giữ được nhiều checkout.
+# Logic dùng chung với views.py; chỉ phần ORM / CourseEnrollment đi qua sync_to_async.
+#
+# Decorator login_required / csrf_exempt của Django 4.2 (LMS) chưa nhận view async,
+# nên kiểm tra đăng nhập và đánh dấu csrf_exempt ở đây.
+import functools
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.db import transaction
+from django.http import HttpResponse
+from django.shortcuts import redirect
+
+from . import metrics, order_status, payments, providers, querybudget, ratelimit, singleflight, views
+from .models import Order
+
+_begin_checkout = sync_to_async(views.begin_checkout)
+_checkout_failed = sync_to_async(views.checkout_failed)
+# verify_confirm kiểm nonce chống replay bằng cache (Redis): I/O chặn, không chạy trên event loop
+_verify_confirm = sync_to_async(views.verify_confirm)
+_apply_confirm = sync_to_async(views.apply_confirm)
+_get_status = sync_to_async(order_status.get_status)
+_get_owner = sync_to_async(order_status.get_owner)
+
+
+def _login_required(view):
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        # Nạp request.user trong thread sync; sau đó đọc lại không còn query
+        if not await sync_to_async(lambda: request.user.is_authenticated)():
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def _csrf_exempt(view):
+    view.csrf_exempt = True
+    return view
+
+
+# ATOMIC_REQUESTS không áp được cho view async: các bước ORM tự commit như checkout sync
+@metrics.instrument("checkout")
+@transaction.non_atomic_requests
+@_login_required
+@ratelimit.limit("checkout")
+@querybudget.budget(10)  # như checkout sync
+async def checkout(request):
+    started = await _begin_checkout(request, join_inflight=True)
+    if isinstance(started, HttpResponse):
+        return started
+    if isinstance(started, views.InFlight):
+        # Checkout trùng: chờ chung lượt gọi Node đang chạy trên event loop, không giữ thread
+        wait = getattr(settings, "PAYMENT_SINGLEFLIGHT_WAIT", 5)
+        url = await singleflight.ajoin(started.key, wait)
+        return views._resume_checkout(started.uid, Order.Status.PENDING, url or "")
+    order, return_url = started
+    try:
+        checkout_url = await payments.arequest_checkout_url(order, return_url)
+    except providers.ProviderError as ex:
+        return await _checkout_failed(order, ex)
+    return redirect(checkout_url)
+
+
+@_csrf_exempt
+@metrics.instrument("confirm")
+@transaction.non_atomic_requests
+@querybudget.budget(5)  # như confirm sync + enroll: không có ATOMIC_REQUESTS nên on_commit chạy trong view
+async def confirm(request):
+    rejected = await _verify_confirm(request)
+    if rejected is not None:
+        return rejected
+    return await _apply_confirm(request.body)
+
+
+@transaction.non_atomic_requests
+@_login_required
+@querybudget.budget(2)
+async def order_status_api(request, uid):
+    """Như views.order_status_api; long-poll không giữ thread."""
+    if not views.owns_order(request.user, await _get_owner(uid)):
+        return views.status_response(uid, None)
+    since, wait = views.status_wait_params(request)
+    if since and wait:
+        status = await order_status.await_change(uid, since, wait)
+    else:
+        status = await _get_status(uid)
+    return views.status_response(uid, status)
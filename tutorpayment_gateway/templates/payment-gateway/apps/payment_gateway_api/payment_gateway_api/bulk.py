@@ -0,0 +1,268 @@
+# payment_gateway_api/bulk.py
+# Đơn nhóm (mua suất học cho cả lớp / nhóm): 1 Order kind=BULK, người mua trả 1 lần
+# cho tổng tiền; mỗi suất (user hoặc email, khoá, mode) là 1 OrderLine.
+#   - Tạo đơn: user tra theo lô, giá mọi khoá đọc 1 lần (pricing.get_many_course_pricing),
+#     Order + các dòng ghi bằng 1 INSERT + bulk_create trong 1 transaction.
+#   - Chỉ staff được chỉ định suất theo username / ghi danh thẳng tài khoản có sẵn. Người
+#     mua khác chỉ gửi email: mỗi suất là 1 lời mời (CourseEnrollmentAllowed), không tra
+#     tài khoản theo email, nên không dò được ai có tài khoản và không ghi danh hộ người khác.
+#   - Suất theo email (INVITED) có link nhận suất ký bằng SECRET_KEY (claim_url, người mua
+#     lấy qua tiến độ đơn ?invites=1). Người nhận đăng nhập tài khoản đã kích hoạt có đúng
+#     email đó rồi mở link: ghi danh vào đúng mode đã trả tiền (CourseEnrollmentAllowed không
+#     có mode, auto_enroll chỉ chạy lúc đăng ký nên không đủ cho người đã có tài khoản).
+#   - Ghi danh: khi đơn PAID, worker (Celery / thread pool / lệnh enroll_bulk_orders) xử lý
+#     các dòng PENDING theo lô PAYMENT_BULK_ENROLL_CHUNK. Mỗi lô 1 transaction: khoá dòng
+#     SKIP LOCKED, ghi danh, bulk_update trạng thái. Worker chết giữa lô thì lô đó rollback
+#     cùng enrollment của nó; chạy lại sẽ tiếp tục từ các dòng còn PENDING.
+import logging
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.core.signing import BadSignature, Signer
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from . import pricing
+from .models import Order, OrderLine
+
+log = logging.getLogger(__name__)
+
+CLAIM_SALT = "payment_gateway.bulk_claim"
+
+
+class ClaimRejected(Exception):
+    """Link nhận suất sai / đã dùng / không dành cho tài khoản này."""
+
+
+# ===== tạo đơn =====
+def _mode_price(entry: Dict[str, Any], mode: str) -> Tuple[Decimal, str]:
+    for m in entry["modes"]:
+        if m["slug"] == mode:
+            return Decimal(m["min_price"]), (m["currency"] or "VND")
+    raise ValueError(f"mode {mode!r} not available for {entry['meta'].get('course_id')}")
+
+
+def build_lines(specs: List[Dict[str, Any]], by_staff: bool = False) -> Tuple[List[OrderLine], str]:
+    """Các dòng chưa lưu (có giá) + tiền tệ chung, từ [{"username"|"email", "course_id", "mode"}].
+
+    course_id đã chuẩn hoá và kiểm tra ở view ("course_key" là CourseKey tương ứng).
+    by_staff=False: chỉ nhận email và không tra tài khoản (dòng chỉ có email -> lời mời).
+    Raise ValueError (kèm số thứ tự dòng) nếu dòng không hợp lệ; lỗi không cho biết
+    username / email nào có tài khoản.
+    """
+    limit = getattr(settings, "PAYMENT_BULK_ORDER_MAX_LINES", 1000)
+    if not specs:
+        raise ValueError("Missing lines")
+    if len(specs) > limit:
+        raise ValueError(f"Too many lines (max {limit})")
+
+    if not by_staff:
+        for i, s in enumerate(specs):
+            if s.get("username") or not s.get("email"):
+                raise ValueError(f"line {i}: email required")
+    usernames = {s["username"] for s in specs if s.get("username")}
+    emails = {s["email"] for s in specs if not s.get("username") and s.get("email")} if by_staff else set()
+    User = get_user_model()
+    by_name = {u.username: u for u in User.objects.filter(username__in=usernames)} if usernames else {}
+    by_email = {u.email.lower(): u for u in User.objects.filter(email__in=emails)} if emails else {}
+    entries = pricing.get_many_course_pricing({str(s["course_key"]): s["course_key"] for s in specs}.values())
+
+    lines: List[OrderLine] = []
+    currencies = set()
+    seen = set()
+    for i, s in enumerate(specs):
+        user = by_name.get(s["username"]) if s.get("username") else by_email.get(s.get("email") or "")
+        if s.get("username") and user is None:
+            raise ValueError(f"line {i}: invalid recipient")
+        if user is None and not s.get("email"):
+            raise ValueError(f"line {i}: username or email required")
+        who = user.pk if user else s["email"]
+        if (who, s["course_id"]) in seen:
+            raise ValueError(f"line {i}: duplicate seat for {who} in {s['course_id']}")
+        seen.add((who, s["course_id"]))
+        try:
+            amount, currency = _mode_price(entries[str(s["course_key"])], s["mode"])
+        except ValueError as ex:
+            raise ValueError(f"line {i}: {ex}") from None
+        currencies.add(currency)
+        lines.append(OrderLine(user=user, email="" if user else s["email"], course_id=s["course_id"],
+                               mode=s["mode"], amount=amount))
+    if len(currencies) > 1:
+        raise ValueError(f"Lines must share one currency (got {', '.join(sorted(currencies))})")
+    return lines, currencies.pop()
+
+
+def new_order(user, lines: List[OrderLine], currency: str) -> Order:
+    """Order BULK chưa lưu cho các dòng: tổng tiền; course_id / mode chỉ điền khi mọi dòng giống nhau."""
+    courses = {ln.course_id for ln in lines}
+    modes = {ln.mode for ln in lines}
+    return Order(
+        user=user, kind=Order.Kind.BULK,
+        course_id=courses.pop() if len(courses) == 1 else "",
+        mode=modes.pop() if len(modes) == 1 else "",
+        amount=sum((ln.amount for ln in lines), Decimal(0)), currency=currency, status=Order.Status.PENDING,
+    )
+
+
+def save_order(order: Order, lines: List[OrderLine]) -> None:
+    """INSERT đơn + bulk_create các dòng trong 1 transaction (IntegrityError nếu trùng idempotency_key)."""
+    with transaction.atomic():
+        order.save(force_insert=True)
+        for ln in lines:
+            ln.order = order
+        OrderLine.objects.bulk_create(lines, batch_size=getattr(settings, "PAYMENT_BULK_ORDER_MAX_LINES", 1000))
+
+
+# ===== ghi danh =====
+def progress(order_id: int) -> Dict[str, int]:
+    """Số dòng theo trạng thái: {"total", "pending", "enrolled", "invited", "failed"}."""
+    counts = dict(
+        OrderLine.objects.filter(order_id=order_id).order_by().values_list("status").annotate(n=Count("pk"))
+    )
+    out = {s.lower(): counts.get(s, 0) for s in OrderLine.Status.values}
+    out["total"] = sum(counts.values())
+    return out
+
+
+def _enroll_line(line: OrderLine, users: Dict[Any, Any]) -> None:
+    # users: theo id, và theo email chỉ khi đơn do staff mua
+    from opaque_keys.edx.keys import CourseKey
+    from common.djangoapps.student.models import CourseEnrollment, CourseEnrollmentAllowed
+
+    user = users.get(line.user_id) if line.user_id else users.get(line.email.lower())
+    try:
+        # Savepoint mỗi dòng: 1 dòng lỗi không làm hỏng transaction của cả lô
+        with transaction.atomic():
+            course_key = CourseKey.from_string(line.course_id)
+            if user is not None:
+                CourseEnrollment.enroll(user, course_key, line.mode)
+                line.user, line.status = user, OrderLine.Status.ENROLLED
+            else:
+                # Chưa có tài khoản: LMS tự ghi danh khi email này đăng ký
+                CourseEnrollmentAllowed.objects.get_or_create(
+                    email=line.email, course_id=course_key, defaults={"auto_enroll": True})
+                line.status = OrderLine.Status.INVITED
+            line.error = ""
+    except Exception as ex:
+        log.exception("payment-gateway: bulk enrollment failed for line %s of order %s", line.pk, line.order_id)
+        line.status, line.error = OrderLine.Status.FAILED, str(ex)[:1000]
+
+
+def _enroll_chunk(order_id: int, chunk_size: int, by_staff: bool) -> int:
+    with transaction.atomic():
+        lines = list(
+            OrderLine.objects.select_for_update(skip_locked=True)
+            .filter(order_id=order_id, status=OrderLine.Status.PENDING).order_by("pk")[:chunk_size]
+        )
+        if not lines:
+            return 0
+        # User của cả lô trong 1 query: theo id, và theo email cho dòng chưa có user (chỉ đơn của staff)
+        ids = {ln.user_id for ln in lines if ln.user_id}
+        emails = {ln.email for ln in lines if not ln.user_id} if by_staff else set()
+        users: Dict[Any, Any] = {}
+        for u in get_user_model().objects.filter(Q(pk__in=ids) | Q(email__in=emails)):
+            users[u.pk] = u
+            if by_staff and u.email:
+                users.setdefault(u.email.lower(), u)
+        now = timezone.now()
+        for ln in lines:
+            _enroll_line(ln, users)
+            ln.updated_at = now
+        OrderLine.objects.bulk_update(lines, ["user", "status", "error", "updated_at"])
+    return len(lines)
+
+
+def enroll_order(order_id: int, chunk_size: Optional[int] = None, max_chunks: Optional[int] = None) -> Dict[str, int]:
+    """Ghi danh các dòng PENDING của đơn nhóm đã PAID theo lô; trả về progress()."""
+    chunk_size = chunk_size or getattr(settings, "PAYMENT_BULK_ENROLL_CHUNK", 100)
+    by_staff = (
+        Order.objects.filter(pk=order_id, kind=Order.Kind.BULK, status=Order.Status.PAID)
+        .values_list("user__is_staff", flat=True).first()
+    )
+    if by_staff is not None:
+        chunks = 0
+        while max_chunks is None or chunks < max_chunks:
+            if not _enroll_chunk(order_id, chunk_size, by_staff):
+                break
+            chunks += 1
+    return progress(order_id)
+
+
+def resumable_orders() -> List[int]:
+    """Đơn nhóm đã PAID còn dòng PENDING (worker bị ngắt, hoặc dòng được đưa lại hàng đợi)."""
+    return list(
+        Order.objects.filter(kind=Order.Kind.BULK, status=Order.Status.PAID, lines__status=OrderLine.Status.PENDING)
+        .order_by("pk").values_list("pk", flat=True).distinct()
+    )
+
+
+def requeue(statuses: List[str], order_ids: Optional[List[int]] = None) -> int:
+    """Đưa các dòng FAILED / INVITED về PENDING để lần chạy sau thử lại.
+
+    INVITED chỉ với đơn của staff (worker tra email, có thể đã đăng ký); đơn khác không tra
+    email nên người nhận dùng link nhận suất.
+    """
+    qs = OrderLine.objects.filter(status__in=statuses, order__status=Order.Status.PAID).exclude(
+        status=OrderLine.Status.INVITED, order__user__is_staff=False)
+    if order_ids is not None:
+        qs = qs.filter(order_id__in=order_ids)
+    return qs.update(status=OrderLine.Status.PENDING, updated_at=timezone.now())
+
+
+# ===== nhận suất qua link mời =====
+def claim_url(line_id: int) -> str:
+    return f"/payment-gateway/bulk/claim/{Signer(salt=CLAIM_SALT).sign(str(line_id))}/"
+
+
+def invitations(order_id: int) -> List[Dict[str, Any]]:
+    """Các suất INVITED của đơn kèm link nhận suất (người mua gửi cho từng email)."""
+    rows = (OrderLine.objects.filter(order_id=order_id, status=OrderLine.Status.INVITED).order_by("pk")
+            .values_list("pk", "email", "course_id", "mode"))
+    return [{"email": email, "course_id": course_id, "mode": mode, "claim_url": claim_url(pk)}
+            for pk, email, course_id, mode in rows]
+
+
+def _claim_lines(token: str):
+    try:
+        pk = int(Signer(salt=CLAIM_SALT).unsign(token))
+    except (BadSignature, ValueError):
+        raise ClaimRejected("Invalid invitation link") from None
+    return OrderLine.objects.filter(pk=pk, order__status=Order.Status.PAID)
+
+
+def claimable(token: str) -> OrderLine:
+    """Dòng của link mời; raise ClaimRejected nếu link sai hoặc đơn chưa PAID."""
+    line = _claim_lines(token).first()
+    if line is None:
+        raise ClaimRejected("Invalid invitation link")
+    return line
+
+
+def claim(token: str, user) -> OrderLine:
+    """Ghi danh user vào suất INVITED của link, đúng mode đã trả tiền; mở lại link thì trả về dòng cũ.
+
+    Chỉ nhận tài khoản đã kích hoạt (email đã xác minh) có đúng email của suất. Lỗi chỉ nói về
+    tài khoản đang đăng nhập, không cho biết email nào có tài khoản.
+    """
+    from opaque_keys.edx.keys import CourseKey
+    from common.djangoapps.student.models import CourseEnrollment
+
+    lines = _claim_lines(token)
+    with transaction.atomic():
+        # Khoá dòng: 2 lần mở link cùng lúc không ghi danh 2 lần, worker bỏ qua dòng đang khoá
+        line = lines.select_for_update(of=("self",)).first()
+        if line is None:
+            raise ClaimRejected("Invalid invitation link")
+        if line.status == OrderLine.Status.ENROLLED and line.user_id == user.pk:
+            return line
+        if line.status != OrderLine.Status.INVITED:
+            raise ClaimRejected("Invitation already used")
+        if not (user.is_active and user.email and user.email.lower() == line.email.lower()):
+            raise ClaimRejected("This invitation is for another email address")
+        CourseEnrollment.enroll(user, CourseKey.from_string(line.course_id), line.mode)
+        line.user, line.status, line.error = user, OrderLine.Status.ENROLLED, ""
+        line.save(update_fields=["user", "status", "error", "updated_at"])
+    return line
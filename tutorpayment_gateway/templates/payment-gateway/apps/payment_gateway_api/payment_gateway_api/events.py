@@ -0,0 +1,45 @@
+# payment_gateway_api/events.py
+# Nhật ký OrderEvent: mỗi lần Order đổi trạng thái ghi 1 dòng (trạng thái cũ -> mới,
+# nguồn, provider, txn id, hash của thông báo provider). Dòng được ghi trong cùng
+# transaction với UPDATE trạng thái, nên nhật ký luôn khớp Order.status (rollback thì
+# mất cả hai). Một lô thông báo ghi mọi event bằng 1 bulk_create.
+import hashlib
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+
+from . import signing
+from .models import Order, OrderEvent
+
+EVENT_FIELDS = ("id", "from_status", "to_status", "source", "provider", "txn_id", "payload_hash", "created_at")
+
+
+def enabled() -> bool:
+    return getattr(settings, "PAYMENT_ORDER_EVENTS", True)
+
+
+def payload_hash(note: Optional[Dict[str, Any]]) -> str:
+    return hashlib.sha256(signing.canonical_json(note)).hexdigest() if note else ""
+
+
+def event(order: Order, from_status: str, source: str, note: Optional[Dict[str, Any]] = None) -> OrderEvent:
+    """Event chưa lưu cho đơn vừa chuyển sang order.status."""
+    return OrderEvent(
+        order_uid=order.uid, from_status=from_status or "", to_status=order.status, source=source,
+        provider=order.provider or "", txn_id=str((note or {}).get("txn_id") or order.external_txn_id or "")[:128],
+        payload_hash=payload_hash(note),
+    )
+
+
+def write(events: List[OrderEvent]) -> None:
+    if events and enabled():
+        OrderEvent.objects.bulk_create(events)
+
+
+def record(order: Order, from_status: str, source: str, note: Optional[Dict[str, Any]] = None) -> None:
+    write([event(order, from_status, source, note)])
+
+
+def history(order_uid) -> List[Dict[str, Any]]:
+    """Các lần chuyển trạng thái của đơn theo thứ tự (1 query theo index order_uid, id)."""
+    return list(OrderEvent.objects.filter(order_uid=order_uid).order_by("id").values(*EVENT_FIELDS))
@@ -0,0 +1,149 @@
+# payment_gateway_api/inbox.py
+# Inbox bền vững cho callback confirm: confirm chỉ kiểm chữ ký + INSERT rồi trả 200;
+# worker (Celery task hoặc management command) xử lý theo lô, khoá dòng bằng
+# SELECT ... FOR UPDATE SKIP LOCKED để nhiều worker chạy song song.
+# Tin lỗi được lùi available_at để retry; drain tự hẹn lần chạy kế tiếp cho các tin đó.
+import hashlib
+import json
+import logging
+import math
+import time
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from . import processing, tasks
+from .models import InboxMessage
+
+log = logging.getLogger(__name__)
+
+DRAIN_SCHEDULED_KEY = "payment_gateway:inbox:drain_scheduled"
+# Thời điểm (timestamp) của lần drain đã hẹn cho tin chờ retry
+DRAIN_LATER_KEY = "payment_gateway:inbox:drain_later"
+# Hẹn xa quá thì broker (Redis visibility_timeout) có thể giao task 2 lần; drain thừa vô hại
+MAX_COUNTDOWN = 3600
+
+
+def _dedupe_key(note: Dict[str, Any]) -> str:
+    txn_id = note.get("txn_id") or ""
+    if txn_id:
+        basis = f"txn:{note.get('provider') or ''}:{txn_id}:{note.get('status')}"
+    else:
+        basis = f"order:{note.get('order_uid')}:{note.get('status')}"
+    return hashlib.sha256(basis.encode()).hexdigest()
+
+
+def _message(note: Dict[str, Any]) -> InboxMessage:
+    return InboxMessage(
+        dedupe_key=_dedupe_key(note),
+        provider=str(note.get("provider") or "")[:32],
+        txn_id=str(note.get("txn_id") or "")[:128],
+        order_uid=str(note.get("order_uid") or "")[:36],
+        payload=json.dumps(note, separators=(",", ":")),
+    )
+
+
+def enqueue(notes: List[Dict[str, Any]]) -> None:
+    """Lưu thông báo vào inbox (1 INSERT, trùng thì bỏ qua) và hẹn worker xử lý."""
+    InboxMessage.objects.bulk_create([_message(n) for n in notes], ignore_conflicts=True)
+    # Chỉ hẹn 1 lần drain dù nhiều callback tới cùng lúc; drain() xoá cờ khi bắt đầu
+    if cache.add(DRAIN_SCHEDULED_KEY, 1, 30):
+        tasks.enqueue_inbox_drain()
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    base = getattr(settings, "PAYMENT_INBOX_RETRY_DELAY", 60)
+    return timedelta(seconds=min(base * (2 ** (attempts - 1)), 6 * 3600))
+
+
+def _process_batch(batch_size: int) -> Optional[Dict[str, int]]:
+    now = timezone.now()
+    max_attempts = getattr(settings, "PAYMENT_INBOX_MAX_ATTEMPTS", 5)
+    with transaction.atomic():
+        msgs = list(
+            InboxMessage.objects.select_for_update(skip_locked=True)
+            .filter(status=InboxMessage.Status.NEW, available_at__lte=now)
+            .order_by("id")[:batch_size]
+        )
+        if not msgs:
+            return None
+
+        notes: List[Dict[str, Any]] = []
+        for m in msgs:
+            try:
+                notes.append(json.loads(m.payload))
+            except ValueError:
+                notes.append({})
+        try:
+            results = processing.apply_notifications(notes, source="inbox")
+        except Exception:
+            # Chỉ tin lỗi bị retry / DEAD, các tin khác trong lô vẫn DONE
+            log.exception("payment-gateway: inbox batch failed, processing messages one by one")
+            results = processing.apply_each(notes, source="inbox")
+
+        counts = {"done": 0, "retry": 0, "dead": 0}
+        for m, res in zip(msgs, results):
+            m.attempts += 1
+            if res.get("ok"):
+                m.status = InboxMessage.Status.DONE
+                m.processed_at = now
+                m.last_error = ""
+                counts["done"] += 1
+            else:
+                m.last_error = str(res.get("error") or "")[:2000]
+                if m.attempts >= max_attempts:
+                    m.status = InboxMessage.Status.DEAD
+                    m.processed_at = now
+                    counts["dead"] += 1
+                    log.warning("payment-gateway: inbox message %s dead-lettered: %s", m.pk, m.last_error)
+                else:
+                    m.available_at = now + _retry_delay(m.attempts)
+                    counts["retry"] += 1
+        InboxMessage.objects.bulk_update(
+            msgs, ["status", "attempts", "last_error", "available_at", "processed_at"]
+        )
+    return counts
+
+
+def drain(batch_size: Optional[int] = None, max_batches: Optional[int] = None) -> Dict[str, int]:
+    """Xử lý inbox đến khi hết tin đến hạn (hoặc đủ max_batches lô)."""
+    cache.delete(DRAIN_SCHEDULED_KEY)
+    batch_size = batch_size or getattr(settings, "PAYMENT_INBOX_BATCH_SIZE", 100)
+    total = {"batches": 0, "done": 0, "retry": 0, "dead": 0}
+    while max_batches is None or total["batches"] < max_batches:
+        counts = _process_batch(batch_size)
+        if counts is None:
+            break
+        total["batches"] += 1
+        for k, v in counts.items():
+            total[k] += v
+    _schedule_next()
+    return total
+
+
+def _schedule_next() -> None:
+    """Hẹn lần drain kế tiếp lúc tin NEW sớm nhất đến hạn (tin chờ retry có available_at ở tương lai)."""
+    due = (
+        InboxMessage.objects.filter(status=InboxMessage.Status.NEW)
+        .order_by("available_at").values_list("available_at", flat=True).first()
+    )
+    if due is None:
+        return
+    at = due.timestamp()
+    scheduled = cache.get(DRAIN_LATER_KEY)
+    if scheduled is not None and scheduled <= at:
+        # Đã có lần drain hẹn sớm hơn, nó sẽ tự hẹn tiếp
+        return
+    countdown = min(max(1, math.ceil(at - time.time())), MAX_COUNTDOWN)
+    cache.set(DRAIN_LATER_KEY, time.time() + countdown, countdown)
+    tasks.schedule_inbox_drain(countdown)
+
+
+def requeue_dead() -> int:
+    return InboxMessage.objects.filter(status=InboxMessage.Status.DEAD).update(
+        status=InboxMessage.Status.NEW, attempts=0, available_at=timezone.now(), processed_at=None
+    )
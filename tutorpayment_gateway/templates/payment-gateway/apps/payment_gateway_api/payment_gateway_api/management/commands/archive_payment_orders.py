@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from payment_gateway_api import archive
+
+
+class Command(BaseCommand):
+    help = "Chuyển đơn PAID/FAILED/CANCELED cũ sang bảng OrderArchive theo lô."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than-days", type=int, default=None,
+                            help="Mặc định PAYMENT_ARCHIVE_AFTER_DAYS.")
+        parser.add_argument("--batch-size", type=int, default=None,
+                            help="Mặc định PAYMENT_ARCHIVE_BATCH_SIZE.")
+        parser.add_argument("--max-batches", type=int, default=None)
+        parser.add_argument("--dry-run", action="store_true", help="Chỉ đếm số đơn sẽ được chuyển.")
+
+    def handle(self, *args, **opts):
+        days = opts["older_than_days"] or getattr(settings, "PAYMENT_ARCHIVE_AFTER_DAYS", 180)
+        batch_size = opts["batch_size"] or getattr(settings, "PAYMENT_ARCHIVE_BATCH_SIZE", 1000)
+        total = archive.archive_orders(
+            older_than=timedelta(days=days),
+            batch_size=batch_size,
+            max_batches=opts["max_batches"],
+            dry_run=opts["dry_run"],
+        )
+        if opts["dry_run"]:
+            self.stdout.write(f"[dry-run] would archive {total['would_archive']} order(s) older than {days} day(s)")
+        else:
+            self.stdout.write(f"archived {total['archived']} order(s) in {total['batches']} batch(es)")
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from payment_gateway_api import bulk
+from payment_gateway_api.models import Order, OrderLine
+
+
+class Command(BaseCommand):
+    help = "Ghi danh tiếp các suất còn PENDING của đơn nhóm đã PAID (sau khi worker bị ngắt)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--order", default=None, help="Chỉ xử lý đơn nhóm có uid này.")
+        parser.add_argument("--chunk-size", type=int, default=None, help="Mặc định PAYMENT_BULK_ENROLL_CHUNK.")
+        parser.add_argument("--retry-failed", action="store_true", help="Thử lại các suất FAILED.")
+        parser.add_argument("--retry-invited", action="store_true",
+                            help="Thử lại các suất INVITED của đơn do staff mua (email có thể đã đăng ký "
+                                 "tài khoản); suất của đơn khác được nhận qua link mời.")
+
+    def handle(self, *args, **opts):
+        order_ids = None
+        if opts["order"]:
+            order_ids = list(Order.objects.filter(uid=opts["order"], kind=Order.Kind.BULK).values_list("pk", flat=True))
+            if not order_ids:
+                raise CommandError(f"group order {opts['order']} not found")
+        statuses = [s for flag, s in (("retry_failed", OrderLine.Status.FAILED),
+                                      ("retry_invited", OrderLine.Status.INVITED)) if opts[flag]]
+        if statuses:
+            self.stdout.write(f"requeued {bulk.requeue(statuses, order_ids)} seat(s)")
+
+        for pk in order_ids if order_ids is not None else bulk.resumable_orders():
+            done = bulk.enroll_order(pk, chunk_size=opts["chunk_size"])
+            self.stdout.write(
+                "order {pk}: total={total} enrolled={enrolled} invited={invited} failed={failed} pending={pending}"
+                .format(pk=pk, **done)
+            )
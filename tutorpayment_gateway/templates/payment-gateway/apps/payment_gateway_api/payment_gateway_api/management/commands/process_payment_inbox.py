@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from payment_gateway_api import inbox
+
+
+class Command(BaseCommand):
+    help = "Xử lý inbox callback confirm của payment gateway theo lô."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--max-batches", type=int, default=None)
+        parser.add_argument("--loop", action="store_true", help="Chạy liên tục, nghỉ --interval giây khi inbox rỗng.")
+        parser.add_argument("--interval", type=float, default=5.0)
+        parser.add_argument("--requeue-dead", action="store_true", help="Đưa tin DEAD về NEW trước khi xử lý.")
+
+    def handle(self, *args, **opts):
+        if opts["requeue_dead"]:
+            self.stdout.write(f"requeued {inbox.requeue_dead()} dead message(s)")
+        while True:
+            total = inbox.drain(batch_size=opts["batch_size"], max_batches=opts["max_batches"])
+            if total["batches"] or not opts["loop"]:
+                self.stdout.write(
+                    "batches={batches} done={done} retry={retry} dead={dead}".format(**total)
+                )
+            if not opts["loop"]:
+                break
+            if not total["batches"]:
+                time.sleep(opts["interval"])
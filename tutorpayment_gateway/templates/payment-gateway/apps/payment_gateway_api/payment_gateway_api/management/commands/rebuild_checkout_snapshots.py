@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from payment_gateway_api import snapshots
+
+
+class Command(BaseCommand):
+    help = "Dựng lại bảng CourseCheckoutSnapshot cho mọi khoá học theo lô."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **opts):
+        total = snapshots.rebuild_all(batch_size=opts["batch_size"])
+        self.stdout.write(f"rebuilt {total['courses']} course snapshot(s) in {total['batches']} batch(es)")
@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from payment_gateway_api import reconcile
+
+
+class Command(BaseCommand):
+    help = "Đối soát đơn PENDING quá hạn với trạng thái bên provider (node, VNPay...)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than", type=int, default=30, help="Chỉ xét đơn tạo trước N phút.")
+        parser.add_argument("--chunk-size", type=int, default=200)
+        parser.add_argument("--workers", type=int, default=8, help="Số request song song tới node.")
+        parser.add_argument("--rate", type=float, default=20.0, help="Tối đa N request/giây (0 = không giới hạn).")
+        parser.add_argument("--limit", type=int, default=None, help="Xét tối đa N đơn.")
+        parser.add_argument("--expire-after", type=int, default=None,
+                            help="Huỷ đơn cũ hơn N giờ mà node vẫn không xác nhận.")
+        parser.add_argument("--node-url", default=None, help="Ghi đè URL trạng thái của provider (vd. stub node).")
+        parser.add_argument("--dry-run", action="store_true", help="Chỉ báo cáo, không ghi DB.")
+
+    def handle(self, *args, **opts):
+        def progress(s):
+            self.stdout.write(
+                "scanned={scanned} paid={paid} failed={failed} canceled={canceled} "
+                "expired={expired} pending={pending} errors={errors} elapsed={elapsed}s".format(**s)
+            )
+
+        summary = reconcile.reconcile(
+            older_than=timedelta(minutes=opts["older_than"]),
+            chunk_size=opts["chunk_size"],
+            workers=opts["workers"],
+            rate=opts["rate"],
+            dry_run=opts["dry_run"],
+            limit=opts["limit"],
+            expire_after=timedelta(hours=opts["expire_after"]) if opts["expire_after"] else None,
+            node_url=opts["node_url"],
+            progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(("[dry-run] " if opts["dry_run"] else "") + "done"))
+        progress(summary)
+        if summary.get("aborted"):
+            self.stderr.write(f"aborted: {summary['aborted']}")
@@ -0,0 +1,189 @@
+# payment_gateway_api/metrics.py
+# Metric Prometheus cho checkout / confirm / giá khoá học và Node client.
+# PAYMENT_METRICS_ENABLED=False (mặc định) hoặc thiếu prometheus_client thì mọi
+# hàm ở đây là no-op: chỉ 1 phép so sánh, không tạo object, không khoá.
+#
+# Nhiều worker (uwsgi/gunicorn): đặt PAYMENT_METRICS_MULTIPROC_DIR (hoặc biến môi
+# trường PROMETHEUS_MULTIPROC_DIR) trỏ tới thư mục trống, dọn sạch khi container
+# khởi động; endpoint /metrics sẽ gộp số liệu của tất cả worker.
+import asyncio
+import functools
+import hmac
+import logging
+import os
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Optional, Tuple
+
+from django.conf import settings
+
+log = logging.getLogger(__name__)
+
+# Bucket (giây) cho cả request lẫn từng phase; Node/enroll có thể mất vài giây
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_NULL = nullcontext()
+_state: Optional[Any] = None  # None = chưa khởi tạo, False = tắt, _Metrics = bật
+
+
+class _Metrics:
+    def __init__(self, prom: Any):
+        self.prom = prom
+        self.requests = prom.Counter(
+            "payment_gateway_requests_total", "HTTP requests by endpoint and response code",
+            ["endpoint", "code"])
+        self.latency = prom.Histogram(
+            "payment_gateway_request_seconds", "End-to-end view latency",
+            ["endpoint"], buckets=BUCKETS)
+        self.in_flight = prom.Gauge(
+            "payment_gateway_in_flight_requests", "Requests currently being handled",
+            ["endpoint"], multiprocess_mode="livesum")
+        self.phase = prom.Histogram(
+            "payment_gateway_phase_seconds", "Time spent per phase (db, sign, node, enroll, pricing)",
+            ["phase"], buckets=BUCKETS)
+        self.node = prom.Counter(
+            "payment_gateway_node_requests_total", "Calls to the payment node by operation and outcome",
+            ["op", "outcome"])
+        self.orders = prom.Counter(
+            "payment_gateway_orders_total", "Order state changes by status and provider",
+            ["status", "provider"])
+        self.over_budget = prom.Counter(
+            "payment_gateway_query_budget_exceeded_total", "Requests that ran more DB queries than the view budget",
+            ["view"])
+        self.singleflight = prom.Counter(
+            "payment_gateway_singleflight_total",
+            "Duplicate payment creations: leader calls, results shared in/across processes, missed joins",
+            ["result"])
+
+
+def _load() -> Any:
+    global _state
+    if not getattr(settings, "PAYMENT_METRICS_ENABLED", False):
+        _state = False
+        return _state
+    mp_dir = getattr(settings, "PAYMENT_METRICS_MULTIPROC_DIR", "")
+    if mp_dir:
+        # Phải có trước khi import prometheus_client thì giá trị mới ghi ra file
+        os.makedirs(mp_dir, exist_ok=True)
+        os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", mp_dir)
+    try:
+        import prometheus_client
+    except ImportError:
+        log.warning("payment-gateway: PAYMENT_METRICS_ENABLED but prometheus_client is not installed")
+        _state = False
+        return _state
+    _state = _Metrics(prometheus_client)
+    return _state
+
+
+def _get() -> Any:
+    return _load() if _state is None else _state
+
+
+def enabled() -> bool:
+    return bool(_get())
+
+
+def instrument(endpoint: str) -> Callable:
+    """Decorator cho view: latency, số request theo mã HTTP và số request đang chạy."""
+    def deco(view):
+        if asyncio.iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def awrapper(request, *args, **kwargs):
+                m = _get()
+                if not m:
+                    return await view(request, *args, **kwargs)
+                start, resp = _begin(m, endpoint), None
+                try:
+                    resp = await view(request, *args, **kwargs)
+                    return resp
+                finally:
+                    _end(m, endpoint, start, resp)
+            return awrapper
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            m = _get()
+            if not m:
+                return view(request, *args, **kwargs)
+            start, resp = _begin(m, endpoint), None
+            try:
+                resp = view(request, *args, **kwargs)
+                return resp
+            finally:
+                _end(m, endpoint, start, resp)
+        return wrapper
+    return deco
+
+
+def _begin(m: _Metrics, endpoint: str) -> float:
+    m.in_flight.labels(endpoint).inc()
+    return time.perf_counter()
+
+
+def _end(m: _Metrics, endpoint: str, start: float, resp: Any) -> None:
+    # resp None: view raise exception
+    code = str(resp.status_code) if resp is not None else "500"
+    m.latency.labels(endpoint).observe(time.perf_counter() - start)
+    m.requests.labels(endpoint, code).inc()
+    m.in_flight.labels(endpoint).dec()
+
+
+@contextmanager
+def _timed(m: _Metrics, name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        m.phase.labels(name).observe(time.perf_counter() - start)
+
+
+def phase(name: str):
+    """`with metrics.phase("db"): ...` — đo thời gian một phase."""
+    m = _get()
+    return _timed(m, name) if m else _NULL
+
+
+def node_call(op: str, outcome: str, seconds: float) -> None:
+    m = _get()
+    if m:
+        m.node.labels(op, outcome).inc()
+        m.phase.labels("node").observe(seconds)
+
+
+def order_status(status: str, provider: str, count: int = 1) -> None:
+    m = _get()
+    if m and count:
+        m.orders.labels(str(status), provider or "").inc(count)
+
+
+def query_budget_exceeded(view: str) -> None:
+    m = _get()
+    if m:
+        m.over_budget.labels(view).inc()
+
+
+def singleflight(result: str) -> None:
+    m = _get()
+    if m:
+        m.singleflight.labels(result).inc()
+
+
+def render() -> Tuple[bytes, str]:
+    """Text format Prometheus; gộp các worker khi chạy chế độ multiprocess."""
+    prom = _get().prom
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+        registry = prom.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prom.REGISTRY
+    return prom.generate_latest(registry), prom.CONTENT_TYPE_LATEST
+
+
+def token_ok(request) -> bool:
+    token = getattr(settings, "PAYMENT_METRICS_TOKEN", "")
+    if not token:
+        return False
+    auth = request.headers.get("Authorization", "")
+    return auth.startswith("Bearer ") and hmac.compare_digest(auth[7:].encode(), token.encode())
@@ -21,7 +21,7 @@ class Migration(migrations.Migration):
                 ('amount', models.DecimalField(max_digits=12, decimal_places=2)),
                 ('currency', models.CharField(max_length=8, default='VND')),
                 ('status', models.CharField(max_length=16, choices=[
-                    ('PENDING','PENDING'),('PAID','PAID'),('FAILED','FAILED'),('CANCELED','CANCELED')
+                    ('PENDING','Pending'),('PAID','Paid'),('FAILED','Failed'),('CANCELED','Canceled')
                 ], default='PENDING')),
                 ('provider', models.CharField(max_length=32, blank=True)),
                 ('external_txn_id', models.CharField(max_length=128, blank=True)),
@@ -0,0 +1,17 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment_gateway_api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='checkout_url',
+            field=models.CharField(max_length=1024, blank=True, default=''),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,45 @@
+from django.db import migrations, models
+
+
+def blank_txn_to_null(apps, schema_editor):
+    Order = apps.get_model('payment_gateway_api', 'Order')
+    Order.objects.filter(external_txn_id='').update(external_txn_id=None)
+
+
+def null_txn_to_blank(apps, schema_editor):
+    Order = apps.get_model('payment_gateway_api', 'Order')
+    Order.objects.filter(external_txn_id__isnull=True).update(external_txn_id='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment_gateway_api', '0002_order_checkout_url'),
+    ]
+
+    operations = [
+        # '' -> NULL để unique (external_txn_id, provider) chỉ áp dụng khi đã có txn id
+        # (MySQL không hỗ trợ partial unique index, NULL thì được bỏ qua ở mọi DB)
+        migrations.AlterField(
+            model_name='order',
+            name='external_txn_id',
+            field=models.CharField(max_length=128, blank=True, null=True),
+        ),
+        migrations.RunPython(blank_txn_to_null, null_txn_to_blank),
+        migrations.RemoveIndex(
+            model_name='order',
+            name='order_uid_status_course_idx',
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', 'course_id', 'status'], name='order_user_course_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='order',
+            constraint=models.UniqueConstraint(fields=['external_txn_id', 'provider'], name='order_txn_provider_uniq'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations, models
+
+
+def blank_key_to_null(apps, schema_editor):
+    Order = apps.get_model('payment_gateway_api', 'Order')
+    Order.objects.filter(idempotency_key='').update(idempotency_key=None)
+
+
+def null_key_to_blank(apps, schema_editor):
+    Order = apps.get_model('payment_gateway_api', 'Order')
+    Order.objects.filter(idempotency_key__isnull=True).update(idempotency_key='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment_gateway_api', '0003_order_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='idempotency_key',
+            field=models.CharField(max_length=64, blank=True, null=True),
+        ),
+        migrations.RunPython(blank_key_to_null, null_key_to_blank),
+        migrations.AlterField(
+            model_name='order',
+            name='idempotency_key',
+            field=models.CharField(max_length=64, blank=True, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment_gateway_api', '0004_order_idempotency_key_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InboxMessage',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False, auto_created=True, verbose_name='ID')),
+                ('dedupe_key', models.CharField(max_length=64, unique=True)),
+                ('provider', models.CharField(max_length=32, blank=True)),
+                ('txn_id', models.CharField(max_length=128, blank=True)),
+                ('order_uid', models.CharField(max_length=36, blank=True)),
+                ('payload', models.TextField()),
+                ('status', models.CharField(max_length=8, choices=[
+                    ('NEW','New'),('DONE','Done'),('DEAD','Dead')
+                ], default='NEW')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(null=True, blank=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='inboxmessage',
+            index=models.Index(fields=['status', 'available_at'], name='inbox_status_available_idx'),
+        ),
+    ]
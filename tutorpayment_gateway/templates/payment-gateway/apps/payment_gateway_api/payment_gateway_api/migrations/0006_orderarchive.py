@@ -0,0 +1,43 @@
+from django.db import migrations, models
+import django.db.models.deletion
+from django.conf import settings
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('payment_gateway_api', '0005_inboxmessage'),
+    ]
+
+    operations = [
+        # Bỏ ordering mặc định (-created_at) khỏi Order
+        migrations.AlterModelOptions(
+            name='order',
+            options={},
+        ),
+        migrations.CreateModel(
+            name='OrderArchive',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False, auto_created=True, verbose_name='ID')),
+                ('uid', models.UUIDField(unique=True, editable=False)),
+                ('course_id', models.CharField(max_length=255)),
+                ('mode', models.CharField(max_length=32)),
+                ('amount', models.DecimalField(max_digits=12, decimal_places=2)),
+                ('currency', models.CharField(max_length=8)),
+                ('status', models.CharField(max_length=16, choices=[
+                    ('PENDING','Pending'),('PAID','Paid'),('FAILED','Failed'),('CANCELED','Canceled')
+                ])),
+                ('provider', models.CharField(max_length=32, blank=True)),
+                ('external_txn_id', models.CharField(max_length=128, blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='orderarchive',
+            index=models.Index(fields=['created_at'], name='order_archive_created_idx'),
+        ),
+    ]
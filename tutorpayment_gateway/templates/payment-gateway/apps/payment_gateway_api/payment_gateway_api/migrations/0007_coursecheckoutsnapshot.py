@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment_gateway_api', '0006_orderarchive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseCheckoutSnapshot',
+            fields=[
+                ('course_id', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('course_name', models.TextField(null=True, blank=True)),
+                ('course_start', models.DateTimeField(null=True, blank=True)),
+                ('course_end', models.DateTimeField(null=True, blank=True)),
+                ('enrollment_start', models.DateTimeField(null=True, blank=True)),
+                ('enrollment_end', models.DateTimeField(null=True, blank=True)),
+                ('invite_only', models.BooleanField(null=True)),
+                ('modes', models.JSONField(default=list)),
+                ('valid_until', models.DateTimeField(null=True, blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,37 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('payment_gateway_api', '0007_coursecheckoutsnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='kind',
+            field=models.CharField(choices=[('SINGLE', 'Single'), ('BULK', 'Bulk')], default='SINGLE', max_length=8),
+        ),
+        migrations.CreateModel(
+            name='OrderLine',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(blank=True, max_length=254)),
+                ('course_id', models.CharField(max_length=255)),
+                ('mode', models.CharField(max_length=32)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('ENROLLED', 'Enrolled'), ('INVITED', 'Invited'), ('FAILED', 'Failed')], default='PENDING', max_length=16)),
+                ('error', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='payment_gateway_api.order')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['order', 'status'], name='orderline_order_status_idx')],
+            },
+        ),
+    ]
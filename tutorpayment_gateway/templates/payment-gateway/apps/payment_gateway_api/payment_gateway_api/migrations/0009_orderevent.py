@@ -0,0 +1,28 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment_gateway_api', '0008_order_kind_orderline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('order_uid', models.UUIDField()),
+                ('from_status', models.CharField(blank=True, max_length=16)),
+                ('to_status', models.CharField(max_length=16)),
+                ('source', models.CharField(max_length=32)),
+                ('provider', models.CharField(blank=True, max_length=32)),
+                ('txn_id', models.CharField(blank=True, max_length=128)),
+                ('payload_hash', models.CharField(blank=True, max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['order_uid', 'id'], name='orderevent_order_id_idx')],
+            },
+        ),
+    ]
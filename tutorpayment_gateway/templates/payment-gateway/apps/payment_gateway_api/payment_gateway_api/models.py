@@ -2,6 +2,7 @@
 import uuid
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 class Order(models.Model):
     class Status(models.TextChoices):
@@ -10,23 +11,179 @@ class Order(models.Model):
         FAILED   = "FAILED"
         CANCELED = "CANCELED"
 
+    class Kind(models.TextChoices):
+        SINGLE = "SINGLE"  # 1 user, 1 khoá
+        BULK   = "BULK"    # đơn nhóm: người mua trả 1 lần, các suất nằm ở OrderLine
+
     uid = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT)
+    # Đơn nhóm: khoá / mode chung của các dòng, rỗng nếu các dòng khác nhau
     course_id = models.CharField(max_length=255)
     mode = models.CharField(max_length=32, default="verified")
+    kind = models.CharField(max_length=8, choices=Kind.choices, default=Kind.SINGLE)
     amount = models.DecimalField(max_digits=12, decimal_places=2)
     currency = models.CharField(max_length=8, default="VND")
     status = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDING)
     provider = models.CharField(max_length=32, blank=True)
-    external_txn_id = models.CharField(max_length=128, blank=True)
-    idempotency_key = models.CharField(max_length=64, blank=True)
+    # NULL khi provider chưa trả txn id (để unique constraint bỏ qua)
+    external_txn_id = models.CharField(max_length=128, blank=True, null=True)
+    # Khoá chống tạo đơn trùng (double-click / reload checkout); NULL khi đơn đã FAILED/CANCELED
+    idempotency_key = models.CharField(max_length=64, blank=True, null=True, unique=True)
+    # URL trang thanh toán do provider trả về (checkout bất đồng bộ chờ field này)
+    checkout_url = models.CharField(max_length=1024, blank=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        indexes = [models.Index(fields=["uid", "status", "course_id"])]
-        ordering = ["-created_at"]
+        # uid đã có unique index riêng; các index dưới đây theo đúng các truy vấn thật
+        indexes = [
+            # kiểm tra đơn trùng của user cho một khoá
+            models.Index(fields=["user", "course_id", "status"], name="order_user_course_status_idx"),
+            # báo cáo / đối soát theo trạng thái và thời gian
+            models.Index(fields=["status", "created_at"], name="order_status_created_idx"),
+        ]
+        constraints = [
+            # Callback của provider tra theo txn id -> cột đầu của index là external_txn_id
+            models.UniqueConstraint(fields=["external_txn_id", "provider"], name="order_txn_provider_uniq"),
+        ]
+        # Không đặt ordering mặc định: truy vấn nóng không phải trả giá ORDER BY;
+        # chỗ nào cần thứ tự thì order_by() tường minh.
 
     def __str__(self):
         return f"{self.uid} - {self.user} - {self.course_id} - {self.status}"
+
+    TERMINAL_STATUSES = (Status.PAID, Status.FAILED, Status.CANCELED)
+
+
+class OrderLine(models.Model):
+    """Một suất của đơn nhóm: ghi danh 1 người (user, hoặc email chưa có tài khoản) vào 1 khoá."""
+    class Status(models.TextChoices):
+        PENDING  = "PENDING"   # chờ đơn PAID / chờ worker ghi danh
+        ENROLLED = "ENROLLED"
+        INVITED  = "INVITED"   # theo email: CourseEnrollmentAllowed + link nhận suất (bulk.claim)
+        FAILED   = "FAILED"
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="lines")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT, null=True, blank=True,
+                             related_name="+")
+    email = models.EmailField(blank=True)
+    course_id = models.CharField(max_length=255)
+    mode = models.CharField(max_length=32)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDING)
+    error = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # worker lấy các dòng PENDING của một đơn theo lô; tiến độ đếm theo trạng thái
+            models.Index(fields=["order", "status"], name="orderline_order_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.order_id} - {self.user_id or self.email} - {self.course_id} - {self.status}"
+
+
+class OrderArchive(models.Model):
+    """Đơn đã kết thúc (PAID/FAILED/CANCELED) được chuyển khỏi bảng Order sau một thời gian."""
+    uid = models.UUIDField(unique=True, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT, related_name="+")
+    course_id = models.CharField(max_length=255)
+    mode = models.CharField(max_length=32)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    currency = models.CharField(max_length=8)
+    status = models.CharField(max_length=16, choices=Order.Status.choices)
+    provider = models.CharField(max_length=32, blank=True)
+    external_txn_id = models.CharField(max_length=128, blank=True, null=True)
+
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at"], name="order_archive_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.uid} - {self.course_id} - {self.status} (archived)"
+
+
+class OrderEvent(models.Model):
+    """Nhật ký chuyển trạng thái đơn: chỉ thêm, không sửa / xoá; còn nguyên khi đơn đã lưu trữ."""
+    id = models.BigAutoField(primary_key=True)
+    # Không FK: đơn có thể đã chuyển sang OrderArchive
+    order_uid = models.UUIDField()
+    from_status = models.CharField(max_length=16, blank=True)
+    to_status = models.CharField(max_length=16)
+    # Nơi gây ra chuyển trạng thái: confirm, confirm_batch, callback, inbox, reconcile, checkout...
+    source = models.CharField(max_length=32)
+    provider = models.CharField(max_length=32, blank=True)
+    txn_id = models.CharField(max_length=128, blank=True)
+    # sha256 của thông báo provider (JSON chuẩn), để đối chiếu với log bên Node
+    payload_hash = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # lịch sử một đơn theo thứ tự ghi
+            models.Index(fields=["order_uid", "id"], name="orderevent_order_id_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.order_uid}: {self.from_status or '-'} -> {self.to_status} ({self.source})"
+
+
+class InboxMessage(models.Model):
+    """Thông báo confirm đã kiểm chữ ký, chờ worker xử lý (inbox bền vững)."""
+    class Status(models.TextChoices):
+        NEW  = "NEW"
+        DONE = "DONE"
+        DEAD = "DEAD"
+
+    # sha256 của (provider, txn id, status) -> Node gửi lại cũng chỉ lưu một bản
+    dedupe_key = models.CharField(max_length=64, unique=True)
+    provider = models.CharField(max_length=32, blank=True)
+    txn_id = models.CharField(max_length=128, blank=True)
+    order_uid = models.CharField(max_length=36, blank=True)
+    payload = models.TextField()
+    status = models.CharField(max_length=8, choices=Status.choices, default=Status.NEW)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    available_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # worker lấy tin NEW đến hạn theo thứ tự
+            models.Index(fields=["status", "available_at"], name="inbox_status_available_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.order_uid} - {self.txn_id} - {self.status}"
+
+
+class CourseCheckoutSnapshot(models.Model):
+    """Thông tin mua khoá học đã tính sẵn, 1 dòng / khoá (xem snapshots.py)."""
+    course_id = models.CharField(max_length=255, primary_key=True)
+    course_name = models.TextField(null=True, blank=True)
+    course_start = models.DateTimeField(null=True, blank=True)
+    course_end = models.DateTimeField(null=True, blank=True)
+    enrollment_start = models.DateTimeField(null=True, blank=True)
+    enrollment_end = models.DateTimeField(null=True, blank=True)
+    invite_only = models.BooleanField(null=True)
+    # Mode mua được: [{slug, name, currency, min_price (chuỗi Decimal), suggested_prices, sku,
+    # expiration_datetime}], đã bỏ mode free / hết hạn lúc dựng
+    modes = models.JSONField(default=list)
+    # Lúc mode sớm nhất trong `modes` hết hạn; NULL = không mode nào có hạn
+    valid_until = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def is_valid(self, now=None) -> bool:
+        return self.valid_until is None or self.valid_until > (now or timezone.now())
+
+    def __str__(self):
+        return f"{self.course_id} ({len(self.modes)} mode)"
+
@@ -0,0 +1,316 @@
+# payment_gateway_api/node_client.py
+# Client HTTP dùng chung cho Node payment service: giữ kết nối (keep-alive) theo
+# process, pool có giới hạn, tách connect/read timeout, retry lỗi kết nối với
+# backoff có jitter và circuit breaker để fail-fast khi Node chết.
+# View async (PAYMENT_ASYNC_VIEWS) gọi qua apost / acreate_payment: aiohttp, dùng chung
+# breaker và timeout với client sync.
+import asyncio
+import importlib.util
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from urllib3.exceptions import NewConnectionError
+
+from . import metrics
+from .providers.base import ProviderError, ProviderUnavailable
+
+
+class NodeError(ProviderError):
+    """Không gọi được Node hoặc Node trả lỗi."""
+
+
+class NodeUnavailable(ProviderUnavailable, NodeError):
+    """Circuit breaker đang mở: không gọi Node, trả 503 ngay."""
+
+
+def _before_send(ex: requests.ConnectionError) -> bool:
+    """Lỗi lúc mở kết nối: ConnectTimeout hoặc urllib3 NewConnectionError (refused, DNS...)."""
+    if isinstance(ex, requests.ConnectTimeout):
+        return True
+    reason = getattr(ex.args[0], "reason", None) if ex.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+class CircuitBreaker:
+    """Mở sau `threshold` lỗi liên tiếp; sau `reset_after` giây cho 1 request thử (half-open)."""
+
+    def __init__(self, threshold: int, reset_after: float):
+        self.threshold = max(1, threshold)
+        self.reset_after = reset_after
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def retry_after(self) -> int:
+        if self._opened_at is None:
+            return 0
+        left = self.reset_after - (time.monotonic() - self._opened_at)
+        return max(1, int(left + 0.999))
+
+    def is_open(self) -> bool:
+        # Chỉ đọc trạng thái, không chiếm lượt half-open
+        opened_at = self._opened_at
+        return opened_at is not None and time.monotonic() - opened_at < self.reset_after
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_after or self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+    def release(self) -> None:
+        # Lượt gọi kết thúc không có kết quả (bị huỷ, lỗi ngoài dự kiến): trả lượt thử half-open
+        with self._lock:
+            self._probing = False
+
+
+class PaymentNodeClient:
+    def __init__(self, create_url: str, status_url: str = "", connect_timeout: float = 3.0, read_timeout: float = 10.0,
+                 pool_size: int = 10, max_retries: int = 2, backoff: float = 0.2,
+                 breaker_threshold: int = 5, breaker_reset: float = 30.0, async_pool_size: int = 100):
+        self.create_url = create_url
+        self.status_url = status_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max(0, max_retries)
+        self.backoff = backoff
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_reset)
+
+        self.session = requests.Session()
+        # Pool có giới hạn; retry tự xử lý bên dưới (chỉ retry lỗi kết nối)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size), max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.async_pool_size = max(1, async_pool_size)
+        self._aclient: Any = None
+        self._aclient_holder: Any = None
+        self._aclient_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @classmethod
+    def from_settings(cls, **overrides: Any) -> "PaymentNodeClient":
+        # overrides: tham số riêng của từng provider (PAYMENT_PROVIDERS[name])
+        kwargs = dict(
+            create_url=settings.PAYMENT_NODE_CREATE_URL,
+            status_url=getattr(settings, "PAYMENT_NODE_STATUS_URL", ""),
+            connect_timeout=getattr(settings, "PAYMENT_NODE_CONNECT_TIMEOUT", 3.0),
+            read_timeout=getattr(settings, "PAYMENT_NODE_READ_TIMEOUT", 10.0),
+            pool_size=getattr(settings, "PAYMENT_NODE_POOL_SIZE", 10),
+            max_retries=getattr(settings, "PAYMENT_NODE_MAX_RETRIES", 2),
+            backoff=getattr(settings, "PAYMENT_NODE_RETRY_BACKOFF", 0.2),
+            breaker_threshold=getattr(settings, "PAYMENT_NODE_BREAKER_THRESHOLD", 5),
+            breaker_reset=getattr(settings, "PAYMENT_NODE_BREAKER_RESET", 30.0),
+            async_pool_size=getattr(settings, "PAYMENT_NODE_ASYNC_POOL_SIZE", 100),
+        )
+        kwargs.update(overrides)
+        return cls(**kwargs)
+
+    def _sleep_before_retry(self, attempt: int) -> None:
+        # Full jitter: tránh các worker cùng retry một lúc
+        time.sleep(random.uniform(0, self.backoff * (2 ** (attempt - 1))))
+
+    def post(self, url: str, raw: bytes, headers: Dict[str, str], op: str = "call") -> requests.Response:
+        if not self.breaker.allow():
+            metrics.node_call(op, "breaker_open", 0.0)
+            raise NodeUnavailable(self.breaker.retry_after())
+        try:
+            attempt = 0
+            start = time.perf_counter()
+            while True:
+                try:
+                    r = self.session.post(url, data=raw, headers=headers, timeout=self.timeout)
+                except requests.ConnectionError as ex:
+                    # Chỉ retry khi chưa kết nối được (body chưa gửi), giống apost. Lỗi sau khi
+                    # đã gửi (Node đóng kết nối, ReadTimeout) thì không: Node có thể đã xử lý.
+                    attempt += 1
+                    if _before_send(ex) and attempt <= self.max_retries:
+                        self._sleep_before_retry(attempt)
+                        continue
+                    self.breaker.record_failure()
+                    metrics.node_call(op, "error", time.perf_counter() - start)
+                    raise NodeError(f"Cannot reach payment service: {ex}") from ex
+                except requests.RequestException as ex:
+                    self.breaker.record_failure()
+                    metrics.node_call(op, "error", time.perf_counter() - start)
+                    raise NodeError(f"Cannot reach payment service: {ex}") from ex
+
+                if r.status_code >= 500:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                metrics.node_call(op, f"{r.status_code // 100}xx", time.perf_counter() - start)
+                return r
+        except BaseException:
+            self.breaker.release()
+            raise
+
+    def create_payment(self, raw: bytes, sign_headers: Dict[str, str]) -> Dict[str, Any]:
+        r = self.post(self.create_url, raw, {"Content-Type": "application/json", **sign_headers}, op="create")
+        return self._checkout_data(r)
+
+    @staticmethod
+    def _checkout_data(r: Any) -> Dict[str, Any]:
+        # r: requests.Response hoặc AsyncResponse
+        if r.status_code != 200:
+            raise NodeError(f"Create payment failed: {r.text}")
+        try:
+            data = r.json()
+        except ValueError as ex:
+            raise NodeError(f"Create payment failed: invalid response ({ex})") from ex
+        if not isinstance(data, dict) or not data.get("checkout_url"):
+            raise NodeError("Create payment failed: missing checkout_url")
+        return data
+
+    def query_status(self, raw: bytes, sign_headers: Dict[str, str], url: Optional[str] = None) -> Dict[str, Any]:
+        """Hỏi Node trạng thái một payment (dùng cho đối soát đơn PENDING)."""
+        r = self.post(url or self.status_url, raw, {"Content-Type": "application/json", **sign_headers}, op="status")
+        if r.status_code == 404:
+            return {"status": "not_found"}
+        if r.status_code != 200:
+            raise NodeError(f"Query status failed: {r.status_code} {r.text[:200]}")
+        try:
+            data = r.json()
+        except ValueError as ex:
+            raise NodeError(f"Query status failed: invalid response ({ex})") from ex
+        if not isinstance(data, dict):
+            raise NodeError("Query status failed: invalid response")
+        return data
+
+
+    # ===== async (aiohttp) =====
+    async def _async_session(self) -> Any:
+        # Pool aiohttp gắn với event loop tạo ra nó: ASGI chạy 1 loop / process nên thường chỉ tạo 1 lần.
+        # Dưới WSGI mỗi request async có loop riêng, session tạo lại mỗi lần (không giữ kết nối).
+        loop = asyncio.get_running_loop()
+        if self._aclient is None or self._aclient_loop is not loop:
+            import aiohttp
+
+            connect, read = self.timeout
+            holder = _session_holder(aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.async_pool_size),
+                timeout=aiohttp.ClientTimeout(sock_connect=connect, sock_read=read),
+            ))
+            self._aclient = await holder.__anext__()
+            self._aclient_holder = holder
+            self._aclient_loop = loop
+        return self._aclient
+
+    async def apost(self, url: str, raw: bytes, headers: Dict[str, str], op: str = "call") -> "AsyncResponse":
+        """Như post() nhưng không chiếm thread trong lúc chờ Node."""
+        import aiohttp
+
+        # Lỗi lúc kết nối thì retry được; timeout đọc thì không (Node có thể đã xử lý)
+        connect_errors = (aiohttp.ClientConnectorError, getattr(aiohttp, "ConnectionTimeoutError", ()))
+        if not self.breaker.allow():
+            metrics.node_call(op, "breaker_open", 0.0)
+            raise NodeUnavailable(self.breaker.retry_after())
+        try:
+            session = await self._async_session()
+            attempt = 0
+            start = time.perf_counter()
+            while True:
+                try:
+                    async with session.post(url, data=raw, headers=headers) as resp:
+                        r = AsyncResponse(resp.status, await resp.read())
+                except connect_errors as ex:
+                    attempt += 1
+                    if attempt <= self.max_retries:
+                        await asyncio.sleep(random.uniform(0, self.backoff * (2 ** (attempt - 1))))
+                        continue
+                    self.breaker.record_failure()
+                    metrics.node_call(op, "error", time.perf_counter() - start)
+                    raise NodeError(f"Cannot reach payment service: {ex}") from ex
+                except (aiohttp.ClientError, asyncio.TimeoutError) as ex:
+                    self.breaker.record_failure()
+                    metrics.node_call(op, "error", time.perf_counter() - start)
+                    raise NodeError(f"Cannot reach payment service: {ex!r}") from ex
+
+                if r.status_code >= 500:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                metrics.node_call(op, f"{r.status_code // 100}xx", time.perf_counter() - start)
+                return r
+        except BaseException:
+            # Gồm CancelledError khi client ngắt kết nối dưới ASGI: không để breaker kẹt ở half-open
+            self.breaker.release()
+            raise
+
+    async def acreate_payment(self, raw: bytes, sign_headers: Dict[str, str]) -> Dict[str, Any]:
+        r = await self.apost(self.create_url, raw, {"Content-Type": "application/json", **sign_headers}, op="create")
+        return self._checkout_data(r)
+
+
+class AsyncResponse:
+    """Body đã đọc xong của aiohttp, cùng status_code / text / json() như requests.Response."""
+
+    def __init__(self, status_code: int, content: bytes):
+        self.status_code = status_code
+        self.content = content
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", "replace")
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+
+async def _session_holder(session: Any) -> AsyncIterator[Any]:
+    # asyncio.run (uvicorn, asgiref dưới WSGI) gọi shutdown_asyncgens() trước khi đóng loop:
+    # finally ở đây đóng session trên chính loop của nó, không để lại kết nối mồ côi
+    try:
+        yield session
+    finally:
+        await session.close()
+
+
+_has_aiohttp: Optional[bool] = None
+
+
+def async_supported() -> bool:
+    """Có aiohttp để gọi Node không chặn; không có thì provider gọi client sync trong thread."""
+    global _has_aiohttp
+    if _has_aiohttp is None:
+        _has_aiohttp = importlib.util.find_spec("aiohttp") is not None
+    return _has_aiohttp
+
+
+# ===== client theo process =====
+_client: Optional[PaymentNodeClient] = None
+_client_pid: Optional[int] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> PaymentNodeClient:
+    """Client dùng chung trong process (tạo lại sau fork để không chia sẻ socket)."""
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                _client = PaymentNodeClient.from_settings()
+                _client_pid = pid
+    return _client
@@ -0,0 +1,89 @@
+# payment_gateway_api/order_status.py
+# Trạng thái đơn cho trang kết quả / polling: cache ngắn hạn theo uid, chỉ
+# đọc DB bằng values_list("status") khi cache trống. Mọi chỗ đổi trạng thái
+# gọi publish() để cập nhật cache ngay sau commit; đọc DB rồi nạp cache dùng
+# cache.add để không ghi đè trạng thái mới hơn mà publish() vừa đặt.
+import asyncio
+import time
+from typing import Dict, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from . import archive
+from .models import Order
+
+CACHE_PREFIX = "payment_gateway:order_status:"
+OWNER_PREFIX = "payment_gateway:order_owner:"
+# Chủ đơn không đổi: cache lâu
+OWNER_TTL = 86400
+
+
+def _key(uid) -> str:
+    return CACHE_PREFIX + str(uid)
+
+
+def _ttl() -> int:
+    return getattr(settings, "PAYMENT_STATUS_CACHE_TTL", 30)
+
+
+def get_status(uid) -> Optional[str]:
+    status = cache.get(_key(uid))
+    if status is None:
+        status = Order.objects.filter(uid=uid).values_list("status", flat=True).first()
+        if status is None:
+            # Đơn cũ đã được lưu trữ
+            status = archive.archived_status(uid)
+        if status is not None:
+            cache.add(_key(uid), status, _ttl())
+    return status
+
+
+def get_owner(uid) -> Optional[int]:
+    """user_id của đơn (cả đơn đã lưu trữ); khi đọc DB thì nạp luôn cache trạng thái."""
+    owner = cache.get(OWNER_PREFIX + str(uid))
+    if owner is None:
+        row = Order.objects.filter(uid=uid).values_list("user_id", "status").first()
+        if row is None:
+            row = archive.archived_owner(uid)
+        if row is None:
+            return None
+        owner, status = row
+        cache.set(OWNER_PREFIX + str(uid), owner, OWNER_TTL)
+        cache.add(_key(uid), status, _ttl())
+    return owner
+
+
+def publish(uid, status: str) -> None:
+    transaction.on_commit(lambda: cache.set(_key(uid), status, _ttl()))
+
+
+def publish_many(statuses: Dict[str, str]) -> None:
+    if statuses:
+        data = {_key(uid): st for uid, st in statuses.items()}
+        transaction.on_commit(lambda: cache.set_many(data, _ttl()))
+
+
+def wait_for_change(uid, since: str, timeout: float) -> Optional[str]:
+    """Long-poll: giữ request đến khi trạng thái khác `since` hoặc hết timeout."""
+    deadline = time.monotonic() + timeout
+    interval = getattr(settings, "PAYMENT_STATUS_POLL_INTERVAL", 0.5)
+    while True:
+        status = get_status(uid)
+        if status is None or status != since or time.monotonic() >= deadline:
+            return status
+        time.sleep(interval)
+
+
+async def await_change(uid, since: str, timeout: float) -> Optional[str]:
+    """wait_for_change cho view async: chờ bằng asyncio.sleep, không giữ thread."""
+    deadline = time.monotonic() + timeout
+    interval = getattr(settings, "PAYMENT_STATUS_POLL_INTERVAL", 0.5)
+    get = sync_to_async(get_status)
+    while True:
+        status = await get(uid)
+        if status is None or status != since or time.monotonic() >= deadline:
+            return status
+        await asyncio.sleep(interval)
@@ -0,0 +1,133 @@
+# payment_gateway_api/payments.py
+# Tạo payment bên Node cho một Order (dùng chung cho checkout đồng bộ và background).
+import hashlib
+from datetime import timedelta
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import events, metrics, order_status, providers, signing, singleflight
+from .models import Order
+
+
+def idempotency_key(user_id: int, course_id: str, mode: str, client_key: Optional[str] = None) -> Optional[str]:
+    """Khoá idempotency cho checkout.
+
+    Client gửi Idempotency-Key thì dùng nó (gắn với user); không thì suy ra từ
+    (user, course, mode). Khoá suy ra có cửa sổ trượt PAYMENT_IDEMPOTENCY_WINDOW giây:
+    xem save_idempotent.
+    """
+    if client_key:
+        basis = f"{user_id}:client:{client_key}"
+    else:
+        if getattr(settings, "PAYMENT_IDEMPOTENCY_WINDOW", 900) <= 0:
+            return None
+        basis = f"{user_id}:{course_id}:{mode}"
+    return hashlib.sha256(basis.encode()).hexdigest()
+
+
+def save_idempotent(order: Order, save: Callable[[], None], sliding: bool,
+                    **lookup: Any) -> Tuple[bool, Optional[Order]]:
+    """Gọi save() (INSERT đơn); trùng idempotency_key thì trả về đơn đang giữ khoá.
+
+    Trả về (True, None) nếu đã lưu, (False, đơn giữ khoá hoặc None nếu vừa biến mất).
+    sliding (khoá suy ra, không do client gửi): đơn giữ khoá tạo quá
+    PAYMENT_IDEMPOTENCY_WINDOW giây trước thì nhả khoá của nó và lưu lại 1 lần. Không
+    chia thời gian thành ô cố định nên double-click sát ranh giới vẫn ra cùng một đơn.
+    """
+    window = timedelta(seconds=getattr(settings, "PAYMENT_IDEMPOTENCY_WINDOW", 900))
+    for retry in (False, True):
+        try:
+            with metrics.phase("db"):
+                save()
+            return True, None
+        except IntegrityError:
+            holder = Order.objects.filter(idempotency_key=order.idempotency_key, **lookup).first()
+            if retry or not sliding or holder is None or holder.created_at >= timezone.now() - window:
+                return False, holder
+            # Điều kiện theo khoá: request song song đã nhả trước thì UPDATE 0 dòng, lần lưu sau
+            # đụng đơn mới của request đó và trả về đơn ấy
+            Order.objects.filter(pk=holder.pk, idempotency_key=order.idempotency_key).update(idempotency_key=None)
+    return False, None
+
+
+def mark_failed(order: Order, source: str = "checkout") -> None:
+    # Bỏ idempotency_key để lần checkout sau tạo được đơn mới
+    with transaction.atomic():
+        updated = Order.objects.filter(pk=order.pk, status=Order.Status.PENDING).update(
+            status=Order.Status.FAILED, idempotency_key=None, updated_at=timezone.now()
+        )
+        if updated:
+            order.status = Order.Status.FAILED
+            events.record(order, Order.Status.PENDING, source)
+    if updated:
+        order_status.publish(order.uid, order.status)
+        metrics.order_status(order.status, order.provider)
+
+
+def build_payload(order: Order, return_url: str) -> bytes:
+    payload = {
+        "order_uid": str(order.uid),
+        "amount": str(order.amount),
+        "currency": order.currency,
+        "provider": order.provider,
+        "return_url": return_url,
+        "customer": {"username": order.user.username, "email": order.user.email or ""},
+        "meta": {"course_id": order.course_id, "mode": order.mode},
+    }
+    return signing.canonical_json(payload)
+
+
+def prefill_checkout_url(order: Order, provider, return_url: str) -> None:
+    """Provider local: điền checkout_url (+ txn_id) vào Order chưa lưu, để INSERT là lần ghi duy nhất."""
+    data = provider.create_payment(order, return_url)
+    order.checkout_url = data["checkout_url"]
+    if data.get("txn_id"):
+        order.external_txn_id = data["txn_id"]
+
+
+def _joinable(order: Order) -> bool:
+    # Chỉ checkout async (PAYMENT_ASYNC_VIEWS) chờ chung qua singleflight.ajoin, và chỉ cho đơn lẻ.
+    # Không ai đọc khoá / kết quả trong cache thì không làm leader: bớt 3 lượt gọi cache mỗi checkout
+    return (bool(order.idempotency_key) and order.kind == Order.Kind.SINGLE
+            and getattr(settings, "PAYMENT_ASYNC_VIEWS", False)
+            and getattr(settings, "PAYMENT_SINGLEFLIGHT_WAIT", 5) > 0)
+
+
+def request_checkout_url(order: Order, return_url: str) -> str:
+    """Gọi provider của đơn tạo payment rồi lưu checkout_url (+ txn_id) bằng 1 UPDATE.
+
+    Raise providers.ProviderError / ProviderUnavailable nếu provider lỗi.
+    Khi có view async chờ (xem _joinable): là leader singleflight, checkout trùng chờ chung
+    kết quả qua singleflight.ajoin.
+    """
+    def call() -> str:
+        return _save_checkout_url(order, providers.get(order.provider).create_payment(order, return_url))
+
+    if not _joinable(order):
+        return call()
+    return singleflight.lead(order.idempotency_key, call)
+
+
+async def arequest_checkout_url(order: Order, return_url: str) -> str:
+    """request_checkout_url cho view async: chờ provider không chiếm thread, chỉ UPDATE qua sync_to_async."""
+    async def call() -> str:
+        data = await providers.get(order.provider).acreate_payment(order, return_url)
+        return await sync_to_async(_save_checkout_url)(order, data)
+
+    if not _joinable(order):
+        return await call()
+    return await singleflight.alead(order.idempotency_key, call)
+
+
+def _save_checkout_url(order: Order, data: Dict[str, Any]) -> str:
+    fields = {"checkout_url": data["checkout_url"], "updated_at": timezone.now()}
+    if data.get("txn_id"):
+        fields["external_txn_id"] = data["txn_id"]
+    Order.objects.filter(pk=order.pk).update(**fields)
+    for k, v in fields.items():
+        setattr(order, k, v)
+    return order.checkout_url
@@ -0,0 +1,187 @@
+# payment_gateway_api/pricing.py
+# Cache giá theo khoá học: LRU nhỏ trong process -> Django cache -> CourseCheckoutSnapshot.
+# Entry = {"meta": {...CourseOverview...}, "modes": [mode mua được], "valid_until": datetime|None}.
+# Mode free/hết hạn đã bị lọc khi dựng snapshot; entry quá valid_until coi như chưa cache.
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from . import snapshots
+
+if TYPE_CHECKING:
+    from opaque_keys.edx.keys import CourseKey
+
+log = logging.getLogger(__name__)
+
+CACHE_PREFIX = "payment_gateway:pricing:v2:"
+
+
+class _LocalLRU:
+    def __init__(self) -> None:
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        ttl = getattr(settings, "PAYMENT_PRICING_LOCAL_TTL", 30)
+        size = getattr(settings, "PAYMENT_PRICING_LOCAL_SIZE", 512)
+        if ttl <= 0 or size <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > size:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+_local = _LocalLRU()
+_stats = {"local_hits": 0, "cache_hits": 0, "misses": 0, "invalidations": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(name: str) -> None:
+    with _stats_lock:
+        _stats[name] += 1
+
+
+def stats() -> Dict[str, Any]:
+    with _stats_lock:
+        out: Dict[str, Any] = dict(_stats)
+    total = out["local_hits"] + out["cache_hits"] + out["misses"]
+    out["hit_ratio"] = round((total - out["misses"]) / total, 4) if total else None
+    return out
+
+
+# ===== entry từ snapshot =====
+def _iso(dt) -> Optional[str]:
+    return dt.isoformat() if dt else None
+
+
+def _entry(snap) -> Dict[str, Any]:
+    return {
+        "meta": {
+            "course_id": snap.course_id,
+            "course_name": snap.course_name,
+            "course_start": _iso(snap.course_start),
+            "course_end": _iso(snap.course_end),
+            "enrollment_start": _iso(snap.enrollment_start),
+            "enrollment_end": _iso(snap.enrollment_end),
+            "invite_only": snap.invite_only,
+        },
+        "modes": snap.modes,
+        "valid_until": snap.valid_until,
+    }
+
+
+def _fresh(entry: Dict[str, Any]) -> bool:
+    # Mode sớm nhất đã hết hạn -> entry cũ, phải đọc lại snapshot
+    return entry["valid_until"] is None or entry["valid_until"] > timezone.now()
+
+
+# ===== API =====
+def get_course_pricing(course_key: "CourseKey") -> Dict[str, Any]:
+    """Entry giá của khoá học (read-only: đừng sửa dict trả về)."""
+    key = str(course_key)
+    entry = _local.get(key)
+    if entry is not None and _fresh(entry):
+        _count("local_hits")
+        return entry
+    entry = cache.get(CACHE_PREFIX + key)
+    if entry is not None and _fresh(entry):
+        _count("cache_hits")
+    else:
+        _count("misses")
+        entry = _entry(snapshots.get(course_key))
+        cache.set(CACHE_PREFIX + key, entry, getattr(settings, "PAYMENT_PRICING_CACHE_TTL", 300))
+    _local.set(key, entry)
+    return entry
+
+
+def get_many_course_pricing(course_keys: Iterable["CourseKey"]) -> Dict[str, Dict[str, Any]]:
+    """Như get_course_pricing nhưng cho nhiều khoá: LRU -> cache.get_many -> 1 query snapshot cho phần thiếu."""
+    out: Dict[str, Dict[str, Any]] = {}
+    missing: Dict[str, "CourseKey"] = {}
+    for ck in course_keys:
+        key = str(ck)
+        entry = _local.get(key)
+        if entry is not None and _fresh(entry):
+            _count("local_hits")
+            out[key] = entry
+        else:
+            missing[key] = ck
+    if not missing:
+        return out
+
+    cached = cache.get_many([CACHE_PREFIX + k for k in missing])
+    for key in list(missing):
+        entry = cached.get(CACHE_PREFIX + key)
+        if entry is not None and _fresh(entry):
+            _count("cache_hits")
+            out[key] = entry
+            _local.set(key, entry)
+            del missing[key]
+    if not missing:
+        return out
+
+    with _stats_lock:
+        _stats["misses"] += len(missing)
+    loaded = {k: _entry(s) for k, s in snapshots.get_many(missing.values()).items()}
+    cache.set_many({CACHE_PREFIX + k: v for k, v in loaded.items()},
+                   getattr(settings, "PAYMENT_PRICING_CACHE_TTL", 300))
+    for key, entry in loaded.items():
+        _local.set(key, entry)
+    out.update(loaded)
+    return out
+
+
+def invalidate(course_id: Any) -> None:
+    if not course_id:
+        return
+    key = str(course_id)
+    _count("invalidations")
+    _local.delete(key)
+    cache.delete(CACHE_PREFIX + key)
+
+
+def refresh(course_id: Any) -> None:
+    """Dựng lại snapshot của khoá rồi xoá cache (CourseMode/CourseOverview vừa đổi)."""
+    if not course_id:
+        return
+    try:
+        snapshots.rebuild([course_id], prune=True)
+    except Exception:
+        # Không dựng được: bỏ snapshot cũ, request sau sẽ tự dựng lại
+        log.exception("payment-gateway: rebuilding checkout snapshot failed for %s", course_id)
+        snapshots.discard(course_id)
+    invalidate(course_id)
+
+
+def invalidate_on_commit(course_id: Any) -> None:
+    # Sau commit, tránh request khác nạp lại dữ liệu cũ trước khi commit xong
+    transaction.on_commit(lambda: refresh(course_id))
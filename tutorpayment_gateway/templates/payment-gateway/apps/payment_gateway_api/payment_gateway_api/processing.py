@@ -0,0 +1,177 @@
+# payment_gateway_api/processing.py
+# Chuyển trạng thái Order theo thông báo của provider: từng đơn (confirm) hoặc cả lô.
+import logging
+import uuid
+from typing import Any, Dict, List, Optional
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import events, metrics, order_status, tasks
+from .models import Order, OrderArchive, OrderEvent
+
+log = logging.getLogger(__name__)
+
+UNPAID_STATUSES = {"failed": Order.Status.FAILED, "canceled": Order.Status.CANCELED}
+
+
+def enroll(order: Order) -> None:
+    # Import lúc dùng: module student kéo theo nhiều thứ, chỉ cần khi có đơn PAID
+    from opaque_keys.edx.keys import CourseKey
+    from common.djangoapps.student.models import CourseEnrollment
+
+    try:
+        with metrics.phase("enroll"):
+            CourseEnrollment.enroll(order.user, CourseKey.from_string(order.course_id), order.mode)
+    except Exception:
+        log.exception("payment-gateway: enrollment failed for paid order %s", order.uid)
+        raise
+
+
+def finalize_paid(order: Order, external_txn_id: str = "", source: str = "confirm",
+                  note: Optional[Dict[str, Any]] = None) -> bool:
+    """Chuyển đơn sang PAID bằng 1 UPDATE có điều kiện, enroll sau khi commit.
+
+    Trả về True nếu chính lời gọi này chuyển trạng thái. Callback trùng (đồng thời
+    hoặc gửi lại) không qua được điều kiện WHERE nên không enroll lần hai.
+    source / note (thông báo của provider) được ghi vào OrderEvent.
+    """
+    if order.status == Order.Status.PAID:
+        return False
+    fields = {"status": Order.Status.PAID, "updated_at": timezone.now()}
+    if external_txn_id:
+        fields["external_txn_id"] = external_txn_id
+    with transaction.atomic():
+        # Cho phép PAID sau FAILED/CANCELED (tiền đã trừ thì phải ghi danh), chỉ chặn PAID -> PAID
+        updated = Order.objects.filter(pk=order.pk).exclude(status=Order.Status.PAID).update(**fields)
+        if not updated:
+            return False
+        previous = order.status
+        for k, v in fields.items():
+            setattr(order, k, v)
+        events.record(order, previous, source, note)
+        order_status.publish(order.uid, order.status)
+        if order.kind == Order.Kind.BULK:
+            # Đơn nhóm: ghi danh các dòng theo lô trên worker
+            tasks.enqueue_bulk_enrollment(order.pk)
+        else:
+            transaction.on_commit(lambda: enroll(order))
+    metrics.order_status(order.status, order.provider)
+    return True
+
+
+def finalize_unpaid(order: Order, status: str, source: str = "confirm",
+                    note: Optional[Dict[str, Any]] = None) -> bool:
+    # Chỉ PENDING -> FAILED/CANCELED; không bao giờ hạ một đơn đã PAID
+    with transaction.atomic():
+        updated = Order.objects.filter(pk=order.pk, status=Order.Status.PENDING).update(
+            status=status, idempotency_key=None, updated_at=timezone.now()
+        )
+        if updated:
+            order.status = status
+            events.record(order, Order.Status.PENDING, source, note)
+    if updated:
+        order_status.publish(order.uid, status)
+        metrics.order_status(status, order.provider)
+    return bool(updated)
+
+
+def amount_matches(order: Order, note: Dict[str, Any]) -> bool:
+    return str(order.amount) == str(note.get("amount")) and order.currency == note.get("currency")
+
+
+def apply_notifications(notes: List[Dict[str, Any]], source: str = "confirm_batch") -> List[Dict[str, Any]]:
+    """Áp dụng cả lô thông báo trong vài round trip.
+
+    1 SELECT ... FOR UPDATE (uid__in) + 1 bulk UPDATE + 1 bulk INSERT OrderEvent; việc
+    enroll gom lại thành 1 job nền sau commit. Trả về kết quả theo đúng thứ tự từng phần tử.
+    """
+    results: List[Dict[str, Any]] = []
+    parsed: List[Any] = []
+    for note in notes:
+        try:
+            uid = uuid.UUID(str(note["order_uid"]))
+        except (KeyError, TypeError, ValueError):
+            uid = None
+        parsed.append(uid)
+
+    uids = {u for u in parsed if u is not None}
+    changed: Dict[int, Order] = {}
+    paid_ids: List[int] = []
+    bulk_ids: List[int] = []
+    log_rows: List[OrderEvent] = []
+    now = timezone.now()
+    with transaction.atomic():
+        orders = {o.uid: o for o in Order.objects.select_for_update().filter(uid__in=uids)} if uids else {}
+        missing = uids - set(orders)
+        archived = set(OrderArchive.objects.filter(uid__in=missing).values_list("uid", flat=True)) if missing else set()
+        for note, uid in zip(notes, parsed):
+            res: Dict[str, Any] = {"order_uid": str(uid) if uid else note.get("order_uid"), "ok": False}
+            results.append(res)
+            order = orders.get(uid) if uid else None
+            if order is None and uid in archived:
+                # Đơn đã kết thúc và được lưu trữ: thông báo gửi lại, bỏ qua
+                res.update(ok=True, result="archived")
+                continue
+            if order is None:
+                res["error"] = "Invalid order_uid" if uid is None else "Order not found"
+                continue
+            if not amount_matches(order, note):
+                res["error"] = "Amount/currency mismatch"
+                continue
+
+            status = note.get("status")
+            previous = order.status
+            if status == "success":
+                res["ok"] = True
+                if order.status == Order.Status.PAID:
+                    res["result"] = "duplicate"
+                    continue
+                order.status = Order.Status.PAID
+                if note.get("txn_id"):
+                    order.external_txn_id = note["txn_id"]
+                (bulk_ids if order.kind == Order.Kind.BULK else paid_ids).append(order.pk)
+            elif status in UNPAID_STATUSES:
+                res["ok"] = True
+                if order.status != Order.Status.PENDING:
+                    res["result"] = "unchanged"
+                    continue
+                order.status = UNPAID_STATUSES[status]
+                order.idempotency_key = None
+            else:
+                res["error"] = "Unknown status"
+                continue
+            order.updated_at = now
+            changed[order.pk] = order
+            log_rows.append(events.event(order, previous, source, note))
+            res["result"] = order.status.lower()
+
+        if changed:
+            Order.objects.bulk_update(
+                list(changed.values()), ["status", "external_txn_id", "idempotency_key", "updated_at"]
+            )
+            events.write(log_rows)
+            order_status.publish_many({str(o.uid): o.status for o in changed.values()})
+        if paid_ids:
+            tasks.enqueue_enrollments(paid_ids)
+        for pk in bulk_ids:
+            tasks.enqueue_bulk_enrollment(pk)
+    for o in changed.values():
+        metrics.order_status(o.status, o.provider)
+    return results
+
+
+def apply_each(notes: List[Dict[str, Any]], source: str) -> List[Dict[str, Any]]:
+    """Dự phòng khi apply_notifications lỗi cả lô: áp dụng từng thông báo một.
+
+    Mỗi lời gọi chạy trong savepoint riêng nên thông báo lỗi chỉ rollback phần của nó
+    và nhận {"ok": False, "error": ...}; các thông báo khác vẫn được áp dụng.
+    """
+    results: List[Dict[str, Any]] = []
+    for note in notes:
+        try:
+            results.extend(apply_notifications([note], source=source))
+        except Exception as ex:
+            log.exception("payment-gateway: notification for order %s failed", note.get("order_uid"))
+            results.append({"order_uid": note.get("order_uid"), "ok": False, "error": f"{type(ex).__name__}: {ex}"})
+    return results
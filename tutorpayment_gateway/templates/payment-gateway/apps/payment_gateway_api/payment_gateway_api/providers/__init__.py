@@ -0,0 +1,81 @@
+# payment_gateway_api/providers/__init__.py
+# Registry provider theo settings:
+#   PAYMENT_PROVIDERS = {"vnpay": {"backend": "node"}, "vnpay_direct": {"backend": "vnpay", ...}}
+#   PAYMENT_PROVIDER_ROUTES = [{"currency": "USD", "provider": "paypal"},
+#                              {"course": "course-v1:Org+*", "provider": "vnpay_direct"}]
+#   PAYMENT_DEFAULT_PROVIDER = "vnpay"
+# Backend được import khi registry khởi tạo lần đầu trong process.
+import fnmatch
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .base import CallbackRejected, PaymentProvider, ProviderError, ProviderUnavailable
+
+__all__ = [
+    "CallbackRejected", "PaymentProvider", "ProviderError", "ProviderUnavailable",
+    "get", "for_order", "all_providers",
+]
+
+BACKENDS = {
+    "node": "payment_gateway_api.providers.node.NodeProvider",
+    "vnpay": "payment_gateway_api.providers.vnpay.VNPayProvider",
+    "fake": "payment_gateway_api.providers.fake.FakeProvider",
+}
+
+_registry: Optional[Dict[str, PaymentProvider]] = None
+_registry_pid: Optional[int] = None
+_lock = threading.Lock()
+
+
+def _build() -> Dict[str, PaymentProvider]:
+    conf = getattr(settings, "PAYMENT_PROVIDERS", None) or {"vnpay": {"backend": "node"}}
+    out: Dict[str, PaymentProvider] = {}
+    for name, options in conf.items():
+        options = dict(options or {})
+        backend = options.pop("backend", "node")
+        cls = import_string(BACKENDS.get(backend, backend))
+        out[name] = cls(name, **options)
+    return out
+
+
+def _providers() -> Dict[str, PaymentProvider]:
+    # Tạo lại sau fork để mỗi worker có pool kết nối riêng
+    global _registry, _registry_pid
+    pid = os.getpid()
+    if _registry is None or _registry_pid != pid:
+        with _lock:
+            if _registry is None or _registry_pid != pid:
+                _registry = _build()
+                _registry_pid = pid
+    return _registry
+
+
+def all_providers() -> List[PaymentProvider]:
+    return list(_providers().values())
+
+
+def get(name: str) -> PaymentProvider:
+    try:
+        return _providers()[name]
+    except KeyError:
+        raise ProviderError(f"Unknown payment provider: {name!r}") from None
+
+
+def _matches(rule: Dict[str, Any], course_id: str, currency: str) -> bool:
+    if rule.get("currency") and rule["currency"].upper() != (currency or "").upper():
+        return False
+    if rule.get("course") and not fnmatch.fnmatchcase(course_id, rule["course"]):
+        return False
+    return True
+
+
+def for_order(course_id: str, currency: str) -> PaymentProvider:
+    """Rule đầu tiên khớp (course glob và/hoặc currency) thắng; không khớp thì dùng provider mặc định."""
+    for rule in getattr(settings, "PAYMENT_PROVIDER_ROUTES", None) or []:
+        if _matches(rule, course_id, currency):
+            return get(rule["provider"])
+    return get(getattr(settings, "PAYMENT_DEFAULT_PROVIDER", "vnpay"))
@@ -0,0 +1,90 @@
+# payment_gateway_api/providers/base.py
+# Giao diện chung của một cổng thanh toán: tạo payment, xác thực callback, hỏi trạng thái.
+import json
+from typing import Any, Dict, List, Optional
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, JsonResponse
+
+from ..signing import Keyring, SignatureError
+
+
+class ProviderError(Exception):
+    """Provider lỗi hoặc trả dữ liệu không hợp lệ."""
+
+
+class ProviderUnavailable(ProviderError):
+    """Provider tạm thời không dùng được (circuit breaker mở...): trả 503 ngay."""
+
+    def __init__(self, retry_after: int, message: str = "payment service unavailable"):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CallbackRejected(ProviderError):
+    """Callback sai chữ ký / thiếu dữ liệu."""
+
+
+class PaymentProvider:
+    """Backend của một provider. Mỗi instance giữ connection pool + timeout riêng.
+
+    `name` là giá trị lưu ở Order.provider; options lấy từ PAYMENT_PROVIDERS[name].
+    """
+
+    # True: create_payment chỉ tính toán trong process (không gọi mạng), nên checkout
+    # điền sẵn checkout_url vào Order trước INSERT, không cần UPDATE sau đó.
+    local = False
+
+    def __init__(self, name: str, **options: Any):
+        self.name = name
+        self.options = options
+
+    def unavailable_for(self) -> int:
+        """Số giây nên chờ nếu provider đang tạm ngưng, 0 nếu dùng được."""
+        return 0
+
+    def create_payment(self, order, return_url: str) -> Dict[str, Any]:
+        """Trả về {"checkout_url": ..., "txn_id": ... (tuỳ chọn)}."""
+        raise NotImplementedError
+
+    async def acreate_payment(self, order, return_url: str) -> Dict[str, Any]:
+        """Bản async cho view async; mặc định chạy create_payment trong thread."""
+        return await sync_to_async(self.create_payment, thread_sensitive=False)(order, return_url)
+
+    def verify_callback(self, request) -> List[Dict[str, Any]]:
+        """Kiểm tra chữ ký callback, trả về danh sách thông báo dạng confirm
+        ({order_uid, status, amount, currency, txn_id, provider}).
+
+        Raise CallbackRejected nếu không hợp lệ.
+        """
+        raise NotImplementedError
+
+    def callback_response(self, results: List[Dict[str, Any]], error: Optional[str] = None) -> HttpResponse:
+        # Provider có định dạng phản hồi riêng (VNPay: RspCode) thì ghi đè
+        if error:
+            return JsonResponse({"ok": False, "error": error}, status=403)
+        return JsonResponse({"ok": all(r["ok"] for r in results), "results": results})
+
+    def query_status(self, uid: str, created_at=None, url: Optional[str] = None) -> Dict[str, Any]:
+        """{"status": success|failed|canceled|pending|not_found, "txn_id", "amount", "currency"}."""
+        raise NotImplementedError
+
+
+def signed_json_notes(request, keyring: Keyring, provider: str) -> List[Dict[str, Any]]:
+    """Callback kiểu Node: body JSON (1 thông báo, mảng, hoặc {"notifications": [...]})
+    ký HMAC theo signing.Keyring (X-Signature, X-Key-Id, X-Timestamp/X-Nonce)."""
+    try:
+        keyring.verify_request(request)
+    except SignatureError as ex:
+        raise CallbackRejected(str(ex)) from ex
+    raw = request.body
+    try:
+        data = json.loads(raw.decode())
+    except ValueError as ex:
+        raise CallbackRejected(f"Invalid JSON: {ex}") from ex
+    notes = data.get("notifications", [data]) if isinstance(data, dict) else data
+    if not isinstance(notes, list) or not all(isinstance(n, dict) for n in notes):
+        raise CallbackRejected("Expected a notification or a list of notifications")
+    for n in notes:
+        n.setdefault("provider", provider)
+    return notes
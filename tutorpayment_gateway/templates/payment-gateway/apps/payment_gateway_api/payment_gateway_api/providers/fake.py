@@ -0,0 +1,36 @@
+# payment_gateway_api/providers/fake.py
+# Provider giả chạy trong process cho load test: không gọi mạng.
+# Options: latency (giây, giả lập thời gian gọi provider), status (kết quả query_status),
+# checkout_base (mặc định chuyển thẳng về return_url), shared_secret.
+# KHÔNG cấu hình provider này trên môi trường thật.
+import time
+from typing import Any, Dict, List, Optional
+
+from .. import signing
+from .base import PaymentProvider, signed_json_notes
+
+
+class FakeProvider(PaymentProvider):
+    def __init__(self, name: str, **options: Any):
+        super().__init__(name, **options)
+        self.latency = float(options.get("latency", 0))
+        self.local = not self.latency
+        self.status = options.get("status", "success")
+        self.checkout_base = options.get("checkout_base", "")
+        secret = options.get("shared_secret")
+        self.keyring = signing.Keyring.from_secret(secret) if secret else None
+
+    def create_payment(self, order, return_url: str) -> Dict[str, Any]:
+        if self.latency:
+            time.sleep(self.latency)
+        txn_id = f"FAKE-{order.uid.hex}"
+        base = f"{self.checkout_base.rstrip('/')}/{order.uid}" if self.checkout_base else return_url
+        return {"checkout_url": f"{base}?fake_txn={txn_id}", "txn_id": txn_id}
+
+    def verify_callback(self, request) -> List[Dict[str, Any]]:
+        return signed_json_notes(request, self.keyring or signing.keyring(), self.name)
+
+    def query_status(self, uid: str, created_at=None, url: Optional[str] = None) -> Dict[str, Any]:
+        if self.latency:
+            time.sleep(self.latency)
+        return {"status": self.status, "txn_id": f"FAKE-{uid.replace('-', '')}"}
@@ -0,0 +1,38 @@
+# payment_gateway_api/providers/node.py
+# Đi qua Node payment service (luồng cũ). Options ghi đè PAYMENT_NODE_*:
+# create_url, status_url, connect_timeout, read_timeout, pool_size, max_retries, ...
+from typing import Any, Dict, List, Optional
+
+from .. import node_client, payments, signing
+from .base import PaymentProvider, signed_json_notes
+
+
+class NodeProvider(PaymentProvider):
+    def __init__(self, name: str, **options: Any):
+        super().__init__(name, **options)
+        secret = options.pop("shared_secret", None)
+        self.keyring = signing.Keyring.from_secret(secret) if secret else None
+        self.client = node_client.PaymentNodeClient.from_settings(**options)
+
+    def _keyring(self) -> signing.Keyring:
+        return self.keyring or signing.keyring()
+
+    def unavailable_for(self) -> int:
+        return self.client.breaker.retry_after() if self.client.breaker.is_open() else 0
+
+    def create_payment(self, order, return_url: str) -> Dict[str, Any]:
+        raw = payments.build_payload(order, return_url)
+        return self.client.create_payment(raw, self._keyring().headers(raw))
+
+    async def acreate_payment(self, order, return_url: str) -> Dict[str, Any]:
+        if not node_client.async_supported():
+            return await super().acreate_payment(order, return_url)
+        raw = payments.build_payload(order, return_url)
+        return await self.client.acreate_payment(raw, self._keyring().headers(raw))
+
+    def verify_callback(self, request) -> List[Dict[str, Any]]:
+        return signed_json_notes(request, self._keyring(), self.name)
+
+    def query_status(self, uid: str, created_at=None, url: Optional[str] = None) -> Dict[str, Any]:
+        raw = signing.canonical_json({"order_uid": uid})
+        return self.client.query_status(raw, self._keyring().headers(raw), url=url)
@@ -0,0 +1,156 @@
+# payment_gateway_api/providers/vnpay.py
+# Tích hợp VNPay trực tiếp (API 2.1.0), không qua Node:
+#   - tạo payment = ký URL vpcpay ngay trong process (không có round trip mạng)
+#   - IPN: VNPay gọi GET internal/callback/<name>/?vnp_...  -> verify_callback
+#   - đối soát: querydr qua merchant_webapi, session/pool riêng của provider
+# Options: tmn_code, hash_secret, pay_url, api_url, ip_addr, locale,
+#          connect_timeout, read_timeout, pool_size.
+import hashlib
+import hmac
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote_plus
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from .base import CallbackRejected, PaymentProvider, ProviderError
+
+VN_TZ = dt_timezone(timedelta(hours=7))
+VERSION = "2.1.0"
+SANDBOX_PAY_URL = "https://sandbox.vnpayment.vn/paymentv2/vpcpay.html"
+SANDBOX_API_URL = "https://sandbox.vnpayment.vn/merchant_webapi/api/transaction"
+
+# vnp_TransactionStatus -> trạng thái thông báo nội bộ
+_TXN_STATUS = {"00": "success", "01": "pending", "02": "failed"}
+
+
+def _vn_time(dt: Optional[datetime] = None) -> str:
+    return (dt or timezone.now()).astimezone(VN_TZ).strftime("%Y%m%d%H%M%S")
+
+
+class VNPayProvider(PaymentProvider):
+    local = True
+
+    def __init__(self, name: str, **options: Any):
+        super().__init__(name, **options)
+        self.tmn_code = options["tmn_code"]
+        self.hash_secret = options["hash_secret"].encode()
+        self.pay_url = options.get("pay_url", SANDBOX_PAY_URL)
+        self.api_url = options.get("api_url", SANDBOX_API_URL)
+        self.ip_addr = options.get("ip_addr", "127.0.0.1")
+        self.locale = options.get("locale", "vn")
+        self.timeout = (float(options.get("connect_timeout", 3.0)), float(options.get("read_timeout", 10.0)))
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, int(options.get("pool_size", 4))), max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _hmac(self, data: str) -> str:
+        return hmac.new(self.hash_secret, data.encode(), hashlib.sha512).hexdigest()
+
+    @staticmethod
+    def _query(params: Dict[str, str]) -> str:
+        return "&".join(f"{k}={quote_plus(str(v))}" for k, v in sorted(params.items()))
+
+    def create_payment(self, order, return_url: str) -> Dict[str, Any]:
+        if order.currency != "VND":
+            raise ProviderError(f"VNPay only supports VND, got {order.currency}")
+        params = {
+            "vnp_Version": VERSION,
+            "vnp_Command": "pay",
+            "vnp_TmnCode": self.tmn_code,
+            "vnp_Amount": str(int(order.amount * 100)),
+            "vnp_CurrCode": "VND",
+            "vnp_TxnRef": order.uid.hex,
+            "vnp_OrderInfo": f"Thanh toan khoa hoc {order.course_id}",
+            "vnp_OrderType": "other",
+            "vnp_Locale": self.locale,
+            "vnp_ReturnUrl": return_url,
+            "vnp_IpAddr": self.ip_addr,
+            "vnp_CreateDate": _vn_time(),
+        }
+        query = self._query(params)
+        return {"checkout_url": f"{self.pay_url}?{query}&vnp_SecureHash={self._hmac(query)}"}
+
+    def verify_callback(self, request) -> List[Dict[str, Any]]:
+        params = {k: v for k, v in request.GET.items() if k.startswith("vnp_")}
+        sig = params.pop("vnp_SecureHash", "")
+        params.pop("vnp_SecureHashType", None)
+        if not sig or not hmac.compare_digest(sig.lower(), self._hmac(self._query(params))):
+            raise CallbackRejected("Invalid Checksum")
+        try:
+            uid = uuid.UUID(hex=params["vnp_TxnRef"])
+            amount = Decimal(params["vnp_Amount"]) / 100
+        except (KeyError, ValueError, ArithmeticError) as ex:
+            raise CallbackRejected(f"Invalid params: {ex}") from ex
+        ok = params.get("vnp_ResponseCode") == "00" and params.get("vnp_TransactionStatus") == "00"
+        # 24 = khách huỷ giao dịch
+        status = "success" if ok else ("canceled" if params.get("vnp_ResponseCode") == "24" else "failed")
+        return [{
+            "order_uid": str(uid),
+            "status": status,
+            "amount": f"{amount:.2f}",
+            "currency": "VND",
+            "txn_id": params.get("vnp_TransactionNo", "") if ok else "",
+            "provider": self.name,
+        }]
+
+    def callback_response(self, results: List[Dict[str, Any]], error: Optional[str] = None) -> HttpResponse:
+        # VNPay chỉ đọc RspCode trong body (luôn HTTP 200)
+        if error:
+            return JsonResponse({"RspCode": "97", "Message": "Invalid Checksum"})
+        res = results[0] if results else {"ok": False, "error": "empty"}
+        if res["ok"]:
+            if res.get("result") in ("duplicate", "unchanged", "archived"):
+                return JsonResponse({"RspCode": "02", "Message": "Order already confirmed"})
+            return JsonResponse({"RspCode": "00", "Message": "Confirm Success"})
+        if res.get("error") in ("Order not found", "Invalid order_uid"):
+            return JsonResponse({"RspCode": "01", "Message": "Order not found"})
+        if res.get("error") == "Amount/currency mismatch":
+            return JsonResponse({"RspCode": "04", "Message": "Invalid amount"})
+        return JsonResponse({"RspCode": "99", "Message": "Unknown error"})
+
+    def query_status(self, uid: str, created_at=None, url: Optional[str] = None) -> Dict[str, Any]:
+        req = {
+            "vnp_RequestId": uuid.uuid4().hex,
+            "vnp_Version": VERSION,
+            "vnp_Command": "querydr",
+            "vnp_TmnCode": self.tmn_code,
+            "vnp_TxnRef": uuid.UUID(uid).hex,
+            "vnp_OrderInfo": f"Truy van giao dich {uid}",
+            "vnp_TransactionDate": _vn_time(created_at),
+            "vnp_CreateDate": _vn_time(),
+            "vnp_IpAddr": self.ip_addr,
+        }
+        req["vnp_SecureHash"] = self._hmac("|".join(req[k] for k in (
+            "vnp_RequestId", "vnp_Version", "vnp_Command", "vnp_TmnCode", "vnp_TxnRef",
+            "vnp_TransactionDate", "vnp_CreateDate", "vnp_IpAddr", "vnp_OrderInfo",
+        )))
+        try:
+            r = self.session.post(url or self.api_url, json=req, timeout=self.timeout)
+            data = r.json()
+        except (requests.RequestException, ValueError) as ex:
+            raise ProviderError(f"VNPay querydr failed: {ex}") from ex
+        code = data.get("vnp_ResponseCode")
+        if code == "91":
+            return {"status": "not_found"}
+        if code != "00":
+            raise ProviderError(f"VNPay querydr failed: {code} {data.get('vnp_Message', '')}")
+        expected = self._hmac("|".join(str(data.get(k, "")) for k in (
+            "vnp_ResponseId", "vnp_Command", "vnp_ResponseCode", "vnp_Message", "vnp_TmnCode", "vnp_TxnRef",
+            "vnp_Amount", "vnp_BankCode", "vnp_PayDate", "vnp_TransactionNo", "vnp_TransactionType",
+            "vnp_TransactionStatus", "vnp_OrderInfo", "vnp_PromotionCode", "vnp_PromotionAmount",
+        )))
+        if not hmac.compare_digest(str(data.get("vnp_SecureHash", "")).lower(), expected):
+            raise ProviderError("VNPay querydr failed: invalid response checksum")
+        return {
+            "status": _TXN_STATUS.get(data.get("vnp_TransactionStatus"), "pending"),
+            "txn_id": data.get("vnp_TransactionNo", ""),
+            "amount": f"{Decimal(data.get('vnp_Amount', 0)) / 100:.2f}",
+            "currency": "VND",
+        }
@@ -0,0 +1,105 @@
+# payment_gateway_api/querybudget.py
+# Số query DB tối đa ("budget") mà mỗi view được phép chạy trong phần thân view
+# (không tính middleware, session, auth). Khai báo bằng @querybudget.budget(n) đặt
+# sát hàm view nhất; benchmarks/run.py --enforce-budgets kiểm tra budget này.
+#
+# PAYMENT_QUERY_BUDGET_CHECK=True (mặc định theo DEBUG) thì đếm query thật mỗi
+# request, log warning + tăng metric khi vượt. Tắt thì decorator chỉ gắn số budget,
+# không tốn gì lúc chạy.
+import asyncio
+import functools
+import logging
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from . import metrics
+
+log = logging.getLogger(__name__)
+
+# tên view -> budget, để công cụ đo đọc lại
+BUDGETS: Dict[str, int] = {}
+# Lệnh điều khiển transaction không tính vào budget (MySQL không gửi BEGIN qua cursor, SQLite có)
+_TX_PREFIXES = ("BEGIN", "SAVEPOINT", "RELEASE", "ROLLBACK", "COMMIT")
+
+
+def enabled() -> bool:
+    flag = getattr(settings, "PAYMENT_QUERY_BUDGET_CHECK", None)
+    return settings.DEBUG if flag is None else bool(flag)
+
+
+# Bộ đếm của request đang chạy. Không để trong closure gắn vào connection: view async chạy
+# ORM trên thread chung của sync_to_async, các request đồng thời dùng chung 1 connection.
+_count: ContextVar[Optional[List[int]]] = ContextVar("payment_query_count", default=None)
+
+
+def _counter(execute, sql, params, many, context):
+    count = _count.get()
+    if count is not None and not sql.lstrip().upper().startswith(_TX_PREFIXES):
+        count[0] += 1
+    return execute(sql, params, many, context)
+
+
+def _install() -> None:
+    # Gắn 1 lần cho mỗi connection của thread hiện tại và giữ luôn; ngoài view có budget thì không đếm
+    for conn in connections.all():
+        if _counter not in conn.execute_wrappers:
+            conn.execute_wrappers.append(_counter)
+
+
+def _record(request, name: str, n: int, count: int) -> None:
+    request.payment_query_count = count
+    request.payment_query_budget = n
+    if count > n:
+        log.warning("payment-gateway: %s ran %d queries (budget %d) for %s", name, count, n, request.path)
+        metrics.query_budget_exceeded(name)
+
+
+def budget(n: int) -> Callable:
+    """Decorator: view được phép chạy tối đa n query.
+
+    Khi bật kiểm tra, request có thêm payment_query_count / payment_query_budget.
+    View async: sync_to_async mang theo context của request nên mỗi request đếm riêng.
+    """
+    def deco(view):
+        name = view.__name__
+        BUDGETS[name] = n
+
+        if asyncio.iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def awrapper(request, *args, **kwargs):
+                if not enabled():
+                    return await view(request, *args, **kwargs)
+                count = [0]
+                token = _count.set(count)
+                try:
+                    await sync_to_async(_install)()
+                    resp = await view(request, *args, **kwargs)
+                finally:
+                    _count.reset(token)
+                _record(request, name, n, count[0])
+                return resp
+
+            awrapper.query_budget = n
+            return awrapper
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not enabled():
+                return view(request, *args, **kwargs)
+            count = [0]
+            token = _count.set(count)
+            try:
+                _install()
+                resp = view(request, *args, **kwargs)
+            finally:
+                _count.reset(token)
+            _record(request, name, n, count[0])
+            return resp
+
+        wrapper.query_budget = n
+        return wrapper
+    return deco
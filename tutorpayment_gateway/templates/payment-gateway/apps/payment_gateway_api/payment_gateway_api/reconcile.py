@@ -0,0 +1,127 @@
+# payment_gateway_api/reconcile.py
+# Đối soát đơn PENDING quá hạn (callback confirm bị mất): đọc theo chunk bằng
+# keyset (id > id cuối), hỏi provider của từng đơn song song (thread pool có giới hạn + rate limit),
+# rồi áp kết quả theo lô (mỗi chunk 1 transaction qua processing.apply_notifications).
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from django.db import close_old_connections
+from django.utils import timezone
+
+from . import processing, providers, reports
+from .models import Order
+
+log = logging.getLogger(__name__)
+
+FINAL_STATUSES = {"success", "failed"} | set(processing.UNPAID_STATUSES)
+
+
+class RateLimiter:
+    """Giãn đều request: tối đa `rate` request/giây cho mọi thread (0 = không giới hạn)."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            at = max(now, self._next)
+            self._next = at + self.interval
+        if at > now:
+            time.sleep(at - now)
+
+
+def _chunks(qs, chunk_size: int, limit: Optional[int]) -> Iterator[List[Tuple[Any, ...]]]:
+    return reports.keyset_chunks(qs, ("uid", "amount", "currency", "created_at", "provider"), chunk_size, limit)
+
+
+def _query(limiter: RateLimiter, row: Tuple[Any, ...], url: Optional[str]) -> Dict[str, Any]:
+    uid, _, _, created_at, provider = row
+    limiter.wait()
+    try:
+        return providers.get(provider).query_status(str(uid), created_at, url=url)
+    except providers.ProviderUnavailable:
+        return {"status": "error", "error": "circuit open"}
+    except providers.ProviderError as ex:
+        return {"status": "error", "error": str(ex)}
+
+
+def _bucket(result: str, uid: str, expired: Set[str]) -> str:
+    return "expired" if result == "canceled" and uid in expired else result
+
+
+def reconcile(older_than: timedelta, chunk_size: int = 200, workers: int = 8, rate: float = 20.0,
+              dry_run: bool = False, limit: Optional[int] = None, expire_after: Optional[timedelta] = None,
+              node_url: Optional[str] = None,
+              progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """Đối soát đơn PENDING tạo trước `older_than`. Trả về bảng tổng kết."""
+    now = timezone.now()
+    qs = Order.objects.filter(status=Order.Status.PENDING, created_at__lt=now - older_than)
+    limiter = RateLimiter(rate)
+    summary: Dict[str, Any] = {"scanned": 0, "paid": 0, "failed": 0, "canceled": 0, "expired": 0,
+                               "pending": 0, "errors": 0, "dry_run": dry_run}
+    started = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="payment-reconcile") as pool:
+        for chunk in _chunks(qs, chunk_size, limit):
+            answers = list(pool.map(lambda row: _query(limiter, row, node_url), chunk))
+            notes: List[Dict[str, Any]] = []
+            # Đơn bị huỷ vì quá hạn: đếm vào "expired", không đếm thêm vào "canceled"
+            expired: Set[str] = set()
+            for (uid, amount, currency, created_at, _), ans in zip(chunk, answers):
+                summary["scanned"] += 1
+                status = ans.get("status")
+                if status == "error":
+                    summary["errors"] += 1
+                    continue
+                if status not in FINAL_STATUSES:
+                    if expire_after is not None and created_at < now - expire_after:
+                        # Node không biết / vẫn pending quá lâu: huỷ để giải phóng đơn
+                        status = "canceled"
+                        expired.add(str(uid))
+                    else:
+                        summary["pending"] += 1
+                        continue
+                if status == "success" and (ans.get("amount") in (None, "") or not ans.get("currency")):
+                    # Không có số tiền để đối chiếu thì không ghi PAID; đơn vẫn PENDING
+                    log.warning("payment-gateway: reconcile got success without amount/currency for %s", uid)
+                    summary["errors"] += 1
+                    continue
+                notes.append({
+                    "order_uid": str(uid),
+                    "status": status,
+                    "txn_id": ans.get("txn_id") or "",
+                    # Đơn thất bại / huỷ: provider có thể không trả số tiền, đối chiếu với chính đơn
+                    "amount": ans.get("amount") or str(amount),
+                    "currency": ans.get("currency") or currency,
+                })
+
+            if notes and not dry_run:
+                for res in processing.apply_notifications(notes, source="reconcile"):
+                    if not res["ok"]:
+                        summary["errors"] += 1
+                    elif res.get("result") in ("paid", "failed", "canceled"):
+                        summary[_bucket(res["result"], res["order_uid"], expired)] += 1
+            elif dry_run:
+                for note in notes:
+                    key = "paid" if note["status"] == "success" else note["status"]
+                    summary[_bucket(key, note["order_uid"], expired)] += 1
+            summary["elapsed"] = round(time.monotonic() - started, 2)
+            if progress:
+                progress(dict(summary))
+            seen = {row[4] for row in chunk}
+            down = [p.name for p in providers.all_providers() if p.name in seen and p.unavailable_for()]
+            if down:
+                summary["aborted"] = f"provider circuit open: {', '.join(down)}"
+                break
+    close_old_connections()
+    summary["elapsed"] = round(time.monotonic() - started, 2)
+    return summary
@@ -0,0 +1,140 @@
+# payment_gateway_api/reports.py
+# Báo cáo cho kế toán: xuất đơn dạng stream (bộ nhớ không đổi theo số dòng) và
+# tổng hợp doanh thu bằng GROUP BY trong DB.
+import csv
+import json
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from django.db.models import Count, QuerySet, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Order
+
+EXPORT_FIELDS = (
+    "uid", "user__username", "user__email", "course_id", "mode", "amount", "currency",
+    "status", "provider", "external_txn_id", "created_at", "updated_at",
+)
+EXPORT_HEADER = (
+    "order_uid", "username", "email", "course_id", "mode", "amount", "currency",
+    "status", "provider", "external_txn_id", "created_at", "updated_at",
+)
+GROUP_FIELDS = {"course": "course_id", "mode": "mode", "currency": "currency", "day": "day", "provider": "provider"}
+
+
+def _parse_day(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    d = date.fromisoformat(value)
+    return timezone.make_aware(datetime.combine(d, time.min))
+
+
+def filter_orders(params, default_status: Optional[str] = None, model=Order) -> QuerySet:
+    """Lọc theo ?from=YYYY-MM-DD&to=YYYY-MM-DD (bao gồm cả ngày `to`), status, course_id, provider.
+
+    `model` là Order hoặc OrderArchive. Raise ValueError nếu tham số sai.
+    """
+    qs = model.objects.all()
+    start, end = _parse_day(params.get("from")), _parse_day(params.get("to"))
+    if start:
+        qs = qs.filter(created_at__gte=start)
+    if end:
+        qs = qs.filter(created_at__lt=end + timedelta(days=1))
+    statuses = [s.strip().upper() for s in (params.get("status") or default_status or "").split(",") if s.strip()]
+    if statuses:
+        bad = set(statuses) - set(Order.Status.values)
+        if bad:
+            raise ValueError(f"Unknown status: {', '.join(sorted(bad))}")
+        qs = qs.filter(status__in=statuses)
+    if params.get("course_id"):
+        qs = qs.filter(course_id=params["course_id"])
+    if params.get("provider"):
+        qs = qs.filter(provider=params["provider"])
+    return qs
+
+
+def _cell(v: Any) -> Any:
+    if isinstance(v, datetime):
+        return v.isoformat()
+    if v is None:
+        return ""
+    return str(v)
+
+
+def keyset_chunks(qs: QuerySet, fields: Sequence[str], chunk_size: int,
+                  limit: Optional[int] = None) -> Iterator[List[Tuple[Any, ...]]]:
+    """Đọc qs theo lô bằng keyset: WHERE id > <id cuối lô trước> ORDER BY id LIMIT chunk_size.
+
+    iterator() chỉ stream bằng server-side cursor trên PostgreSQL/Oracle; MySQL (Tutor)
+    tải cả kết quả vào bộ nhớ. Mỗi lô ở đây là 1 query ngắn trên khoá chính.
+    Trả về các tuple giá trị của `fields`, tối đa `limit` dòng.
+    """
+    qs = qs.order_by("id").values_list("id", *fields)
+    last_id = None
+    seen = 0
+    while limit is None or seen < limit:
+        n = chunk_size if limit is None else min(chunk_size, limit - seen)
+        rows = list((qs if last_id is None else qs.filter(id__gt=last_id))[:n])
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        seen += len(rows)
+        yield [row[1:] for row in rows]
+        if len(rows) < n:
+            return
+
+
+def _rows(qs: QuerySet, chunk_size: int) -> Iterator[Sequence[Any]]:
+    for chunk in keyset_chunks(qs, EXPORT_FIELDS, chunk_size):
+        yield from chunk
+
+
+class _Echo:
+    def write(self, value: str) -> str:
+        return value
+
+
+def stream_csv(querysets: Sequence[QuerySet], chunk_size: int = 2000) -> Iterator[str]:
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_HEADER)
+    for qs in querysets:
+        for row in _rows(qs, chunk_size):
+            yield writer.writerow([_cell(v) for v in row])
+
+
+def stream_ndjson(querysets: Sequence[QuerySet], chunk_size: int = 2000) -> Iterator[str]:
+    for qs in querysets:
+        for row in _rows(qs, chunk_size):
+            yield json.dumps(dict(zip(EXPORT_HEADER, (_cell(v) for v in row))), ensure_ascii=False) + "\n"
+
+
+def revenue(querysets: Sequence[QuerySet], group_by: List[str]) -> List[Dict[str, Any]]:
+    """Doanh thu theo các chiều trong group_by (course, mode, currency, day, provider).
+
+    GROUP BY chạy trong DB cho từng bảng (Order, OrderArchive); chỉ gộp kết quả đã tổng hợp.
+    Luôn tách theo currency: không cộng VND với USD thành một con số.
+    """
+    fields = [GROUP_FIELDS[g] for g in group_by]
+    if "currency" not in fields:
+        fields.append("currency")
+    merged: Dict[tuple, Dict[str, Any]] = {}
+    for qs in querysets:
+        if "day" in fields:
+            qs = qs.annotate(day=TruncDate("created_at"))
+        for r in qs.order_by().values(*fields).annotate(orders=Count("id"), revenue=Sum("amount")):
+            key = tuple(r[f] for f in fields)
+            if key in merged:
+                merged[key]["orders"] += r["orders"]
+                merged[key]["revenue"] += r["revenue"] or 0
+            else:
+                r["revenue"] = r["revenue"] or 0
+                merged[key] = r
+    out = []
+    for key in sorted(merged, key=lambda k: tuple("" if v is None else str(v) for v in k)):
+        r = merged[key]
+        r["revenue"] = str(r["revenue"])
+        if r.get("day") is not None:
+            r["day"] = r["day"].isoformat()
+        out.append(r)
+    return out
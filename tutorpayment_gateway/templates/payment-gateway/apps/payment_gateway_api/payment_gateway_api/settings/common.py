@@ -4,3 +4,97 @@ def plugin_settings(settings):
         "PAYMENT_NODE_CREATE_URL", "http://localhost:3000/api/payments/create"
     )
     settings.PAYMENT_SHARED_SECRET = tokens.get("PAYMENT_SHARED_SECRET", "CHANGE_ME")
+    # API hỏi trạng thái payment (đối soát đơn PENDING)
+    settings.PAYMENT_NODE_STATUS_URL = tokens.get(
+        "PAYMENT_NODE_STATUS_URL", "http://localhost:3000/api/payments/status"
+    )
+
+    # HTTP client tới Node: pool keep-alive, timeout, retry, circuit breaker
+    settings.PAYMENT_NODE_CONNECT_TIMEOUT = float(tokens.get("PAYMENT_NODE_CONNECT_TIMEOUT", 3))
+    settings.PAYMENT_NODE_READ_TIMEOUT = float(tokens.get("PAYMENT_NODE_READ_TIMEOUT", 10))
+    settings.PAYMENT_NODE_POOL_SIZE = int(tokens.get("PAYMENT_NODE_POOL_SIZE", 10))
+    settings.PAYMENT_NODE_MAX_RETRIES = int(tokens.get("PAYMENT_NODE_MAX_RETRIES", 2))
+    settings.PAYMENT_NODE_RETRY_BACKOFF = float(tokens.get("PAYMENT_NODE_RETRY_BACKOFF", 0.2))
+    settings.PAYMENT_NODE_BREAKER_THRESHOLD = int(tokens.get("PAYMENT_NODE_BREAKER_THRESHOLD", 5))
+    settings.PAYMENT_NODE_BREAKER_RESET = float(tokens.get("PAYMENT_NODE_BREAKER_RESET", 30))
+
+    # Checkout bất đồng bộ: gọi Node trên Celery (hoặc thread pool nếu không có Celery)
+    settings.PAYMENT_ASYNC_CHECKOUT = bool(tokens.get("PAYMENT_ASYNC_CHECKOUT", False))
+    settings.PAYMENT_ASYNC_THREADS = int(tokens.get("PAYMENT_ASYNC_THREADS", 4))
+    settings.PAYMENT_ASYNC_WAIT = float(tokens.get("PAYMENT_ASYNC_WAIT", 3))
+
+    # View async cho checkout / confirm / trạng thái đơn (ASGI + aiohttp); pool aiohttp tới Node / process
+    settings.PAYMENT_ASYNC_VIEWS = bool(tokens.get("PAYMENT_ASYNC_VIEWS", False))
+    settings.PAYMENT_NODE_ASYNC_POOL_SIZE = int(tokens.get("PAYMENT_NODE_ASYNC_POOL_SIZE", 100))
+
+    # Cache giá theo khoá học (giây); LRU trong process nên ngắn vì chỉ tự hết hạn
+    settings.PAYMENT_PRICING_CACHE_TTL = int(tokens.get("PAYMENT_PRICING_CACHE_TTL", 300))
+    settings.PAYMENT_PRICING_LOCAL_TTL = int(tokens.get("PAYMENT_PRICING_LOCAL_TTL", 30))
+    settings.PAYMENT_PRICING_LOCAL_SIZE = int(tokens.get("PAYMENT_PRICING_LOCAL_SIZE", 512))
+    settings.PAYMENT_BULK_PRICING_MAX = int(tokens.get("PAYMENT_BULK_PRICING_MAX", 300))
+
+    # Đơn nhóm: số suất tối đa / đơn, số dòng ghi danh mỗi lô (1 transaction) trên worker
+    settings.PAYMENT_BULK_ORDER_MAX_LINES = int(tokens.get("PAYMENT_BULK_ORDER_MAX_LINES", 1000))
+    settings.PAYMENT_BULK_ENROLL_CHUNK = int(tokens.get("PAYMENT_BULK_ENROLL_CHUNK", 100))
+
+    # Checkout lặp lại cùng (user, course, mode) trong cửa sổ này (giây) dùng lại đơn cũ; 0 = tắt
+    settings.PAYMENT_IDEMPOTENCY_WINDOW = int(tokens.get("PAYMENT_IDEMPOTENCY_WINDOW", 900))
+    # View async: checkout trùng chờ chung lượt gọi Node đang chạy tối đa bấy nhiêu giây
+    # (0 = sang trang chờ ngay; view sync luôn sang trang chờ ngay)
+    settings.PAYMENT_SINGLEFLIGHT_WAIT = float(tokens.get("PAYMENT_SINGLEFLIGHT_WAIT", 5))
+
+    # Số thông báo tối đa trong một request internal/confirm/batch/
+    settings.PAYMENT_CONFIRM_BATCH_MAX = int(tokens.get("PAYMENT_CONFIRM_BATCH_MAX", 1000))
+
+    # Inbox: confirm chỉ kiểm chữ ký + lưu, worker xử lý theo lô (Celery / process_payment_inbox)
+    settings.PAYMENT_CONFIRM_INBOX = bool(tokens.get("PAYMENT_CONFIRM_INBOX", False))
+    settings.PAYMENT_INBOX_BATCH_SIZE = int(tokens.get("PAYMENT_INBOX_BATCH_SIZE", 100))
+    settings.PAYMENT_INBOX_MAX_ATTEMPTS = int(tokens.get("PAYMENT_INBOX_MAX_ATTEMPTS", 5))
+    settings.PAYMENT_INBOX_RETRY_DELAY = int(tokens.get("PAYMENT_INBOX_RETRY_DELAY", 60))
+
+    # Trạng thái đơn cho trang kết quả: TTL cache (giây), long-poll tối đa và
+    # thời gian chờ mà trang kết quả dùng (0 = polling thường, không giữ worker).
+    # Long-poll mặc định chỉ bật cùng view async: view sync giữ worker suốt lúc chờ
+    settings.PAYMENT_STATUS_CACHE_TTL = int(tokens.get("PAYMENT_STATUS_CACHE_TTL", 30))
+    settings.PAYMENT_STATUS_LONGPOLL_MAX = float(
+        tokens.get("PAYMENT_STATUS_LONGPOLL_MAX", 20 if settings.PAYMENT_ASYNC_VIEWS else 0)
+    )
+    settings.PAYMENT_STATUS_PAGE_WAIT = float(tokens.get("PAYMENT_STATUS_PAGE_WAIT", 0))
+
+    # Lưu trữ đơn đã kết thúc sang OrderArchive (archive_payment_orders)
+    settings.PAYMENT_ARCHIVE_AFTER_DAYS = int(tokens.get("PAYMENT_ARCHIVE_AFTER_DAYS", 180))
+    settings.PAYMENT_ARCHIVE_BATCH_SIZE = int(tokens.get("PAYMENT_ARCHIVE_BATCH_SIZE", 1000))
+
+    # Ghi OrderEvent cho mỗi lần đơn đổi trạng thái (cùng transaction với UPDATE)
+    settings.PAYMENT_ORDER_EVENTS = bool(tokens.get("PAYMENT_ORDER_EVENTS", True))
+
+    # Metric Prometheus ở /payment-gateway/metrics (staff hoặc Bearer token);
+    # MULTIPROC_DIR: thư mục dùng chung cho nhiều worker
+    settings.PAYMENT_METRICS_ENABLED = bool(tokens.get("PAYMENT_METRICS_ENABLED", False))
+    settings.PAYMENT_METRICS_TOKEN = tokens.get("PAYMENT_METRICS_TOKEN", "")
+    settings.PAYMENT_METRICS_MULTIPROC_DIR = tokens.get("PAYMENT_METRICS_MULTIPROC_DIR", "")
+
+    # Giới hạn tần suất "N/s|m|h|d" theo user và theo IP ("" = tắt)
+    settings.PAYMENT_RATE_LIMIT_CHECKOUT = tokens.get("PAYMENT_RATE_LIMIT_CHECKOUT", "10/m")
+    settings.PAYMENT_RATE_LIMIT_CHECKOUT_IP = tokens.get("PAYMENT_RATE_LIMIT_CHECKOUT_IP", "60/m")
+    settings.PAYMENT_RATE_LIMIT_PRICING = tokens.get("PAYMENT_RATE_LIMIT_PRICING", "120/m")
+    settings.PAYMENT_RATE_LIMIT_PRICING_IP = tokens.get("PAYMENT_RATE_LIMIT_PRICING_IP", "")
+
+    # Provider: tên -> {"backend": "node" | "vnpay" | "fake" | dotted path, ...options};
+    # ROUTES: [{"course": glob, "currency": ..., "provider": tên}], rule đầu tiên khớp thắng
+    settings.PAYMENT_PROVIDERS = tokens.get("PAYMENT_PROVIDERS") or {"vnpay": {"backend": "node"}}
+    settings.PAYMENT_PROVIDER_ROUTES = tokens.get("PAYMENT_PROVIDER_ROUTES") or []
+    settings.PAYMENT_DEFAULT_PROVIDER = tokens.get("PAYMENT_DEFAULT_PROVIDER", "vnpay")
+
+    # Xoay key HMAC: {"key id": "secret"}; rỗng = chỉ dùng PAYMENT_SHARED_SECRET (id "default").
+    # KEY_ID: key dùng để ký request đi; chống replay bằng X-Timestamp/X-Nonce
+    settings.PAYMENT_SIGNING_KEYS = tokens.get("PAYMENT_SIGNING_KEYS") or {}
+    settings.PAYMENT_SIGNING_KEY_ID = tokens.get("PAYMENT_SIGNING_KEY_ID", "")
+    settings.PAYMENT_SIGNING_MAX_SKEW = int(tokens.get("PAYMENT_SIGNING_MAX_SKEW", 300))
+    settings.PAYMENT_SIGNING_REQUIRE_TIMESTAMP = bool(tokens.get("PAYMENT_SIGNING_REQUIRE_TIMESTAMP", False))
+
+    # Đếm query mỗi request, log view vượt budget; "" / None = theo DEBUG
+    check = tokens.get("PAYMENT_QUERY_BUDGET_CHECK", "")
+    settings.PAYMENT_QUERY_BUDGET_CHECK = (
+        None if check in ("", None) else str(check).strip().lower() in ("true", "1", "yes", "on")
+    )
@@ -0,0 +1,23 @@
+# payment_gateway_api/signals.py
+# Xoá cache giá khi CourseMode / CourseOverview thay đổi.
+# Sender dạng "app_label.Model": Django tự nối khi model sẵn sàng, không phải
+# import model edx (và pricing kéo theo) lúc AppConfig.ready().
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import pricing
+
+COURSE_MODE = "course_modes.CourseMode"
+COURSE_OVERVIEW = "course_overviews.CourseOverview"
+
+
+@receiver(post_save, sender=COURSE_MODE, dispatch_uid="payment_gateway_coursemode_saved")
+@receiver(post_delete, sender=COURSE_MODE, dispatch_uid="payment_gateway_coursemode_deleted")
+def _course_mode_changed(sender, instance, **kwargs):
+    pricing.invalidate_on_commit(instance.course_id)
+
+
+@receiver(post_save, sender=COURSE_OVERVIEW, dispatch_uid="payment_gateway_courseoverview_saved")
+@receiver(post_delete, sender=COURSE_OVERVIEW, dispatch_uid="payment_gateway_courseoverview_deleted")
+def _course_overview_changed(sender, instance, **kwargs):
+    pricing.invalidate_on_commit(instance.id)
@@ -0,0 +1,129 @@
+# payment_gateway_api/signing.py
+# Ký / xác thực HMAC-SHA256 giữa LMS và Node (hoặc provider kiểu Node).
+#   - Key được encode và tạo sẵn đối tượng HMAC 1 lần mỗi process; mỗi message chỉ copy().
+#   - Xoay key không downtime: PAYMENT_SIGNING_KEYS = {"k2": "...", "k1": "..."} và
+#     PAYMENT_SIGNING_KEY_ID = "k2" (key dùng để ký). Bên gửi nêu key ở X-Key-Id;
+#     thiếu header thì thử lần lượt mọi key còn hiệu lực.
+#   - Chống replay: có X-Timestamp + X-Nonce thì chữ ký phủ "<ts>.<nonce>." + body,
+#     timestamp lệch quá PAYMENT_SIGNING_MAX_SKEW giây hoặc nonce đã thấy -> từ chối.
+#     PAYMENT_SIGNING_REQUIRE_TIMESTAMP=False (mặc định) vẫn nhận chữ ký chỉ trên body.
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import metrics
+
+NONCE_PREFIX = "payment_gateway:nonce:"
+DEFAULT_KEY_ID = "default"
+
+
+def canonical_json(data: Any) -> bytes:
+    """JSON dạng chuẩn (key sắp xếp, không khoảng trắng) để hai bên ký cùng một chuỗi byte."""
+    return json.dumps(data, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+class SignatureError(Exception):
+    """Chữ ký sai, thiếu hoặc bị gửi lại."""
+
+
+class Keyring:
+    def __init__(self, keys: Dict[str, str], active: Optional[str] = None):
+        if not keys:
+            raise ValueError("at least one signing key is required")
+        # Đối tượng HMAC đã nạp key; copy() rẻ hơn hmac.new() vì bỏ qua bước băm key
+        self._base = {kid: hmac.new(secret.encode(), digestmod=hashlib.sha256) for kid, secret in keys.items()}
+        self.active = active if active in self._base else next(iter(self._base))
+        self._order = [self.active] + [k for k in self._base if k != self.active]
+
+    @classmethod
+    def from_secret(cls, secret: str) -> "Keyring":
+        return cls({DEFAULT_KEY_ID: secret})
+
+    def key_ids(self):
+        return list(self._base)
+
+    def _digest(self, kid: str, payload: bytes, prefix: bytes = b"") -> str:
+        h = self._base[kid].copy()
+        if prefix:
+            h.update(prefix)
+        h.update(payload)
+        return h.hexdigest()
+
+    def sign(self, payload: bytes, kid: Optional[str] = None, prefix: bytes = b"") -> str:
+        with metrics.phase("sign"):
+            return self._digest(kid or self.active, payload, prefix)
+
+    def headers(self, payload: bytes) -> Dict[str, str]:
+        """Header cho request đi: chữ ký trên body (Node cũ vẫn kiểm được) + key id."""
+        return {"X-Signature": self.sign(payload), "X-Key-Id": self.active}
+
+    def matches(self, payload: bytes, signature: str, kid: Optional[str] = None, prefix: bytes = b"") -> bool:
+        if not signature:
+            return False
+        signature = signature.strip().lower()
+        with metrics.phase("sign"):
+            if kid:
+                return kid in self._base and hmac.compare_digest(self._digest(kid, payload, prefix), signature)
+            # Không có key id: thử key đang ký trước, rồi tới các key cũ còn hiệu lực
+            return any(hmac.compare_digest(self._digest(k, payload, prefix), signature) for k in self._order)
+
+    def verify_request(self, request) -> None:
+        """Raise SignatureError nếu request không hợp lệ."""
+        raw = request.body
+        sig = request.headers.get("X-Signature", "")
+        kid = request.headers.get("X-Key-Id") or None
+        ts = request.headers.get("X-Timestamp")
+        nonce = request.headers.get("X-Nonce")
+        if ts is None or nonce is None:
+            if getattr(settings, "PAYMENT_SIGNING_REQUIRE_TIMESTAMP", False):
+                raise SignatureError("Missing X-Timestamp / X-Nonce")
+            if not self.matches(raw, sig, kid):
+                raise SignatureError("Bad signature")
+            return
+
+        skew = getattr(settings, "PAYMENT_SIGNING_MAX_SKEW", 300)
+        try:
+            age = abs(time.time() - float(ts))
+        except ValueError:
+            raise SignatureError("Bad X-Timestamp") from None
+        # "not <=": X-Timestamp "nan" cũng bị từ chối
+        if not age <= skew:
+            raise SignatureError("Stale X-Timestamp")
+        if not nonce or len(nonce) > 64:
+            raise SignatureError("Bad X-Nonce")
+        if not self.matches(raw, sig, kid, prefix=f"{ts}.{nonce}.".encode()):
+            raise SignatureError("Bad signature")
+        # Kiểm nonce sau chữ ký: request giả không chiếm được nonce của request thật
+        if not cache.add(f"{NONCE_PREFIX}{nonce}", 1, int(skew) * 2):
+            raise SignatureError("Replayed request")
+
+
+_keyring: Optional[Keyring] = None
+_keyring_pid: Optional[int] = None
+_lock = threading.Lock()
+
+
+def _from_settings() -> Keyring:
+    keys = getattr(settings, "PAYMENT_SIGNING_KEYS", None) or {}
+    if not keys:
+        return Keyring.from_secret(settings.PAYMENT_SHARED_SECRET)
+    return Keyring(keys, getattr(settings, "PAYMENT_SIGNING_KEY_ID", None))
+
+
+def keyring() -> Keyring:
+    """Keyring theo settings, tạo 1 lần mỗi process."""
+    global _keyring, _keyring_pid
+    pid = os.getpid()
+    if _keyring is None or _keyring_pid != pid:
+        with _lock:
+            if _keyring is None or _keyring_pid != pid:
+                _keyring = _from_settings()
+                _keyring_pid = pid
+    return _keyring
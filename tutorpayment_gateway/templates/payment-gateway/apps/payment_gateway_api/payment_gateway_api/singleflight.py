@@ -0,0 +1,134 @@
+# payment_gateway_api/singleflight.py
+# Gộp các lượt gọi tạo payment trùng nhau (single-flight), theo idempotency_key của đơn.
+# Checkout trùng (double-click, nhiều tab, client retry khi Node chậm) đụng unique
+# idempotency_key nên không tạo đơn mới. View sync chuyển ngay sang trang chờ (không giữ
+# worker để chờ); view async chờ chung kết quả của lượt gọi Node đang chạy trên event loop:
+#   - cùng process: Future trong bộ nhớ;
+#   - khác process: request đầu ("leader") đặt khoá "đang gọi" trong cache (Redis của LMS),
+#     ghi kết quả vào cache khi xong; request trùng đọc khoá + kết quả đến khi có.
+# Leader lỗi thì xoá khoá, request trùng thôi chờ và quay về trang chờ như cũ.
+# Chỉ làm leader khi có view async để chờ (payments._joinable); view sync không ghi gì vào cache.
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from django.core.cache import cache
+
+from . import metrics
+
+LOCK_PREFIX = "payment_gateway:sf:lock:"
+RESULT_PREFIX = "payment_gateway:sf:result:"
+# Khoá chỉ còn lại khi process leader chết giữa chừng
+LOCK_TTL = 60
+RESULT_TTL = 60
+POLL_INTERVAL = 0.05
+
+_inflight: Dict[str, Future] = {}
+_lock = threading.Lock()
+_stats = {"leads": 0, "shared_local": 0, "shared_remote": 0, "missed": 0}
+
+
+def _count(name: str) -> None:
+    with _lock:
+        _stats[name] += 1
+    metrics.singleflight(name)
+
+
+def stats() -> Dict[str, Any]:
+    """Bộ đếm trong process; saved = số lượt gọi Node đã tránh được."""
+    with _lock:
+        out: Dict[str, Any] = dict(_stats)
+    out["saved"] = out["shared_local"] + out["shared_remote"]
+    return out
+
+
+def _claim(key: str) -> Tuple[Future, bool]:
+    with _lock:
+        fut = _inflight.get(key)
+        leader = fut is None
+        if leader:
+            fut = _inflight[key] = Future()
+    return fut, leader
+
+
+def lead(key: str, fn: Callable[[], Any]) -> Any:
+    """Chạy fn() làm leader cho key và công bố kết quả cho request trùng.
+
+    Nếu process này đã có lượt gọi cùng key đang chạy thì chờ và dùng chung kết quả đó.
+    """
+    fut, leader = _claim(key)
+    if not leader:
+        _count("shared_local")
+        return fut.result()
+
+    _count("leads")
+    cache.set(LOCK_PREFIX + key, 1, LOCK_TTL)
+    try:
+        result = fn()
+    except BaseException as ex:
+        fut.set_exception(ex)
+        raise
+    else:
+        fut.set_result(result)
+        # Ghi kết quả trước khi bỏ khoá: request trùng ở process khác không bỏ lỡ
+        cache.set(RESULT_PREFIX + key, result, RESULT_TTL)
+        return result
+    finally:
+        with _lock:
+            _inflight.pop(key, None)
+        cache.delete(LOCK_PREFIX + key)
+
+
+async def alead(key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+    """Như lead() cho view async: await fn() làm leader, chờ chung không chiếm thread."""
+    fut, leader = _claim(key)
+    if not leader:
+        _count("shared_local")
+        return await asyncio.wrap_future(fut)
+
+    _count("leads")
+    await cache.aset(LOCK_PREFIX + key, 1, LOCK_TTL)
+    try:
+        result = await fn()
+    except BaseException as ex:
+        fut.set_exception(ex)
+        raise
+    else:
+        fut.set_result(result)
+        await cache.aset(RESULT_PREFIX + key, result, RESULT_TTL)
+        return result
+    finally:
+        with _lock:
+            _inflight.pop(key, None)
+        await cache.adelete(LOCK_PREFIX + key)
+
+
+async def ajoin(key: str, timeout: float) -> Optional[Any]:
+    """Kết quả của lượt gọi đang chạy cho key, chờ tối đa timeout giây (chỉ dùng ở view async).
+
+    None nếu không có lượt gọi nào đang chạy, leader lỗi, hoặc hết giờ.
+    """
+    with _lock:
+        fut = _inflight.get(key)
+    if fut is not None:
+        try:
+            # shield: hết giờ chỉ huỷ phần chờ ở đây, không huỷ Future của leader
+            result = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(fut)), timeout)
+        except Exception:
+            _count("missed")
+            return None
+        _count("shared_local")
+        return result
+
+    deadline = time.monotonic() + timeout
+    while True:
+        found = await cache.aget_many([RESULT_PREFIX + key, LOCK_PREFIX + key])
+        if RESULT_PREFIX + key in found:
+            _count("shared_remote")
+            return found[RESULT_PREFIX + key]
+        if LOCK_PREFIX + key not in found or time.monotonic() >= deadline:
+            _count("missed")
+            return None
+        await asyncio.sleep(POLL_INTERVAL)
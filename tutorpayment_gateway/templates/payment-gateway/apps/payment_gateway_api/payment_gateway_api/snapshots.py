@@ -0,0 +1,217 @@
+# payment_gateway_api/snapshots.py
+# Bảng CourseCheckoutSnapshot: mỗi khoá 1 dòng đã tính sẵn các mode mua được
+# (bỏ mode free, bỏ mode hết hạn), giá, tiền tệ, thời gian ghi danh, invite_only.
+#   - Dựng lại từng khoá khi CourseMode / CourseOverview đổi (signals -> pricing),
+#     và toàn bộ bằng lệnh rebuild_checkout_snapshots (chạy định kỳ).
+#   - valid_until = lúc mode sớm nhất trong snapshot hết hạn. Đọc dòng đã quá mốc
+#     này thì dựng lại; request không phải so hạn từng mode.
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional
+
+from django.db import connection
+from django.utils import timezone
+
+from .models import CourseCheckoutSnapshot
+
+if TYPE_CHECKING:
+    from opaque_keys.edx.keys import CourseKey
+    from openedx.core.djangoapps.content.course_overviews.models import CourseOverview
+
+FREE_MODES = {"audit", "honor"}
+# Cột ghi lại khi upsert (mọi cột trừ khoá chính)
+_UPDATE_FIELDS = ["course_name", "course_start", "course_end", "enrollment_start", "enrollment_end",
+                  "invite_only", "modes", "valid_until", "updated_at"]
+
+
+# ===== đọc CourseMode / CourseOverview =====
+# Cột cần đọc; tên field CourseMode khác nhau giữa các bản edx-platform
+# (expiration_datetime <-> _expiration_datetime, các sku...) nên lọc theo model 1 lần.
+_MODE_COLUMNS = ("mode_slug", "mode_display_name", "currency", "min_price", "suggested_prices",
+                 "sku", "android_sku", "ios_sku", "bulk_sku",
+                 "_expiration_datetime", "expiration_datetime", "expiration_date")
+_OVERVIEW_COLUMNS = ("display_name", "start", "end", "enrollment_start", "enrollment_end", "invite_only")
+_mode_fields: Optional[list] = None
+
+
+def _mode_columns() -> list:
+    global _mode_fields
+    if _mode_fields is None:
+        from common.djangoapps.course_modes.models import CourseMode
+
+        names = {f.name for f in CourseMode._meta.concrete_fields}
+        _mode_fields = [c for c in _MODE_COLUMNS if c in names]
+    return _mode_fields
+
+
+def _mode_row(m: Dict[str, Any]) -> Dict[str, Any]:
+    # m: 1 dòng .values(); field không có trong model thì không có key
+    suggested = m.get("suggested_prices")
+    return {
+        "slug": m["mode_slug"],
+        "name": m.get("mode_display_name") or m["mode_slug"],
+        "currency": m.get("currency"),
+        "min_price": Decimal(m["min_price"] or 0),
+        "suggested_prices": list(suggested) if isinstance(suggested, (list, tuple)) else [],
+        "sku": m.get("sku") or m.get("android_sku") or m.get("ios_sku") or m.get("bulk_sku"),
+        "expiration_datetime": m.get("expiration_datetime", m.get("_expiration_datetime")),
+        "expiration_date": m.get("expiration_date"),
+    }
+
+
+def _overview_dict(co: "CourseOverview") -> Dict[str, Any]:
+    row = {c: getattr(co, c) for c in _OVERVIEW_COLUMNS}
+    row["display_name"] = co.display_name_with_default
+    return row
+
+
+def _load_raw(course_keys: Iterable["CourseKey"]) -> Dict[str, Dict[str, Any]]:
+    """{course_id: {"overview": dict | None, "modes": [mode thô]}}.
+
+    Thường 1 query: CourseOverview LEFT JOIN CourseMode, chỉ lấy các cột cần.
+    Khoá chưa có CourseOverview thì mới đọc riêng.
+    """
+    # Model edx import lúc dùng: signals/views nạp module này khi LMS khởi động
+    from common.djangoapps.course_modes.models import CourseMode
+    from openedx.core.djangoapps.content.course_overviews.models import CourseOverview
+
+    keys = list(course_keys)
+    cols = _mode_columns()
+    modes: Dict[str, list] = {str(k): [] for k in keys}
+    overviews: Dict[str, Dict[str, Any]] = {}
+    unnamed = []
+    rows = CourseOverview.objects.filter(id__in=keys).values(
+        "id", *_OVERVIEW_COLUMNS, *("modes__" + c for c in cols))
+    for row in rows:
+        cid = str(row["id"])
+        if cid not in overviews:
+            overviews[cid] = {c: row[c] for c in _OVERVIEW_COLUMNS}
+            if row["display_name"] is None:
+                unnamed.append(row["id"])
+        if row["modes__mode_slug"] is not None:
+            modes[cid].append(_mode_row({c: row["modes__" + c] for c in cols}))
+
+    missing = [k for k in keys if str(k) not in overviews]
+    if len(keys) == 1 and missing:
+        # get_from_id có thể tự dựng CourseOverview cho khoá mới
+        try:
+            overviews[str(missing[0])] = _overview_dict(CourseOverview.get_from_id(missing[0]))
+        except Exception:
+            pass
+    if missing:
+        for row in CourseMode.objects.filter(course_id__in=missing).values("course_id", *cols):
+            modes.setdefault(str(row["course_id"]), []).append(_mode_row(row))
+    if unnamed:
+        # display_name NULL: để CourseOverview tự tính tên mặc định
+        for co in CourseOverview.objects.filter(id__in=unnamed):
+            overviews[str(co.id)] = _overview_dict(co)
+    return {str(k): {"overview": overviews.get(str(k)), "modes": modes[str(k)]} for k in keys}
+
+
+# ===== dựng snapshot =====
+def _expires_at(m: Dict[str, Any]) -> Optional[datetime]:
+    if m["expiration_datetime"]:
+        return m["expiration_datetime"]
+    if m["expiration_date"]:
+        # Hết hạn khi sang ngày hôm sau (UTC), giống so sánh now().date() > expiration_date trước đây
+        return datetime.combine(m["expiration_date"] + timedelta(days=1), time.min, tzinfo=dt_timezone.utc)
+    return None
+
+
+def _build(course_id: str, raw: Dict[str, Any], now: datetime) -> CourseCheckoutSnapshot:
+    modes: List[Dict[str, Any]] = []
+    bounds: List[datetime] = []
+    for m in raw["modes"]:
+        if m["slug"] in FREE_MODES:
+            continue
+        expires = _expires_at(m)
+        if expires and expires <= now:
+            continue
+        # Chỉ giữ mode có giá trị trả phí
+        if not (m["min_price"] > 0 or m["sku"] or m["currency"]):
+            continue
+        if expires:
+            bounds.append(expires)
+        modes.append({
+            "slug": m["slug"],
+            "name": m["name"],
+            "currency": m["currency"],
+            "min_price": str(m["min_price"]),
+            "suggested_prices": [str(x) for x in m["suggested_prices"]],
+            "sku": m["sku"],
+            "expiration_datetime": m["expiration_datetime"].isoformat() if m["expiration_datetime"] else None,
+        })
+    co = raw["overview"] or {}
+    return CourseCheckoutSnapshot(
+        course_id=course_id,
+        course_name=co.get("display_name"),
+        course_start=co.get("start"),
+        course_end=co.get("end"),
+        enrollment_start=co.get("enrollment_start"),
+        enrollment_end=co.get("enrollment_end"),
+        invite_only=bool(co["invite_only"]) if co else None,
+        modes=modes,
+        valid_until=min(bounds, default=None),
+        updated_at=now,
+    )
+
+
+def rebuild(course_keys: Iterable[Any], prune: bool = False) -> Dict[str, CourseCheckoutSnapshot]:
+    """Dựng lại snapshot cho các khoá và upsert trong 1 câu lệnh.
+
+    Khoá không có CourseOverview lẫn CourseMode thì không ghi (trả về snapshot rỗng chưa lưu),
+    để course_id tuỳ ý trong request không tạo dòng rác; prune=True thì xoá snapshot cũ của chúng.
+    """
+    keys = list(course_keys)
+    if not keys:
+        return {}
+    now = timezone.now()
+    raw = _load_raw(keys)
+    out = {cid: _build(cid, r, now) for cid, r in raw.items()}
+    rows = [s for cid, s in out.items() if raw[cid]["overview"] or raw[cid]["modes"]]
+    if rows:
+        # MySQL: ON DUPLICATE KEY UPDATE (không nhận unique_fields); SQLite/Postgres: ON CONFLICT (course_id)
+        target = {"unique_fields": ["course_id"]} if connection.features.supports_update_conflicts_with_target else {}
+        CourseCheckoutSnapshot.objects.bulk_create(
+            rows, update_conflicts=True, update_fields=_UPDATE_FIELDS, **target)
+    saved = {s.course_id for s in rows}
+    gone = [cid for cid in out if cid not in saved]
+    if prune and gone:
+        # Khoá đã bị xoá: bỏ snapshot cũ nếu còn
+        CourseCheckoutSnapshot.objects.filter(pk__in=gone).delete()
+    return out
+
+
+def get_many(course_keys: Iterable[Any]) -> Dict[str, CourseCheckoutSnapshot]:
+    """Snapshot theo course_id: 1 query theo khoá chính; thiếu hoặc quá valid_until thì dựng lại."""
+    keys = {str(k): k for k in course_keys}
+    now = timezone.now()
+    found = {s.course_id: s for s in CourseCheckoutSnapshot.objects.filter(pk__in=list(keys))}
+    stale = [k for cid, k in keys.items() if cid not in found or not found[cid].is_valid(now)]
+    if stale:
+        found.update(rebuild(stale))
+    return found
+
+
+def get(course_key: Any) -> CourseCheckoutSnapshot:
+    return get_many([course_key])[str(course_key)]
+
+
+def discard(course_id: Any) -> None:
+    CourseCheckoutSnapshot.objects.filter(pk=str(course_id)).delete()
+
+
+def rebuild_all(batch_size: int = 500) -> Dict[str, int]:
+    """Dựng lại mọi khoá có CourseOverview, CourseMode hoặc snapshot cũ, theo lô."""
+    from common.djangoapps.course_modes.models import CourseMode
+    from openedx.core.djangoapps.content.course_overviews.models import CourseOverview
+
+    ids = {str(i) for i in CourseOverview.objects.values_list("id", flat=True)}
+    ids.update(str(i) for i in CourseMode.objects.values_list("course_id", flat=True).distinct())
+    ids.update(CourseCheckoutSnapshot.objects.values_list("course_id", flat=True))
+    ordered = sorted(ids)
+    batches = 0
+    for i in range(0, len(ordered), batch_size):
+        rebuild(ordered[i:i + batch_size], prune=True)
+        batches += 1
+    return {"courses": len(ordered), "batches": batches}
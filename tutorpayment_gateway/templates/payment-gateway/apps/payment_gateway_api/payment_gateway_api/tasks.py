@@ -0,0 +1,139 @@
+# payment_gateway_api/tasks.py
+# Checkout bất đồng bộ: Order được tạo ngay (PENDING), việc gọi Node chạy trên
+# Celery worker của LMS, hoặc thread pool trong process nếu không có Celery.
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from . import bulk, inbox, payments, processing, providers
+from .models import Order
+
+try:
+    from celery import shared_task
+except ImportError:  # pragma: no cover - LMS luôn có Celery
+    shared_task = None
+
+log = logging.getLogger(__name__)
+
+
+def create_payment_for_order(order_id: int, return_url: str) -> None:
+    order = Order.objects.select_related("user").get(pk=order_id)
+    if order.status != Order.Status.PENDING or order.checkout_url:
+        return
+    try:
+        payments.request_checkout_url(order, return_url)
+    except providers.ProviderError as ex:
+        log.warning("payment-gateway: create payment failed for order %s: %s", order.uid, ex)
+        payments.mark_failed(order, source="async_checkout")
+
+
+def enroll_paid_orders(order_ids: List[int]) -> None:
+    # Ghi danh cho cả lô đơn vừa PAID: 1 query lấy đơn + user
+    for order in Order.objects.select_related("user").filter(pk__in=order_ids, status=Order.Status.PAID):
+        try:
+            processing.enroll(order)
+        except Exception:
+            pass  # đã log trong processing.enroll; các đơn khác vẫn chạy tiếp
+
+
+def enroll_bulk_order(order_id: int) -> None:
+    done = bulk.enroll_order(order_id)
+    log.info("payment-gateway: bulk order %s enrollment %s", order_id, done)
+
+
+def drain_inbox() -> None:
+    total = inbox.drain()
+    if total["batches"]:
+        log.info("payment-gateway: inbox drained %s", total)
+
+
+def _task(name: str, func: Callable[..., None]) -> Any:
+    if shared_task is None:
+        return None
+    return shared_task(name=name, ignore_result=True)(func)
+
+
+create_payment_task = _task("payment_gateway_api.create_payment", create_payment_for_order)
+enroll_orders_task = _task("payment_gateway_api.enroll_orders", enroll_paid_orders)
+enroll_bulk_task = _task("payment_gateway_api.enroll_bulk_order", enroll_bulk_order)
+drain_inbox_task = _task("payment_gateway_api.drain_inbox", drain_inbox)
+
+
+# ===== thread pool fallback =====
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_pid: Optional[int] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor, _executor_pid
+    pid = os.getpid()
+    if _executor is None or _executor_pid != pid:
+        with _executor_lock:
+            if _executor is None or _executor_pid != pid:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, "PAYMENT_ASYNC_THREADS", 4),
+                    thread_name_prefix="payment-gateway",
+                )
+                _executor_pid = pid
+    return _executor
+
+
+def _run_in_thread(func: Callable[..., None], *args: Any) -> None:
+    close_old_connections()
+    try:
+        func(*args)
+    except Exception:
+        log.exception("payment-gateway: background task %s crashed", func.__name__)
+    finally:
+        close_old_connections()
+
+
+def _dispatch(celery_task: Any, func: Callable[..., None], *args: Any) -> None:
+    if celery_task is not None:
+        try:
+            celery_task.delay(*args)
+            return
+        except Exception:
+            log.exception("payment-gateway: cannot queue Celery task, falling back to thread pool")
+    _get_executor().submit(_run_in_thread, func, *args)
+
+
+def _dispatch_later(celery_task: Any, func: Callable[..., None], countdown: int, *args: Any) -> None:
+    if celery_task is not None:
+        try:
+            celery_task.apply_async(args=args, countdown=countdown)
+            return
+        except Exception:
+            log.exception("payment-gateway: cannot queue Celery task, falling back to a timer thread")
+    timer = threading.Timer(countdown, _dispatch, (None, func, *args))
+    timer.daemon = True
+    timer.start()
+
+
+def enqueue_create_payment(order: Order, return_url: str) -> None:
+    # Chỉ đẩy việc sau khi commit, để worker chắc chắn thấy Order
+    transaction.on_commit(lambda: _dispatch(create_payment_task, create_payment_for_order, order.pk, return_url))
+
+
+def enqueue_enrollments(order_ids: List[int]) -> None:
+    ids = list(order_ids)
+    transaction.on_commit(lambda: _dispatch(enroll_orders_task, enroll_paid_orders, ids))
+
+
+def enqueue_bulk_enrollment(order_id: int) -> None:
+    transaction.on_commit(lambda: _dispatch(enroll_bulk_task, enroll_bulk_order, order_id))
+
+
+def enqueue_inbox_drain() -> None:
+    transaction.on_commit(lambda: _dispatch(drain_inbox_task, drain_inbox))
+
+
+def schedule_inbox_drain(countdown: int) -> None:
+    """Drain lại sau countdown giây, cho các tin đang chờ retry."""
+    transaction.on_commit(lambda: _dispatch_later(drain_inbox_task, drain_inbox, countdown))
@@ -1,15 +1,42 @@
+from django.conf import settings
 from django.urls import path, re_path
 from . import views
 
+if getattr(settings, "PAYMENT_ASYNC_VIEWS", False):
+    # checkout / confirm / trạng thái đơn bản async (ASGI); chỉ import khi bật
+    from . import async_views as flow
+else:
+    flow = views
+
 app_name = "payment_gateway_api"
 
 urlpatterns = [
     # Giá/Mode (staff-only)
     path("api/course-price/", views.course_price, name="course_price"),
     re_path(r"^api/course/(?P<course_id>.+)/price$", views.course_price_by_path, name="course_price_by_path"),
+    path("api/course-prices/", views.course_prices, name="course_prices"),  # nhiều khoá / 1 request
+    path("api/pricing-cache/", views.pricing_cache_stats, name="pricing_cache_stats"),
+    path("api/singleflight/", views.singleflight_stats, name="singleflight_stats"),  # lượt gọi Node đã gộp
+
+    # Prometheus (staff hoặc token)
+    path("metrics", views.metrics_view, name="metrics"),
+
+    # Báo cáo cho kế toán (staff-only)
+    path("api/reports/orders/export", views.export_orders, name="export_orders"),
+    path("api/reports/revenue", views.revenue_report, name="revenue_report"),
 
     # Luồng thanh toán tối thiểu
-    path("api/checkout/", views.checkout, name="checkout"),
-    path("internal/confirm/", views.confirm, name="confirm"),            # Node gọi về
+    path("api/checkout/", flow.checkout, name="checkout"),
+    path("prepare/<uuid:uid>/", views.prepare_page, name="prepare_page"),  # chờ checkout bất đồng bộ
+    path("internal/confirm/", flow.confirm, name="confirm"),             # Node gọi về
+    path("internal/confirm/batch/", views.confirm_batch, name="confirm_batch"),  # Node gửi lại cả lô
+    path("internal/callback/<str:provider>/", views.provider_callback, name="provider_callback"),  # IPN trực tiếp
     path("return/<uuid:uid>/", views.return_page, name="return_page"),   # trang kết quả user
+    path("api/orders/<uuid:uid>/status", flow.order_status_api, name="order_status"),  # polling / long-poll
+    path("api/orders/<uuid:uid>/events", views.order_events, name="order_events"),  # lịch sử trạng thái (staff)
+
+    # Đơn nhóm: nhiều suất (user/email, khoá, mode), 1 payment; tiến độ ghi danh
+    path("api/bulk-checkout/", views.bulk_checkout, name="bulk_checkout"),
+    path("api/bulk-orders/<uuid:uid>/", views.bulk_order_progress, name="bulk_order_progress"),
+    path("bulk/claim/<str:token>/", views.bulk_claim, name="bulk_claim"),  # link mời: nhận suất theo email
 ]
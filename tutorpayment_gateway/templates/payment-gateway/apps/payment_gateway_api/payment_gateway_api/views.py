@@ -1,26 +1,37 @@
 # payment_gateway_api/views.py
-import json, hmac, hashlib
+import hashlib
+import json
+import logging
+import time
 from decimal import Decimal
-from typing import Any, Dict, List
+from typing import TYPE_CHECKING, Any, Dict, List, NamedTuple, Optional
 from urllib.parse import unquote
 
-import requests
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.http import (
-    JsonResponse, HttpResponseBadRequest, HttpResponse, HttpResponseForbidden
+    Http404, JsonResponse, HttpResponseBadRequest, HttpResponse, HttpResponseForbidden,
+    HttpResponseNotModified, StreamingHttpResponse,
 )
-from django.views.decorators.http import require_GET
+from django.utils.http import parse_etags, quote_etag
+from django.views.decorators.http import require_GET, require_http_methods
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.shortcuts import redirect, get_object_or_404
-from django.utils import timezone
+from django.shortcuts import redirect
+from django.middleware.csrf import get_token
+from django.utils.html import escape
+from django.db import transaction
 from django.views.decorators.csrf import csrf_exempt
 
-from opaque_keys.edx.keys import CourseKey
-from common.djangoapps.course_modes.models import CourseMode
-from openedx.core.djangoapps.content.course_overviews.models import CourseOverview
-from common.djangoapps.student.models import CourseEnrollment
+from . import (
+    archive, bulk, events, inbox, metrics, order_status, payments, pricing, processing, providers, querybudget, ratelimit,
+    reports, signing, singleflight, tasks,
+)
+from .models import Order, OrderArchive
+
+if TYPE_CHECKING:
+    from opaque_keys.edx.keys import CourseKey
 
-from .models import Order
+log = logging.getLogger(__name__)
 
 # ===== helpers =====
 def _decimal(v: Any) -> float:
@@ -35,98 +46,49 @@ def _normalize_course_id(s: str) -> str:
         s = s.replace(" ", "+")
     return s
 
-def _coerce_course_key(course_id: str) -> CourseKey:
+def _coerce_course_key(course_id: str) -> "CourseKey":
+    # opaque_keys import lúc dùng, không kéo theo khi LMS nạp urls
+    from opaque_keys.edx.keys import CourseKey
+
     return CourseKey.from_string(course_id)
 
-def _modes_for_course(course_key: CourseKey) -> List[Dict[str, Any]]:
-    qs = CourseMode.objects.filter(course_id=course_key)
-    now = timezone.now()
-    out: List[Dict[str, Any]] = []
-    for m in qs:
-        # Bỏ free modes
-        if m.mode_slug in {"audit", "honor"}:
-            continue
-        # Hết hạn: dùng expiration_date / expiration_datetime nếu có
-        try:
-            expires = getattr(m, "expiration_datetime", None)
-        except Exception:
-            expires = None
-        is_expired = bool(expires and expires <= now)
-        # fallback theo date
-        if not expires and getattr(m, "expiration_date", None):
-            is_expired = timezone.now().date() > m.expiration_date
-
-        if is_expired:
-            continue
-
-        suggested = getattr(m, "suggested_prices", None)
-        if isinstance(suggested, (list, tuple)):
-            suggested_list = [_decimal(x) for x in suggested]
-        else:
-            suggested_list = []
-
-        out.append({
-            "slug": m.mode_slug,
-            "name": getattr(m, "mode_display_name", m.mode_slug) or m.mode_slug,
-            "currency": getattr(m, "currency", None),
-            "min_price": _decimal(getattr(m, "min_price", None)),
-            "suggested_prices": suggested_list,
-            "sku": getattr(m, "sku", None) or getattr(m, "android_sku", None)
-                   or getattr(m, "ios_sku", None) or getattr(m, "bulk_sku", None),
-            "expiration_datetime": expires.isoformat() if expires else None,
-        })
+def _modes_for_course(entry: Dict[str, Any]) -> List[Dict[str, Any]]:
+    # Snapshot đã bỏ mode free / hết hạn; chỉ đổi giá sang số cho JSON
+    return [
+        dict(m, min_price=_decimal(m["min_price"]), suggested_prices=[_decimal(x) for x in m["suggested_prices"]])
+        for m in entry["modes"]
+    ]
 
-    # Chỉ giữ mode có giá trị trả phí
-    return [r for r in out if r["min_price"] > 0 or r["sku"] or r["currency"]]
-
-def _course_meta(course_key: CourseKey) -> Dict[str, Any]:
-    meta = {"course_id": str(course_key), "course_name": None,
-            "course_start": None, "course_end": None,
-            "enrollment_start": None, "enrollment_end": None,
-            "invite_only": None}
-    try:
-        co = CourseOverview.get_from_id(course_key)
-        meta.update({
-            "course_name": co.display_name_with_default,
-            "course_start": co.start.isoformat() if co.start else None,
-            "course_end": co.end.isoformat() if co.end else None,
-            "enrollment_start": co.enrollment_start.isoformat() if co.enrollment_start else None,
-            "enrollment_end": co.enrollment_end.isoformat() if co.enrollment_end else None,
-            "invite_only": bool(co.invite_only),
-        })
-    except Exception:
-        pass
-    return meta
+def _course_price_data(course_key: "CourseKey", entry: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    # Một lần đọc cache giá cho cả meta lẫn modes
+    if entry is None:
+        entry = pricing.get_course_pricing(course_key)
+    data = dict(entry["meta"])
+    data["modes"] = _modes_for_course(entry)
+    return data
 
 def _is_staff(u):
     return u.is_authenticated and (u.is_staff or u.is_superuser)
 
-def _price_and_currency(course_key: CourseKey, mode_slug: str):
-    m = CourseMode.objects.get(course_id=course_key, mode_slug=mode_slug)
-    # Hết hạn:
-    if m.expiration_date and timezone.now().date() > m.expiration_date:
-        raise ValueError("Course mode expired")
-    return Decimal(m.min_price or 0), (m.currency or "VND")
-
-def _hmac(secret: str, payload: bytes) -> str:
-    import hashlib, hmac
-    return hmac.new(secret.encode(), payload, hashlib.sha256).hexdigest()
-
-def _finalize_paid(order: Order, external_txn_id: str = ""):
-    if order.status == Order.Status.PAID:
-        return
-    order.status = Order.Status.PAID
-    if external_txn_id:
-        order.external_txn_id = external_txn_id
-    order.save(update_fields=["status", "external_txn_id", "updated_at"])
-    # Enroll
-    ck = CourseKey.from_string(order.course_id)
-    CourseEnrollment.enroll(order.user, ck, order.mode)
+def _price_and_currency(course_key: "CourseKey", mode_slug: str):
+    # Mode hết hạn / free không có trong snapshot
+    for m in pricing.get_course_pricing(course_key)["modes"]:
+        if m["slug"] == mode_slug:
+            return Decimal(m["min_price"]), (m["currency"] or "VND")
+    raise ValueError("Course mode not available")
+
+def _service_unavailable(retry_after: int) -> HttpResponse:
+    resp = HttpResponse("Payment service temporarily unavailable", status=503)
+    resp["Retry-After"] = str(retry_after)
+    return resp
 
 # ===== Endpoints: Pricing (staff-only) =====
+@metrics.instrument("course_price")
 @require_GET
 @login_required
 @user_passes_test(_is_staff)
+@ratelimit.limit("pricing")
+@querybudget.budget(5)  # 1 đọc snapshot; dựng lại snapshot khi thiếu/hết hạn: +4
 def course_price(request):
     cid = _normalize_course_id(request.GET.get("course_id") or request.GET.get("course"))
     if not cid:
@@ -135,114 +97,605 @@ def course_price(request):
         course_key = _coerce_course_key(cid)
     except Exception:
         return HttpResponseBadRequest("Invalid course_id")
-    data = _course_meta(course_key)
-    data["modes"] = _modes_for_course(course_key)
-    return JsonResponse(data)
+    return JsonResponse(_course_price_data(course_key))
 
+@metrics.instrument("course_price")
 @require_GET
 @login_required
 @user_passes_test(_is_staff)
+@ratelimit.limit("pricing")
+@querybudget.budget(5)
 def course_price_by_path(request, course_id: str):
     cid = _normalize_course_id(course_id)
     try:
         course_key = _coerce_course_key(cid)
     except Exception:
         return HttpResponseBadRequest("Invalid course_id")
-    data = _course_meta(course_key)
-    data["modes"] = _modes_for_course(course_key)
-    return JsonResponse(data)
+    return JsonResponse(_course_price_data(course_key))
+
+def _requested_course_ids(request) -> List[str]:
+    if request.method == "POST":
+        try:
+            ids = json.loads(request.body or b"{}").get("course_ids") or []
+        except (ValueError, AttributeError):
+            ids = []
+    else:
+        ids = request.GET.getlist("course_id")
+        for chunk in request.GET.getlist("course_ids"):
+            ids.extend(chunk.split(","))
+    out: List[str] = []
+    for raw in ids:
+        cid = _normalize_course_id(str(raw))
+        if cid and cid not in out:
+            out.append(cid)
+    return out
+
+@metrics.instrument("course_prices")
+@require_http_methods(["GET", "POST"])
+@login_required
+@user_passes_test(_is_staff)
+@ratelimit.limit("pricing")
+@querybudget.budget(5)
+def course_prices(request):
+    """Giá của nhiều khoá trong 1 request: ?course_ids=a,b hoặc POST {"course_ids": [...]}."""
+    cids = _requested_course_ids(request)
+    if not cids:
+        return HttpResponseBadRequest("Missing course_ids")
+    limit = getattr(settings, "PAYMENT_BULK_PRICING_MAX", 300)
+    if len(cids) > limit:
+        return HttpResponseBadRequest(f"Too many course_ids (max {limit})")
+
+    keys: Dict[str, "CourseKey"] = {}
+    result: Dict[str, Any] = {}
+    for cid in cids:
+        try:
+            keys[cid] = _coerce_course_key(cid)
+        except Exception:
+            result[cid] = {"course_id": cid, "error": "Invalid course_id"}
+    entries = pricing.get_many_course_pricing(keys.values())
+    for cid, ck in keys.items():
+        result[cid] = _course_price_data(ck, entries[str(ck)])
+
+    body = json.dumps(result, cls=DjangoJSONEncoder, sort_keys=True, separators=(",", ":"))
+    etag = quote_etag(hashlib.md5(body.encode()).hexdigest())
+    if etag in parse_etags(request.headers.get("If-None-Match", "")):
+        resp = HttpResponseNotModified()
+    else:
+        resp = HttpResponse(body, content_type="application/json")
+    resp["ETag"] = etag
+    resp["Cache-Control"] = "private, no-cache"
+    return resp
+
+@require_GET
+@login_required
+@user_passes_test(_is_staff)
+@querybudget.budget(0)
+def pricing_cache_stats(request):
+    return JsonResponse(pricing.stats())
+
+@require_GET
+@login_required
+@user_passes_test(_is_staff)
+@querybudget.budget(0)
+def singleflight_stats(request):
+    """Bộ đếm single-flight của process này (saved = lượt gọi Node đã tránh)."""
+    return JsonResponse(singleflight.stats())
+
+# ===== Endpoint: Metrics (staff hoặc Bearer PAYMENT_METRICS_TOKEN) =====
+@require_GET
+@querybudget.budget(0)
+def metrics_view(request):
+    if not metrics.enabled():
+        return HttpResponse("Metrics disabled", status=404)
+    if not (_is_staff(request.user) or metrics.token_ok(request)):
+        return HttpResponseForbidden("Forbidden")
+    body, content_type = metrics.render()
+    return HttpResponse(body, content_type=content_type)
+
+def _resume_checkout(order_uid, status: str, checkout_url: str):
+    # Checkout lặp lại (double-click / reload): dùng lại đơn đã có
+    if status == Order.Status.PENDING:
+        if checkout_url:
+            return redirect(checkout_url)
+        # Request đầu vẫn đang gọi Node: chờ ở trang chuẩn bị
+        return redirect(f"/payment-gateway/prepare/{order_uid}/")
+    return redirect(f"/payment-gateway/return/{order_uid}/")
+
+# ===== Endpoints: Báo cáo (staff-only) =====
+# export_orders không có query budget: query chạy lúc stream response, sau khi view đã trả về
+@require_GET
+@login_required
+@user_passes_test(_is_staff)
+def export_orders(request):
+    """Xuất đơn dạng stream: ?format=csv|ndjson&from=&to=&status=&course_id=&provider="""
+    fmt = request.GET.get("format", "csv")
+    if fmt not in ("csv", "ndjson"):
+        return HttpResponseBadRequest("format must be csv or ndjson")
+    try:
+        # Đơn hiện hành rồi tới đơn đã lưu trữ
+        qss = [reports.filter_orders(request.GET, model=m) for m in (Order, OrderArchive)]
+    except ValueError as ex:
+        return HttpResponseBadRequest(f"Invalid filter: {ex}")
+    if fmt == "csv":
+        resp = StreamingHttpResponse(reports.stream_csv(qss), content_type="text/csv; charset=utf-8")
+    else:
+        resp = StreamingHttpResponse(reports.stream_ndjson(qss), content_type="application/x-ndjson")
+    resp["Content-Disposition"] = f'attachment; filename="orders.{fmt}"'
+    return resp
+
+@require_GET
+@login_required
+@user_passes_test(_is_staff)
+@querybudget.budget(2)
+def revenue_report(request):
+    """Doanh thu: ?group_by=course,mode,currency,day (mặc định đơn PAID)."""
+    group_by = [g.strip() for g in request.GET.get("group_by", "course,mode,currency,day").split(",") if g.strip()]
+    bad = [g for g in group_by if g not in reports.GROUP_FIELDS]
+    if bad or not group_by:
+        return HttpResponseBadRequest(f"group_by must be a subset of {', '.join(reports.GROUP_FIELDS)}")
+    try:
+        qss = [reports.filter_orders(request.GET, default_status=Order.Status.PAID, model=m)
+               for m in (Order, OrderArchive)]
+    except ValueError as ex:
+        return HttpResponseBadRequest(f"Invalid filter: {ex}")
+    return JsonResponse({"group_by": group_by, "rows": reports.revenue(qss, group_by)})
 
 # ===== Endpoints: Thanh toán tối thiểu =====
+# Không bọc cả request trong transaction: INSERT commit ngay, request trùng
+# đụng unique idempotency_key tức thì thay vì chờ lock suốt lúc gọi Node.
+@metrics.instrument("checkout")
+@transaction.non_atomic_requests
 @login_required
+@ratelimit.limit("checkout")
+# Budget: giá (<= 5 khi cache trống) + INSERT + UPDATE checkout_url; khoá suy ra quá cửa sổ
+# idempotency: + SELECT đơn giữ khoá + UPDATE nhả khoá + INSERT lại
+@querybudget.budget(10)
 def checkout(request):
+    started = begin_checkout(request)
+    if isinstance(started, HttpResponse):
+        return started
+    order, return_url = started
+    try:
+        checkout_url = payments.request_checkout_url(order, return_url)
+    except providers.ProviderError as ex:
+        return checkout_failed(order, ex)
+    return redirect(checkout_url)
+
+class InFlight(NamedTuple):
+    """Checkout trùng trong lúc request đầu còn đang gọi Node (đơn PENDING, chưa có checkout_url)."""
+    uid: Any
+    key: str
+
+
+# Phần chung của checkout sync / async (async_views.py gọi qua sync_to_async): mọi thứ
+# trước khi gọi provider qua mạng. Trả về response nếu đã xong, hoặc (order, return_url).
+# join_inflight (chỉ view async): trả InFlight để view chờ chung lượt gọi Node đang chạy
+# trên event loop; view sync không chờ mà chuyển ngay sang trang chờ, không giữ worker.
+def begin_checkout(request, join_inflight: bool = False):
     course_id = _normalize_course_id(request.GET.get("course_id"))
     mode = request.GET.get("mode", "verified")
     if not course_id:
         return HttpResponseBadRequest("Missing course_id")
     try:
         ck = _coerce_course_key(course_id)
-        amount, currency = _price_and_currency(ck, mode)
+        with metrics.phase("pricing"):
+            amount, currency = _price_and_currency(ck, mode)
     except Exception as ex:
         return HttpResponseBadRequest(f"Invalid course/mode: {ex}")
 
-    order = Order.objects.create(
+    try:
+        provider = providers.for_order(course_id, currency)
+    except providers.ProviderError as ex:
+        log.error("payment-gateway: %s", ex)
+        return HttpResponse("Payment provider not configured", status=502)
+    retry_after = provider.unavailable_for()
+    if retry_after:
+        # Provider đang chết: fail-fast, không tạo Order rác
+        return _service_unavailable(retry_after)
+
+    client_key = request.headers.get("Idempotency-Key") or request.GET.get("idempotency_key")
+    key = payments.idempotency_key(request.user.id, course_id, mode, client_key)
+    order = Order(
         user=request.user, course_id=course_id, mode=mode,
-        amount=amount, currency=currency, status=Order.Status.PENDING, provider="vnpay",
+        amount=amount, currency=currency, status=Order.Status.PENDING, provider=provider.name,
+        idempotency_key=key,
     )
+    return_url = request.build_absolute_uri(f"/payment-gateway/return/{order.uid}")
+    if provider.local:
+        # Provider ký URL ngay trong process: checkout_url đi cùng INSERT, không cần UPDATE
+        try:
+            payments.prefill_checkout_url(order, provider, return_url)
+        except providers.ProviderError as ex:
+            return HttpResponse(str(ex), status=502)
+    saved, old = payments.save_idempotent(order, lambda: order.save(force_insert=True), sliding=not client_key)
+    if not saved:
+        # Trùng idempotency_key: DB đã quyết định, chỉ cần đọc lại đơn cũ
+        if old is None:
+            return HttpResponse("Checkout in progress, please retry", status=409)
+        wait = getattr(settings, "PAYMENT_SINGLEFLIGHT_WAIT", 5)
+        if join_inflight and wait > 0 and old.status == Order.Status.PENDING and not old.checkout_url:
+            return InFlight(old.uid, key)
+        return _resume_checkout(old.uid, old.status, old.checkout_url)
+    metrics.order_status(order.status, order.provider)
+    if order.checkout_url:
+        return redirect(order.checkout_url)
 
-    payload = {
-        "order_uid": str(order.uid),
-        "amount": str(order.amount),
-        "currency": order.currency,
-        "provider": order.provider,
-        "return_url": request.build_absolute_uri(f"/payment-gateway/return/{order.uid}"),
-        "customer": {"username": request.user.username, "email": request.user.email or ""},
-        "meta": {"course_id": order.course_id, "mode": order.mode},
-    }
-    raw = json.dumps(payload, separators=(",", ":")).encode()
+    if getattr(settings, "PAYMENT_ASYNC_CHECKOUT", False):
+        # Gọi Node ở background; trình duyệt chờ ở trang "đang chuẩn bị thanh toán"
+        tasks.enqueue_create_payment(order, return_url)
+        return redirect(f"/payment-gateway/prepare/{order.uid}/")
+    return order, return_url
 
+def checkout_failed(order: Order, ex: Exception) -> HttpResponse:
+    payments.mark_failed(order)
+    if isinstance(ex, providers.ProviderUnavailable):
+        return _service_unavailable(ex.retry_after)
+    return HttpResponse(str(ex), status=502)
+
+# ===== Endpoints: Đơn nhóm (mua nhiều suất, trả 1 lần) =====
+def _bulk_specs(request) -> List[Dict[str, Any]]:
+    # Body: {"lines": [{"username" | "email", "course_id", "mode"}, ...]}; lỗi -> ValueError
     try:
-        node_url = settings.PAYMENT_NODE_CREATE_URL
-        secret = settings.PAYMENT_SHARED_SECRET
-    except Exception:
-        return HttpResponseBadRequest("Payment settings not configured")
+        lines = json.loads(request.body or b"{}").get("lines")
+    except (ValueError, AttributeError):
+        raise ValueError("Body must be a JSON object")
+    if not isinstance(lines, list) or not all(isinstance(x, dict) for x in lines):
+        raise ValueError("lines must be a list of objects")
+    specs = []
+    for i, x in enumerate(lines):
+        cid = _normalize_course_id(str(x.get("course_id") or ""))
+        try:
+            ck = _coerce_course_key(cid)
+        except Exception:
+            raise ValueError(f"line {i}: invalid course_id")
+        specs.append({
+            "username": str(x.get("username") or "").strip(),
+            "email": str(x.get("email") or "").strip().lower(),
+            "course_id": str(ck), "course_key": ck, "mode": str(x.get("mode") or "verified"),
+        })
+    return specs
+
+def _bulk_order_data(order: Order, **extra: Any) -> Dict[str, Any]:
+    data = {"order_uid": str(order.uid), "status": order.status, "amount": str(order.amount),
+            "currency": order.currency, "checkout_url": order.checkout_url or None}
+    data.update(extra)
+    return data
 
+@metrics.instrument("bulk_checkout")
+@transaction.non_atomic_requests
+@require_http_methods(["POST"])
+@login_required
+@ratelimit.limit("checkout")
+# Budget: user 2 + giá <= 5 + INSERT đơn + INSERT dòng + UPDATE checkout_url; khoá suy ra quá
+# cửa sổ idempotency: + SELECT đơn giữ khoá + UPDATE nhả khoá + INSERT đơn lại
+@querybudget.budget(13)
+def bulk_checkout(request):
+    """Tạo đơn nhóm: 1 payment cho tổng tiền; các suất được ghi danh theo lô khi đơn PAID.
+
+    Staff: dòng theo username hoặc email. Người mua khác: chỉ email, mỗi suất là 1 lời mời
+    (link nhận suất ở bulk_order_progress?invites=1).
+    """
     try:
-        r = requests.post(
-            node_url, data=raw,
-            headers={"Content-Type": "application/json", "X-Signature": _hmac(secret, raw)},
-            timeout=15
-        )
-    except Exception as ex:
-        return HttpResponse(f"Cannot reach payment service: {ex}", status=502)
+        specs = _bulk_specs(request)
+        with metrics.phase("pricing"):
+            lines, currency = bulk.build_lines(specs, by_staff=_is_staff(request.user))
+    except ValueError as ex:
+        return HttpResponseBadRequest(f"Invalid lines: {ex}")
 
-    if r.status_code != 200:
-        return HttpResponse(f"Create payment failed: {r.text}", status=502)
+    order = bulk.new_order(request.user, lines, currency)
+    try:
+        provider = providers.for_order(order.course_id, currency)
+    except providers.ProviderError as ex:
+        log.error("payment-gateway: %s", ex)
+        return HttpResponse("Payment provider not configured", status=502)
+    retry_after = provider.unavailable_for()
+    if retry_after:
+        return _service_unavailable(retry_after)
+    order.provider = provider.name
 
-    data = r.json()
-    checkout_url = data["checkout_url"]
-    if "txn_id" in data:
-        order.external_txn_id = data["txn_id"]
-        order.save(update_fields=["external_txn_id", "updated_at"])
+    # Không có Idempotency-Key: cùng người mua + cùng danh sách suất trong cửa sổ thời gian.
+    # Có Idempotency-Key: thêm tiền tố "bulk:" để không trùng khoá với checkout đơn lẻ
+    basis = hashlib.sha256(json.dumps(
+        sorted([str(ln.user_id or ln.email), ln.course_id, ln.mode] for ln in lines)).encode()).hexdigest()
+    client_key = request.headers.get("Idempotency-Key")
+    order.idempotency_key = payments.idempotency_key(
+        request.user.id, f"bulk:{basis}", "", f"bulk:{client_key}" if client_key else None)
+    return_url = request.build_absolute_uri(f"/payment-gateway/return/{order.uid}")
+    if provider.local:
+        try:
+            payments.prefill_checkout_url(order, provider, return_url)
+        except providers.ProviderError as ex:
+            return HttpResponse(str(ex), status=502)
+    saved, old = payments.save_idempotent(order, lambda: bulk.save_order(order, lines), sliding=not client_key,
+                                          kind=Order.Kind.BULK)
+    if not saved:
+        if old is None:
+            return HttpResponse("Checkout in progress, please retry", status=409)
+        return JsonResponse(_bulk_order_data(old, lines=len(lines), duplicate=True))
+    metrics.order_status(order.status, order.provider)
 
-    return redirect(checkout_url)
+    if not order.checkout_url:
+        if getattr(settings, "PAYMENT_ASYNC_CHECKOUT", False):
+            tasks.enqueue_create_payment(order, return_url)
+            return JsonResponse(_bulk_order_data(order, lines=len(lines),
+                                                 prepare_url=f"/payment-gateway/prepare/{order.uid}/"), status=201)
+        try:
+            payments.request_checkout_url(order, return_url)
+        except providers.ProviderError as ex:
+            return checkout_failed(order, ex)
+    return JsonResponse(_bulk_order_data(order, lines=len(lines)), status=201)
+
+@require_GET
+@login_required
+@querybudget.budget(3)  # đơn + đếm dòng + (?invites=1) các suất INVITED
+def bulk_order_progress(request, uid):
+    """Tiến độ ghi danh của đơn nhóm (người mua hoặc staff); ?invites=1 kèm link nhận suất."""
+    order = Order.objects.filter(uid=uid, kind=Order.Kind.BULK).first()
+    if order is None or not (order.user_id == request.user.id or _is_staff(request.user)):
+        return JsonResponse({"error": "Not found"}, status=404)
+    extra = {"invites": bulk.invitations(order.pk)} if request.GET.get("invites") == "1" else {}
+    resp = JsonResponse(_bulk_order_data(order, lines=bulk.progress(order.pk), **extra))
+    resp["Cache-Control"] = "no-store"
+    return resp
 
+_CLAIM_PAGE = """<!doctype html>
+<html><head><meta charset="utf-8"><title>Nhận suất học</title></head>
+<body><p>Suất học %(mode)s khoá %(course)s dành cho %(email)s.</p>
+<form method="post"><input type="hidden" name="csrfmiddlewaretoken" value="%(csrf)s">
+<button type="submit">Nhận suất học</button></form></body></html>
+"""
+
+@transaction.non_atomic_requests
+@require_http_methods(["GET", "POST"])
+@login_required
+# GET: SELECT dòng; POST: SELECT FOR UPDATE + ghi danh (SELECT + UPDATE/INSERT) + UPDATE dòng
+@querybudget.budget(4)
+def bulk_claim(request, token):
+    """Link mời của suất theo email: tài khoản đúng email nhận suất, ghi danh vào mode đã trả tiền.
+
+    GET hiện trang xác nhận (không ghi danh khi trình duyệt / trình quét link mở trước),
+    POST nhận suất rồi chuyển về dashboard.
+    """
+    try:
+        if request.method == "GET":
+            line = bulk.claimable(token)
+            return HttpResponse(_CLAIM_PAGE % {
+                "mode": escape(line.mode), "course": escape(line.course_id), "email": escape(line.email),
+                "csrf": escape(get_token(request)),
+            })
+        bulk.claim(token, request.user)
+    except bulk.ClaimRejected as ex:
+        return HttpResponseForbidden(str(ex))
+    return redirect("/dashboard")
+
+# Không khai báo query budget: mỗi vòng chờ 0.2s là 1 SELECT, tối đa PAYMENT_ASYNC_WAIT giây
+@login_required
+def prepare_page(request, uid):
+    """Chờ checkout bất đồng bộ có checkout_url rồi chuyển hướng."""
+    qs = Order.objects.filter(uid=uid, user=request.user).values_list("status", "checkout_url")
+    deadline = time.monotonic() + getattr(settings, "PAYMENT_ASYNC_WAIT", 3)
+    while True:
+        row = qs.first()
+        if row is None:
+            return HttpResponse("Not found", status=404)
+        status, checkout_url = row
+        if checkout_url or status != Order.Status.PENDING or time.monotonic() >= deadline:
+            break
+        time.sleep(0.2)
+
+    if request.GET.get("format") == "json":
+        return JsonResponse({"status": status, "checkout_url": checkout_url or None})
+    if checkout_url and status == Order.Status.PENDING:
+        return redirect(checkout_url)
+    if status != Order.Status.PENDING:
+        return redirect(f"/payment-gateway/return/{uid}/")
+    resp = HttpResponse(
+        '<!doctype html><meta charset="utf-8"><meta http-equiv="refresh" content="1">'
+        "<p>Đang chuẩn bị thanh toán, vui lòng chờ...</p>"
+    )
+    resp["Cache-Control"] = "no-store"
+    return resp
+
+@metrics.instrument("confirm")
 @csrf_exempt
+@querybudget.budget(3)  # SELECT đơn + UPDATE trạng thái + INSERT OrderEvent
 def confirm(request):
-    raw = request.body
+    rejected = verify_confirm(request)
+    if rejected is not None:
+        return rejected
+    return apply_confirm(request.body)
+
+def verify_confirm(request) -> Optional[HttpResponse]:
     try:
-        secret = settings.PAYMENT_SHARED_SECRET
+        keyring = signing.keyring()
     except Exception:
         return HttpResponseBadRequest("Payment settings not configured")
+    try:
+        keyring.verify_request(request)
+    except signing.SignatureError as ex:
+        return HttpResponseForbidden(str(ex))
+    return None
 
-    sig = request.headers.get("X-Signature", "")
-    if sig != _hmac(secret, raw):
-        return HttpResponseForbidden("Bad signature")
+def apply_confirm(raw: bytes) -> HttpResponse:
+    """Xử lý 1 thông báo đã kiểm chữ ký (ORM + enroll sau commit)."""
+    if getattr(settings, "PAYMENT_CONFIRM_INBOX", False):
+        # Chỉ ghi vào inbox rồi trả 200 ngay; worker xử lý sau
+        try:
+            data = json.loads(raw.decode())
+        except ValueError as ex:
+            return HttpResponseBadRequest(f"Error: {ex}")
+        if not isinstance(data, dict) or not data.get("order_uid"):
+            return HttpResponseBadRequest("Missing order_uid")
+        inbox.enqueue([data])
+        return JsonResponse({"ok": True, "queued": True})
 
     try:
         data = json.loads(raw.decode())
-        order = get_object_or_404(Order, uid=data["order_uid"])
-        if str(order.amount) != str(data.get("amount")) or order.currency != data.get("currency"):
+        order = Order.objects.select_related("user").filter(uid=data["order_uid"]).first()
+        if order is None:
+            # Đơn đã kết thúc và được lưu trữ: callback gửi lại, không còn gì để làm
+            if archive.archived_status(data["order_uid"]) is not None:
+                return JsonResponse({"ok": True, "archived": True})
+            raise Http404("No Order matches the given query.")
+        if not processing.amount_matches(order, data):
             return HttpResponseBadRequest("Amount/currency mismatch")
 
         status = data.get("status")
         if status == "success":
-            _finalize_paid(order, external_txn_id=data.get("txn_id",""))
-        elif status in ("failed", "canceled"):
-            order.status = Order.Status.FAILED if status=="failed" else Order.Status.CANCELED
-            order.save(update_fields=["status", "updated_at"])
+            with metrics.phase("db"):
+                processing.finalize_paid(order, external_txn_id=data.get("txn_id",""), note=data)
+        elif status in processing.UNPAID_STATUSES:
+            with metrics.phase("db"):
+                processing.finalize_unpaid(order, processing.UNPAID_STATUSES[status], note=data)
         else:
             return HttpResponseBadRequest("Unknown status")
         return JsonResponse({"ok": True})
     except Exception as ex:
         return HttpResponseBadRequest(f"Error: {ex}")
 
-def return_page(request, uid):
-    order = get_object_or_404(Order, uid=uid)
-    if order.status == Order.Status.PAID:
-        msg = "Thanh toán thành công. Bạn đã được ghi danh."
-    elif order.status in (Order.Status.FAILED, Order.Status.CANCELED):
-        msg = "Thanh toán không thành công hoặc đã hủy."
+@metrics.instrument("confirm_batch")
+@csrf_exempt
+@require_http_methods(["POST"])
+@querybudget.budget(4)
+def confirm_batch(request):
+    """Node gửi lại nhiều thông báo trong 1 request (ký HMAC 1 lần cho cả body).
+
+    Body: mảng JSON các thông báo như confirm, hoặc {"notifications": [...]}.
+    """
+    rejected = verify_confirm(request)
+    if rejected is not None:
+        return rejected
+    try:
+        data = json.loads(request.body.decode())
+    except ValueError as ex:
+        return HttpResponseBadRequest(f"Error: {ex}")
+    notes = data.get("notifications") if isinstance(data, dict) else data
+    if not isinstance(notes, list) or not all(isinstance(n, dict) for n in notes):
+        return HttpResponseBadRequest("Expected a list of notifications")
+    limit = getattr(settings, "PAYMENT_CONFIRM_BATCH_MAX", 1000)
+    if len(notes) > limit:
+        return HttpResponseBadRequest(f"Too many notifications (max {limit})")
+
+    if getattr(settings, "PAYMENT_CONFIRM_INBOX", False):
+        inbox.enqueue(notes)
+        return JsonResponse({"ok": True, "queued": len(notes)})
+
+    with metrics.phase("db"):
+        try:
+            results = processing.apply_notifications(notes, source="confirm_batch")
+        except Exception:
+            # Lô lỗi (đã rollback về savepoint): áp dụng lại từng thông báo, trả kết quả riêng từng cái
+            log.exception("payment-gateway: confirm batch failed, applying notifications one by one")
+            results = processing.apply_each(notes, source="confirm_batch")
+    return JsonResponse({"ok": all(r["ok"] for r in results), "results": results})
+
+@csrf_exempt
+@metrics.instrument("provider_callback")
+@require_http_methods(["GET", "POST"])
+@querybudget.budget(4)
+def provider_callback(request, provider: str):
+    """Callback/IPN của provider gọi trực tiếp (không qua Node): internal/callback/<provider>/."""
+    try:
+        backend = providers.get(provider)
+    except providers.ProviderError:
+        raise Http404("Unknown provider")
+    try:
+        notes = backend.verify_callback(request)
+    except providers.CallbackRejected as ex:
+        return backend.callback_response([], error=str(ex))
+
+    if getattr(settings, "PAYMENT_CONFIRM_INBOX", False):
+        inbox.enqueue(notes)
+        return backend.callback_response([{"ok": True, "result": "queued"} for _ in notes])
+    with metrics.phase("db"):
+        results = processing.apply_notifications(notes, source="callback")
+    return backend.callback_response(results)
+
+_STATUS_MESSAGES = {
+    Order.Status.PAID: "Thanh toán thành công. Bạn đã được ghi danh.",
+    Order.Status.FAILED: "Thanh toán không thành công hoặc đã hủy.",
+    Order.Status.CANCELED: "Thanh toán không thành công hoặc đã hủy.",
+    Order.Status.PENDING: "Giao dịch đang được xử lý. Trang sẽ tự cập nhật.",
+}
+
+# Trang tự hỏi api/orders/<uid>/status (long-poll nếu PAYMENT_STATUS_PAGE_WAIT > 0)
+_RETURN_PAGE = """<!doctype html>
+<html><head><meta charset="utf-8"><title>Payment</title></head>
+<body><p id="msg">%(msg)s</p>
+<script>
+(function () {
+  var url = %(url)s, status = %(status)s, msgs = %(msgs)s, wait = %(wait)s, delay = 3000;
+  function poll() {
+    fetch(url + "?since=" + status + "&wait=" + wait, {credentials: "same-origin", cache: "no-store"})
+      .then(function (r) { return r.ok ? r.json() : Promise.reject(r.status); })
+      .then(function (d) {
+        if (d && d.status !== status) {
+          status = d.status;
+          document.getElementById("msg").textContent = msgs[status] || msgs.PENDING;
+        }
+        if (status === "PENDING") {
+          setTimeout(poll, wait ? 0 : delay);
+          delay = Math.min(delay * 1.5, 30000);
+        }
+      })
+      .catch(function () { setTimeout(poll, delay); delay = Math.min(delay * 2, 30000); });
+  }
+  if (status === "PENDING") { setTimeout(poll, wait ? 0 : delay); }
+})();
+</script></body></html>
+"""
+
+@login_required
+@querybudget.budget(2)
+def order_status_api(request, uid):
+    """Trạng thái đơn (JSON, chỉ người mua hoặc staff); ?since=<status>&wait=<giây> để long-poll."""
+    if not owns_order(request.user, order_status.get_owner(uid)):
+        return status_response(uid, None)
+    since, wait = status_wait_params(request)
+    if since and wait:
+        status = order_status.wait_for_change(uid, since, wait)
     else:
-        msg = "Giao dịch đang được xử lý. Vui lòng tải lại trang sau ít phút."
-    return HttpResponse(msg)
+        status = order_status.get_status(uid)
+    return status_response(uid, status)
+
+@require_GET
+@login_required
+@querybudget.budget(1)
+def order_events(request, uid):
+    """Lịch sử chuyển trạng thái của đơn (staff), cả khi đơn đã được lưu trữ."""
+    # API JSON: user thường nhận 403, không bị chuyển tới trang đăng nhập
+    if not _is_staff(request.user):
+        return HttpResponseForbidden("Forbidden")
+    return JsonResponse({"order_uid": str(uid), "events": events.history(uid)})
+
+def owns_order(user, owner_id: Optional[int]) -> bool:
+    return owner_id is not None and (owner_id == user.id or _is_staff(user))
+
+def status_wait_params(request):
+    since = request.GET.get("since")
+    try:
+        wait = float(request.GET.get("wait") or 0)
+    except ValueError:
+        wait = 0.0
+    return since, max(0.0, min(wait, getattr(settings, "PAYMENT_STATUS_LONGPOLL_MAX", 0)))
+
+def status_response(uid, status: Optional[str]) -> JsonResponse:
+    if status is None:
+        return JsonResponse({"error": "Not found"}, status=404)
+    resp = JsonResponse({"order_uid": str(uid), "status": status, "final": status != Order.Status.PENDING})
+    resp["Cache-Control"] = "no-store"
+    return resp
+
+@querybudget.budget(2)
+def return_page(request, uid):
+    status = order_status.get_status(uid)
+    if status is None:
+        return HttpResponse("Not found", status=404)
+    html = _RETURN_PAGE % {
+        "msg": _STATUS_MESSAGES.get(status, _STATUS_MESSAGES[Order.Status.PENDING]),
+        "url": json.dumps(f"/payment-gateway/api/orders/{uid}/status"),
+        "status": json.dumps(status),
+        "msgs": json.dumps({str(k): v for k, v in _STATUS_MESSAGES.items()}),
+        "wait": json.dumps(getattr(settings, "PAYMENT_STATUS_PAGE_WAIT", 0)),
+    }
+    return HttpResponse(html)
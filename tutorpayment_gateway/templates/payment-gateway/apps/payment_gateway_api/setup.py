@@ -7,6 +7,12 @@ setup(
     packages=find_packages(),
     include_package_data=True,
     install_requires=[],
+    extras_require={
+        # /payment-gateway/metrics
+        "metrics": ["prometheus-client"],
+        # PAYMENT_ASYNC_VIEWS: gọi Node bằng client async
+        "async": ["aiohttp"],
+    },
     entry_points={
         # Dùng plugin API mới
         "openedx.plugin.app": [